@@ -0,0 +1,168 @@
+"""bench_extract.py - бенчмарк извлечения структуры статьи из HTML.
+
+Сравнивает два пути от HTML страницы до структуры [{header, content}]:
+    - "legacy" - parse_article_page (BeautifulSoup, html.parser, unwrap и
+                 сериализация тела) + clean_text + parse_html_content;
+    - "lxml"   - extract_article_page: один разбор lxml и один обход тела статьи.
+
+Для каждого пути в отдельном процессе (чтобы честно мерить память):
+    - время разбора страницы (лучшее из --repeat);
+    - прирост пикового RSS процесса на разборе (память libxml2 не видна tracemalloc);
+    - пик памяти Python-объектов по tracemalloc.
+Дополнительно проверяется, что оба пути дают одинаковую структуру.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_extract --sections 400`
+
+Вместо синтетической страницы можно передать сохраненные страницы статей Habr:
+    `python -m benchmarks.bench_extract --html page1.html page2.html`
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.bench_sentiment import WORDS
+from benchmarks.compare_backends import peak_rss_mb, rss_mb
+
+PATHS = ("legacy", "lxml")
+
+
+def _sentence(rng: random.Random) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + '.'
+
+
+def make_page(n_sections: int, seed: int = 3) -> str:
+    """Синтетическая страница статьи в разметке Habr с типичными элементами тела"""
+    rng = random.Random(seed)
+    body = []
+    for i in range(n_sections):
+        body.append(f'<h{2 if i % 3 else 3}>Раздел {i} <a href="#s{i}">{rng.choice(WORDS)}</a></h{2 if i % 3 else 3}>')
+        for _ in range(rng.randint(2, 6)):
+            body.append(
+                f'<p>{_sentence(rng)} <b>{rng.choice(WORDS)}</b> <a href="https://habr.com/">{rng.choice(WORDS)}</a>'
+                f'&nbsp;{_sentence(rng)}<br>{_sentence(rng)} &amp; <code>x &lt; y</code></p>\n'
+            )
+        if i % 2 == 0:
+            items = ''.join(f'<li>{_sentence(rng)} <code>{rng.choice(WORDS)}</code></li>' for _ in range(rng.randint(2, 5)))
+            body.append(f'<ul>\n{items}\n</ul>')
+        if i % 3 == 0:
+            body.append(f'<blockquote>{_sentence(rng)}<br>{_sentence(rng)} <b>{rng.choice(WORDS)}</b><br></blockquote>')
+        if i % 4 == 0:
+            body.append(f'<figure><img src="https://habrastorage.org/{i}.png"><figcaption>{_sentence(rng)}</figcaption></figure>')
+            body.append(f'<pre><code class="python">def f():\n    return {i}\n</code></pre>')
+        if i % 5 == 0:
+            body.append(f'<ol><li>{_sentence(rng)}</li><li>{_sentence(rng)}</li></ol><h4>{_sentence(rng)}</h4>')
+
+    return (
+        '<html><head><title>Статья</title></head><body>'
+        '<h1 class="tm-title tm-title_h1"><span>Синтетическая статья</span></h1>'
+        '<span class="tm-user-info__user"><a>author</a> </span><time datetime="2024-01-01T00:00:00.000Z"></time>'
+        '<span class="tm-article-reading-time__label">15 мин</span>'
+        '<span class="tm-icon-counter__value">10K</span>'
+        '<div class="tm-article-body"><div id="post-content-body"><div xmlns="http://www.w3.org/1999/xhtml">'
+        + '\n'.join(body) +
+        '</div></div></div>'
+        '<a class="tm-tags-list__link">python</a><a class="tm-tags-list__link">lxml</a>'
+        '</body></html>'
+    )
+
+
+def extract(path: str, html: str) -> list:
+    if path == "legacy":
+        from src.parser import parse_article_page
+        from src.summarizator import clean_text, parse_html_content
+        return parse_html_content(clean_text(parse_article_page(html, 'bench')['text_content']))
+
+    from src.extractor import extract_article_page
+    return extract_article_page(html, 'bench')['structure']
+
+
+def run_path(args) -> dict:
+    """Замеры для одного пути (выполняется в дочернем процессе)"""
+    pages = load_pages(args)
+    # Импорты и ленивая инициализация парсеров - до замеров
+    extract(args.run_path, make_page(2))
+    rss_before = rss_mb()
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        structures = [extract(args.run_path, html) for html in pages]
+        best = min(best, time.perf_counter() - start)
+    peak_rss_delta = peak_rss_mb() - rss_before
+
+    tracemalloc.start()
+    for html in pages:
+        extract(args.run_path, html)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'path': args.run_path,
+        'seconds': round(best, 4),
+        'pages_per_sec': round(len(pages) / best, 2),
+        'peak_rss_delta_mb': round(max(peak_rss_delta, 0.0), 1),
+        'python_peak_mb': round(python_peak / 1024 / 1024, 1),
+        'structures': structures,
+    }
+
+
+def load_pages(args) -> list:
+    if args.html:
+        pages = []
+        for path in args.html:
+            with open(path, encoding='utf-8') as f:
+                pages.append(f.read())
+        return pages
+    return [make_page(args.sections)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк извлечения структуры статьи")
+    parser.add_argument("--sections", type=int, default=400, help="число секций синтетической страницы")
+    parser.add_argument("--html", nargs="+", help="сохраненные страницы статей Habr")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов (берется лучший)")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    parser.add_argument("--run-path", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_path:
+        print(json.dumps(run_path(args), ensure_ascii=False))
+        return
+
+    pages = load_pages(args)
+    print(f"Страниц: {len(pages)}, размер: {sum(len(html) for html in pages) / 1024:.0f} КБ")
+
+    results = {}
+    for path in PATHS:
+        command = [sys.executable, "-m", "benchmarks.bench_extract", "--run-path", path,
+                   "--sections", str(args.sections), "--repeat", str(args.repeat)]
+        if args.html:
+            command += ["--html", *args.html]
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        results[path] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    report = {
+        'pages': len(pages),
+        'html_kb': round(sum(len(html) for html in pages) / 1024, 1),
+        'structures_match': results['legacy'].pop('structures') == results['lxml'].pop('structures'),
+        'results': list(results.values()),
+        'speedup': round(results['legacy']['seconds'] / results['lxml']['seconds'], 2),
+    }
+
+    for row in report['results']:
+        print(json.dumps(row, ensure_ascii=False))
+    print(f"ускорение: x{report['speedup']}, структуры совпадают: {report['structures_match']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""bench_load.py - нагрузочный тест `/summarize`: N одновременных SSE-клиентов.
+
+Поднимает локальную заглушку Habr, которая отдает страницы корпуса
+benchmarks/fixtures по адресам в разметке Habr:
+    - /ru/articles/<id>/          - страница статьи;
+    - /ru/articles/<id>/comments/ - страница комментариев.
+Страница выбирается по id из корпуса по кругу, а у каждого клиента свой id,
+поэтому одновременные запросы не объединяются (src/singleflight.py) и не
+попадают в кэш суммаризаций. --stub-delay-ms добавляет задержку ответа
+заглушки, имитируя сеть до Habr.
+
+Для каждого уровня нагрузки из --concurrency одновременно открываются N
+SSE-потоков (--rounds раз подряд), и для каждого потока замеряются:
+    - time_to_first_event   - время до первого SSE-события;
+    - time_to_metadata      - время до события `metadata`;
+    - time_to_first_section - время до первого текста суммаризации;
+    - time_to_complete      - время до события `complete`;
+    - server_total          - total_s из события `timings` (время конвейера на сервере).
+Ошибка - ответ не 200 (в том числе 503 при перегрузке), событие `error`,
+обрыв соединения или поток без `complete`. В отчете для каждого уровня -
+доля ошибок, p50 / p95 / p99 времен и пропускная способность (статей в
+секунду). Рост time_to_first_event с числом клиентов при неизменной
+генерации указывает на блокировку event loop.
+
+Приложение:
+    - --url - уже запущенный сервис (кэш суммаризаций лучше отключить:
+      SUMMARY_CACHE_ENABLED=0);
+    - без --url скрипт сам запускает `uvicorn main:app` в отдельном процессе
+      с крошечными моделями (см. tiny_models.py), временными базами и
+      отключенным кэшем - тест проходит без сети. Остальные настройки
+      сервиса берутся из окружения (INFERENCE_PROCESSES, BATCH_MAX_SIZE, ...).
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_load`
+    `python -m benchmarks.bench_load --concurrency 1 4 16 32 --rounds 2 --json load.json`
+    `python -m benchmarks.bench_load --url http://localhost:8000 --concurrency 1 8`
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from benchmarks.make_fixtures import FIXTURES_DIR
+from benchmarks.suite import load_fixtures
+from benchmarks.tiny_models import DEFAULT_CACHE_DIR, ensure_tiny_models
+
+ARTICLE_PATH = re.compile(r"^/ru/articles/(\d+)/(comments/)?$")
+METRICS = ("time_to_first_event", "time_to_metadata", "time_to_first_section", "time_to_complete", "server_total")
+
+
+class StubHabr:
+    """Заглушка Habr в фоновом потоке: страницы статей и комментариев из корпуса"""
+
+    def __init__(self, pages: list, delay: float = 0.0):
+        self.pages = pages
+        self.delay = delay
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-habr", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def article_url(self, article_id: int) -> str:
+        return f"{self.base_url}/ru/articles/{article_id}/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = ARTICLE_PATH.match(self.path)
+                if match is None:
+                    self.send_error(404)
+                    return
+                _, article_html, comments_html = stub.pages[int(match.group(1)) % len(stub.pages)]
+                body = (comments_html or '') if match.group(2) else article_html
+                if stub.delay:
+                    time.sleep(stub.delay)
+                payload = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def serve_app(port: int, models_dir: str, max_output_tokens: int) -> None:
+    """Запускает приложение с крошечными моделями (вызывается в дочернем процессе)"""
+    import uvicorn
+
+    from src.parser import _parse_article_with_comments
+
+    # Тот же корпус для токенизаторов, что и в suite.py: модели в кэше общие
+    corpus = []
+    for name, article, comments in load_fixtures(FIXTURES_DIR):
+        data = _parse_article_with_comments(article, comments, name)
+        corpus += data['text_content'].split('\n') + [comment['text'] for comment in data['comments']]
+    paths = ensure_tiny_models(corpus, models_dir)
+
+    from main import app
+    from src.comment_analyzer import comment_analyzer
+    from src.registry import model_registry
+
+    # Имена моделей подменяются до старта приложения: lifecycle загрузит их вместо моделей с Hub
+    for summary_model in model_registry.models.values():
+        summary_model.model_name = summary_model.model_id = paths["t5"]
+        summary_model.max_output_length = max_output_tokens
+        summary_model.min_output_length = min(summary_model.min_output_length, max_output_tokens)
+    comment_analyzer.model_name = comment_analyzer.model_id = paths["bert"]
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_app(args) -> tuple:
+    """Дочерний процесс приложения и его адрес; ждет готовности моделей"""
+    workdir = tempfile.mkdtemp(prefix="habr-bench-load-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'ratings.db')}",
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "SUMMARY_CACHE_ENABLED": "0",
+    }
+    command = [sys.executable, "-m", "benchmarks.bench_load", "--serve-app", "--port", str(args.port),
+               "--models-dir", args.models_dir, "--max-output-tokens", str(args.max_output_tokens)]
+    log_path = os.path.join(workdir, "app.log")
+    print(f"Приложение запускается, лог: {log_path}")
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Приложение завершилось с кодом {process.returncode}, см. {log_path}")
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"Приложение не стало готовым за {args.startup_timeout} с")
+
+
+async def one_stream(client: httpx.AsyncClient, base_url: str, link: str, stream_tokens: bool) -> dict:
+    """Времена одного SSE-потока; при ошибке - поле error"""
+    result = {}
+    start = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST", f"{base_url}/summarize",
+            json={"link": link, "stream_tokens": stream_tokens, "timings": True},
+        ) as response:
+            if response.status_code != 200:
+                result['error'] = f"http_{response.status_code}"
+                return result
+
+            buffer = ''
+            async for chunk in response.aiter_text():
+                now = time.perf_counter() - start
+                buffer += chunk
+                while '\n\n' in buffer:
+                    event, buffer = buffer.split('\n\n', 1)
+                    if not event.startswith('data: '):
+                        continue
+                    data = json.loads(event[len('data: '):])
+                    result.setdefault('time_to_first_event', now)
+
+                    if data['type'] == 'metadata':
+                        result.setdefault('time_to_metadata', now)
+                    elif data['type'] == 'section_delta' or (
+                            data['type'] == 'section_complete' and data['section']['content']):
+                        result.setdefault('time_to_first_section', now)
+                    elif data['type'] == 'complete':
+                        result['time_to_complete'] = now
+                    elif data['type'] == 'timings':
+                        result['server_total'] = data['timings']['total_s']
+                    elif data['type'] == 'error':
+                        result['error'] = 'stream_error'
+    except httpx.HTTPError as e:
+        result['error'] = type(e).__name__
+
+    if 'error' not in result and 'time_to_complete' not in result:
+        result['error'] = 'incomplete'
+    return result
+
+
+def percentile(values: list, q: float) -> float:
+    """Перцентиль методом ближайшего ранга (при малой выборке p99 - это максимум)"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize_level(concurrency: int, results: list, wall: float) -> dict:
+    errors = {}
+    for result in results:
+        if 'error' in result:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+    completed = len(results) - sum(errors.values())
+
+    report = {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'error_rate': round(1 - completed / len(results), 4),
+        'errors': errors,
+        'articles_per_sec': round(completed / wall, 3),
+    }
+    for metric in METRICS:
+        values = [result[metric] for result in results if metric in result and 'error' not in result]
+        if values:
+            report[metric] = {f'p{q}': round(percentile(values, q), 3) for q in (50, 95, 99)}
+    return report
+
+
+async def run_levels(args, base_url: str, stub: StubHabr) -> list:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.request_timeout, connect=10)
+    next_id = args.first_article_id
+    reports = []
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        for concurrency in args.concurrency:
+            results = []
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                links = [stub.article_url(next_id + i) for i in range(concurrency)]
+                next_id += concurrency
+                results += await asyncio.gather(
+                    *(one_stream(client, base_url, link, args.stream_tokens) for link in links)
+                )
+            report = summarize_level(concurrency, results, time.perf_counter() - start)
+            reports.append(report)
+            print(json.dumps(report, ensure_ascii=False))
+    return reports
+
+
+def print_table(reports: list) -> None:
+    print(f"\n{'N':>4} {'ошибки':>7} {'статей/с':>9} "
+          f"{'first_event p50/p99':>21} {'first_section p50/p99':>23} {'complete p50/p99':>19}")
+    for report in reports:
+        cells = []
+        for metric, width in (("time_to_first_event", 21), ("time_to_first_section", 23), ("time_to_complete", 19)):
+            values = report.get(metric)
+            cells.append(f"{values['p50']:.2f} / {values['p99']:.2f}".rjust(width) if values else "-".rjust(width))
+        print(f"{report['concurrency']:>4} {report['error_rate']:>7.1%} {report['articles_per_sec']:>9.2f} "
+              + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /summarize: N одновременных SSE-клиентов")
+    parser.add_argument("--url", help="адрес запущенного сервиса (без него приложение запускается само)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="уровни нагрузки")
+    parser.add_argument("--rounds", type=int, default=1, help="волн одновременных запросов на уровень")
+    parser.add_argument("--stream-tokens", action="store_true", help="режим stream_tokens=true")
+    parser.add_argument("--stub-delay-ms", type=float, default=0, help="задержка ответа заглушки Habr")
+    parser.add_argument("--first-article-id", type=int, default=int(time.time()),
+                        help="id первой статьи (у каждого запроса свой id)")
+    parser.add_argument("--request-timeout", type=float, default=600, help="таймаут чтения потока, с")
+    parser.add_argument("--port", type=int, default=8090, help="порт запускаемого приложения")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="ожидание готовности приложения, с")
+    parser.add_argument("--models-dir", default=DEFAULT_CACHE_DIR, help="директория крошечных моделей")
+    parser.add_argument("--max-output-tokens", type=int, default=32, help="макс. длина суммаризации в токенах")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(args.port, args.models_dir, args.max_output_tokens)
+        return
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_app(args)
+
+    try:
+        with StubHabr(load_fixtures(FIXTURES_DIR), delay=args.stub_delay_ms / 1000) as stub:
+            reports = asyncio.run(run_levels(args, base_url.rstrip('/'), stub))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print_table(reports)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'stream_tokens': args.stream_tokens, 'rounds': args.rounds,
+                       'stub_delay_ms': args.stub_delay_ms, 'levels': reports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""bench_ratings.py - нагрузочный тест записи оценок `/rate`.
+
+Сравнивает два пути записи на SQLite:
+    - "current" - прежний путь: на каждую оценку add, обновление агрегатов,
+                  commit и refresh через синхронную сессию прямо в async-обработчике;
+    - "group"   - RatingWriter: оценки собираются в группы и пишутся одной
+                  транзакцией в отдельном потоке.
+
+Оценки отправляются конкурентно (--concurrency одновременных запросов),
+для каждого пути считаются оценки в секунду, p50 / p95 латентности записи
+и число коммитов. Каждый путь пишет в свою новую базу во временной директории.
+У пути "current" латентность не включает ожидание: запись блокирует event
+loop, и запросы выполняются строго по очереди - это видно по пропускной способности.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_ratings --ratings 2000 --concurrency 64`
+
+Нагрузка на запущенный сервис через HTTP (путь записи задается переменной
+окружения сервиса RATINGS_GROUP_COMMIT=0/1):
+    `python -m benchmarks.bench_ratings --url http://localhost:8000 --ratings 2000 --concurrency 64`
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import tempfile
+import time
+
+PATHS = ("current", "group")
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * q) - 1, 0)]
+
+
+async def run_load(rate, n_ratings: int, concurrency: int) -> dict:
+    """Отправляет n_ratings оценок не более чем concurrency одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await rate(f"https://habr.com/ru/articles/{i % 500}/", "Суммаризация статьи " * 20, i % 5 + 1)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_ratings)))
+    seconds = time.perf_counter() - start
+
+    return {
+        'ratings_per_sec': round(n_ratings / seconds, 1),
+        'latency_p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'latency_p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+async def bench_path(path: str, args, directory: str) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from src.models import ArticleRating, Base
+    from src.ratings import RatingWriter, store_summaries, update_aggregates
+
+    engine = create_engine(f"sqlite:///{directory}/{path}.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    if path == "current":
+        commits = 0
+
+        async def rate(article_url, summarized_text, rating):
+            nonlocal commits
+            db = session_factory()
+            try:
+                article_rating = ArticleRating(
+                    article_url=article_url, summary_hash=store_summaries(db, [summarized_text])[0], rating=rating,
+                )
+                db.add(article_rating)
+                update_aggregates(db, [(article_url, rating)])
+                db.commit()
+                db.refresh(article_rating)
+                commits += 1
+                return article_rating.id
+            finally:
+                db.close()
+
+        result = await run_load(rate, args.ratings, args.concurrency)
+        result['commits'] = commits
+    else:
+        writer = RatingWriter(session_factory, flush_interval_ms=args.flush_interval_ms,
+                              max_batch_size=args.max_batch_size)
+        result = await run_load(writer.add, args.ratings, args.concurrency)
+        result['commits'] = writer.stats()['commits']
+
+    engine.dispose()
+    return {'path': path, **result}
+
+
+async def bench_http(args) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        async def rate(article_url, summarized_text, rating):
+            response = await client.post("/rate", json={
+                'article_url': article_url, 'summarized_text': summarized_text, 'rating': rating,
+            })
+            response.raise_for_status()
+
+        result = await run_load(rate, args.ratings, args.concurrency)
+        writer_stats = (await client.get("/ratings/writer/stats")).json()
+
+    return {'path': "group" if writer_stats.get('enabled') else "current", **result, 'writer': writer_stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест записи оценок")
+    parser.add_argument("--ratings", type=int, default=2000, help="число оценок")
+    parser.add_argument("--concurrency", type=int, default=64, help="число одновременных запросов")
+    parser.add_argument("--flush-interval-ms", type=float, default=20, help="макс. время сбора группы")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="макс. размер группы")
+    parser.add_argument("--url", help="адрес запущенного сервиса (нагрузка через HTTP)")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        results = [asyncio.run(bench_http(args))]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = [asyncio.run(bench_path(path, args, directory)) for path in PATHS]
+
+    for row in results:
+        print(json.dumps(row, ensure_ascii=False))
+    if len(results) == 2:
+        print(f"ускорение: x{results[1]['ratings_per_sec'] / results[0]['ratings_per_sec']:.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'ratings': args.ratings, 'concurrency': args.concurrency, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
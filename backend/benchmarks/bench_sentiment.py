@@ -0,0 +1,120 @@
+"""bench_sentiment.py - бенчмарк анализа тональности комментариев.
+
+Сравнивает пропускную способность (комментариев в секунду):
+    - "per_comment" - прежний путь: отдельный вызов модели на каждый комментарий;
+    - "batched"     - CommentAnalyzer.analyze_sentiment_batch: сортировка по длине,
+                      батчи, дедупликация одинаковых комментариев;
+    - "memoized"    - повторный анализ того же треда с заполненным кэшем тональностей.
+
+Первые два замера выполняются с отключенным кэшем.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_sentiment --comments 400`
+
+Вместо синтетического треда можно передать сохраненную страницу комментариев Habr:
+    `python -m benchmarks.bench_sentiment --html path/to/comments.html`
+"""
+
+import argparse
+import json
+import random
+import time
+
+from src.comment_analyzer import CommentAnalyzer, SentimentCache
+from src.config import SENTIMENT_CONFIG
+from src.parser import parse_comments_page
+
+WORDS = (
+    "статья код модель данные сервер запрос ответ автор спасибо пример ошибка "
+    "решение проблема вопрос библиотека память поток время задача система"
+).split()
+
+SHORT_REPLIES = ["Спасибо!", "+1", "Отличная статья", "Не согласен", "Плюсую"]
+
+
+def make_thread(n_comments: int, seed: int = 42) -> list:
+    """Генерирует тред: комментарии разной длины и часть коротких повторов"""
+    rng = random.Random(seed)
+    comments = []
+    for _ in range(n_comments):
+        if rng.random() < 0.15:
+            text = rng.choice(SHORT_REPLIES)
+        else:
+            length = int(rng.lognormvariate(3.3, 0.9)) + 3
+            text = ' '.join(rng.choice(WORDS) for _ in range(length)) + '.'
+        comments.append(text)
+    return comments
+
+
+def measure(fn, texts, repeat: int) -> dict:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return {
+        'seconds': round(best, 4),
+        'comments_per_sec': round(len(texts) / best, 1),
+        'labels': result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк анализа тональности комментариев")
+    parser.add_argument("--comments", type=int, default=400, help="число комментариев в синтетическом треде")
+    parser.add_argument("--html", help="сохраненная страница комментариев Habr")
+    parser.add_argument("--model", default=SENTIMENT_CONFIG["model_name"], help="модель тональности")
+    parser.add_argument("--batch-size", type=int, default=SENTIMENT_CONFIG["batch_size"])
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов (берется лучший)")
+    parser.add_argument("--json", dest="json_path", help="сохранить результат в JSON")
+    args = parser.parse_args()
+
+    if args.html:
+        with open(args.html, encoding='utf-8') as f:
+            comments, _ = parse_comments_page(f.read(), None)
+        texts = [comment['text'] for comment in comments]
+    else:
+        texts = make_thread(args.comments)
+
+    analyzer = CommentAnalyzer(model_name=args.model, batch_size=args.batch_size, cache_size=0)
+    if analyzer.sentiment_analyzer is None:
+        raise SystemExit("Модель тональности не загружена")
+
+    # Прогрев, чтобы не учитывать ленивую инициализацию
+    analyzer.analyze_sentiment_batch(texts[:8])
+
+    print(f"Комментариев: {len(texts)}, уникальных: {len(set(texts))}")
+
+    per_comment = measure(lambda items: [analyzer.analyze_sentiment(text) for text in items], texts, args.repeat)
+    batched = measure(analyzer.analyze_sentiment_batch, texts, args.repeat)
+
+    analyzer.sentiment_cache = SentimentCache(max_size=len(texts))
+    analyzer.analyze_sentiment_batch(texts)
+    memoized = measure(analyzer.analyze_sentiment_batch, texts, args.repeat)
+    memoized.pop('labels')
+
+    agreement = sum(a == b for a, b in zip(per_comment.pop('labels'), batched.pop('labels'))) / len(texts)
+    report = {
+        'comments': len(texts),
+        'unique_comments': len(set(texts)),
+        'batch_size': args.batch_size,
+        'per_comment': per_comment,
+        'batched': batched,
+        'memoized': memoized,
+        'speedup': round(per_comment['seconds'] / batched['seconds'], 2),
+        'label_agreement': round(agreement, 4),
+    }
+
+    print(f"per_comment: {per_comment['comments_per_sec']} комм./с")
+    print(f"batched:     {batched['comments_per_sec']} комм./с")
+    print(f"memoized:    {memoized['comments_per_sec']} комм./с")
+    print(f"ускорение:   x{report['speedup']}, совпадение меток: {report['label_agreement']:.1%}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""bench_summary_storage.py - бенчмарк хранения текстов суммаризаций в базе оценок.
+
+Сравнивает две схемы на SQLite:
+    - "inline"  - прежняя схема: полный текст суммаризации в каждой строке article_ratings;
+    - "content" - тексты в summary_texts (один сжатый текст на уникальную
+                  суммаризацию), оценки хранят хеш текста.
+
+Оценки пишутся группами по --batch-size (как у RatingWriter) вместе с
+обновлением агрегатов. Оценки распределены по --articles статьям, у каждой
+статьи одна суммаризация длиной около --summary-chars символов.
+
+В отчете для каждой схемы:
+    - оценок в секунду при записи;
+    - размер файла базы в МБ.
+Для "inline" дополнительно замеряется перенос базы в новую схему
+(migrate_summary_texts): время и размер базы после переноса.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_summary_storage --ratings 20000 --articles 200`
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.compare_backends import make_texts
+
+SCHEMAS = ("inline", "content")
+
+
+def make_summaries(n_articles: int, summary_chars: int) -> list:
+    """Синтетические суммаризации примерно одинаковой длины"""
+    return [(text * (summary_chars // len(text) + 1))[:summary_chars] for text in make_texts(n_articles)]
+
+
+def make_ratings(n_ratings: int, summaries: list) -> list:
+    return [
+        (f"https://habr.com/ru/articles/{i % len(summaries)}/", summaries[i % len(summaries)], i % 5 + 1)
+        for i in range(n_ratings)
+    ]
+
+
+def bench_schema(schema: str, ratings: list, args, directory: str) -> dict:
+    from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from src.models import ArticleRatingStats, Base, RatingTotals, migrate_summary_texts
+    from src.ratings import RatingWriter, update_aggregates
+
+    path = os.path.join(directory, f"{schema}.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    batches = [ratings[i:i + args.batch_size] for i in range(0, len(ratings), args.batch_size)]
+
+    start = time.perf_counter()
+    if schema == "inline":
+        # Прежняя таблица оценок с текстом в каждой строке
+        legacy = Table(
+            "article_ratings", MetaData(),
+            Column("id", Integer, primary_key=True, index=True),
+            Column("article_url", Text, nullable=False, index=True),
+            Column("summarized_text", Text, nullable=False),
+            Column("rating", Integer, nullable=False),
+        )
+        legacy.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=engine, tables=[ArticleRatingStats.__table__, RatingTotals.__table__])
+
+        for batch in batches:
+            db = session_factory()
+            try:
+                db.execute(legacy.insert(), [
+                    {"article_url": article_url, "summarized_text": summarized_text, "rating": rating}
+                    for article_url, summarized_text, rating in batch
+                ])
+                update_aggregates(db, [(article_url, rating) for article_url, _, rating in batch])
+                db.commit()
+            finally:
+                db.close()
+    else:
+        Base.metadata.create_all(bind=engine)
+        writer = RatingWriter(session_factory, max_batch_size=args.batch_size)
+        for batch in batches:
+            writer._write(batch)
+    seconds = time.perf_counter() - start
+
+    result = {
+        'schema': schema,
+        'ratings_per_sec': round(len(ratings) / seconds, 1),
+        'db_size_mb': round(os.path.getsize(path) / 2 ** 20, 2),
+    }
+
+    if schema == "inline":
+        # Перенос базы в новую схему, включая VACUUM
+        Base.metadata.create_all(bind=engine)
+        start = time.perf_counter()
+        migrate_summary_texts(engine)
+        result['migration_s'] = round(time.perf_counter() - start, 2)
+        result['db_size_after_migration_mb'] = round(os.path.getsize(path) / 2 ** 20, 2)
+
+    engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранения текстов суммаризаций")
+    parser.add_argument("--ratings", type=int, default=20000, help="число оценок")
+    parser.add_argument("--articles", type=int, default=200, help="число статей (уникальных суммаризаций)")
+    parser.add_argument("--summary-chars", type=int, default=3000, help="длина суммаризации в символах")
+    parser.add_argument("--batch-size", type=int, default=256, help="оценок в одной транзакции")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    ratings = make_ratings(args.ratings, make_summaries(args.articles, args.summary_chars))
+    with tempfile.TemporaryDirectory() as directory:
+        results = [bench_schema(schema, ratings, args, directory) for schema in SCHEMAS]
+
+    for row in results:
+        print(json.dumps(row, ensure_ascii=False))
+    inline, content = results
+    print(f"размер базы: x{inline['db_size_mb'] / content['db_size_mb']:.1f} меньше, "
+          f"запись: x{content['ratings_per_sec'] / inline['ratings_per_sec']:.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'ratings': args.ratings, 'articles': args.articles, 'summary_chars': args.summary_chars,
+                       'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""bench_ttfb.py - время до первого байта и до первой секции для /summarize.
+
+Сравнивает два режима генерации:
+    - "beam"   - обычный режим: секция приходит целиком событием `section_complete`;
+    - "tokens" - stream_tokens=true: фрагменты секции приходят событиями `section_delta`.
+
+Для каждого режима замеряются:
+    - ttfb                  - время до первого байта ответа;
+    - time_to_metadata      - время до события `metadata`;
+    - time_to_first_section - время до первого текста суммаризации
+                              (`section_delta` или непустой `section_complete`);
+    - time_to_complete      - время до события `complete`.
+
+Сервис должен быть запущен с отключенным кэшем, иначе второй прогон придет из кэша:
+    `SUMMARY_CACHE_ENABLED=0 python -m uvicorn main:app --port 8000`
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_ttfb --url http://localhost:8000 --link https://habr.com/ru/articles/896594/`
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+
+
+def measure_once(base_url: str, link: str, stream_tokens: bool) -> dict:
+    timings = {}
+    start = time.perf_counter()
+
+    with httpx.stream(
+        "POST", f"{base_url}/summarize",
+        json={"link": link, "stream_tokens": stream_tokens},
+        timeout=None,
+    ) as response:
+        buffer = ''
+        for chunk in response.iter_text():
+            now = time.perf_counter() - start
+            timings.setdefault('ttfb', now)
+            buffer += chunk
+
+            while '\n\n' in buffer:
+                event, buffer = buffer.split('\n\n', 1)
+                if not event.startswith('data: '):
+                    continue
+                data = json.loads(event[len('data: '):])
+
+                if data['type'] == 'metadata':
+                    timings.setdefault('time_to_metadata', now)
+                elif data['type'] == 'section_delta' or (
+                        data['type'] == 'section_complete' and data['section']['content']):
+                    timings.setdefault('time_to_first_section', now)
+                elif data['type'] == 'complete':
+                    timings['time_to_complete'] = now
+                elif data['type'] == 'error':
+                    raise RuntimeError(data['message'])
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFB и время до первой секции для /summarize")
+    parser.add_argument("--url", default="http://localhost:8000", help="адрес сервиса")
+    parser.add_argument("--link", required=True, help="ссылка на статью Habr")
+    parser.add_argument("--repeat", type=int, default=3, help="число прогонов на режим")
+    parser.add_argument("--json", dest="json_path", help="сохранить результат в JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for mode, stream_tokens in (("beam", False), ("tokens", True)):
+        runs = [measure_once(args.url, args.link, stream_tokens) for _ in range(args.repeat)]
+        report[mode] = {
+            metric: round(statistics.median(run[metric] for run in runs if metric in run), 3)
+            for metric in ('ttfb', 'time_to_metadata', 'time_to_first_section', 'time_to_complete')
+            if any(metric in run for run in runs)
+        }
+        print(mode, json.dumps(report[mode]))
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
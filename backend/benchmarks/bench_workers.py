@@ -0,0 +1,130 @@
+"""bench_workers.py - бенчмарк пула процессов инференса (src/process_pool.py).
+
+Для каждого числа процессов от 0 до --max-workers в отдельном процессе:
+    - загружаются модель суммаризации и модель тональности;
+    - 0 процессов - инференс в самом процессе (потоки PyTorch по умолчанию),
+      1..N - форк пула процессов с общими весами и своими потоками на процесс;
+    - тексты суммаризируются через summarize_long_text, одновременно по
+      одному тексту на процесс.
+
+В отчете по каждому числу процессов:
+    - пропускная способность (текстов в секунду) и ускорение относительно 1 процесса;
+    - суммарный RSS процесса API и процессов инференса и суммарный PSS (общие
+      страницы делятся между процессами, поэтому PSS показывает реальную память);
+    - оценка памяти того же числа независимых процессов (воркеров uvicorn):
+      RSS одного процесса после загрузки, умноженный на число процессов.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.bench_workers --max-workers 4 --texts 32`
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.compare_backends import load_texts, make_texts, rss_mb
+
+
+def process_memory_mb(pid: int) -> tuple:
+    """RSS и PSS процесса в МБ (PSS делит общие страницы между процессами)"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Rss:'):
+                rss = int(line.split()[1])
+            elif line.startswith('Pss:'):
+                pss = int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def run_workers(args) -> dict:
+    """Замеры для одного числа процессов (выполняется в дочернем процессе)"""
+    from src.comment_analyzer import comment_analyzer
+    from src.process_pool import ProcessInferencePool
+    from src.registry import model_registry
+    from src.summarizator import summarize_long_text
+
+    summary_model = model_registry.load("primary")
+    comment_analyzer.load()
+    rss_after_load = rss_mb()
+
+    texts = load_texts(args.html) if args.html else make_texts(args.texts)
+    warmup_text = texts[0]
+
+    processes = args.run_workers
+    if processes:
+        pool = ProcessInferencePool(processes=processes, threads_per_process=args.threads)
+        pool.start(initializer=lambda: summarize_long_text(warmup_text, summary_model))
+        summarize = lambda text: pool.call(summarize_long_text, text, summary_model)
+        pids = [process.pid for process in pool._workers.values()]
+    else:
+        summarize_long_text(warmup_text, summary_model)
+        summarize = lambda text: summarize_long_text(text, summary_model)
+        pids = []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(processes, 1)) as threads:
+        list(threads.map(summarize, texts))
+    seconds = time.perf_counter() - start
+
+    memory = [process_memory_mb(pid) for pid in [os.getpid(), *pids]]
+    result = {
+        'processes': processes,
+        'threads_per_process': pool.threads_per_process if processes else None,
+        'pinned': bool(processes and pool._worker_cpus(0)),
+        'texts_per_sec': round(len(texts) / seconds, 3),
+        'rss_after_load_mb': round(rss_after_load, 1),
+        'rss_total_mb': round(sum(rss for rss, _ in memory), 1),
+        'pss_total_mb': round(sum(pss for _, pss in memory), 1),
+        'independent_processes_mb': round(rss_after_load * max(processes, 1), 1),
+    }
+    if processes:
+        pool.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пула процессов инференса")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="макс. число процессов")
+    parser.add_argument("--threads", type=int, default=0, help="потоков на процесс (0 - ядра поровну)")
+    parser.add_argument("--texts", type=int, default=32, help="число синтетических текстов")
+    parser.add_argument("--html", nargs="+", help="сохраненные страницы статей Habr")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    parser.add_argument("--run-workers", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_workers is not None:
+        print(json.dumps(run_workers(args), ensure_ascii=False))
+        return
+
+    results = []
+    for processes in range(0, args.max_workers + 1):
+        print(f"Замеряем процессов: {processes}...")
+        command = [sys.executable, "-m", "benchmarks.bench_workers", "--run-workers", str(processes),
+                   "--threads", str(args.threads), "--texts", str(args.texts)]
+        if args.html:
+            command += ["--html", *args.html]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"✗ {processes}: {completed.stderr.strip().splitlines()[-1] if completed.stderr else 'ошибка'}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    single = next((row for row in results if row['processes'] == 1), None)
+    for row in results:
+        if single is not None:
+            row['speedup_vs_1'] = round(row['texts_per_sec'] / single['texts_per_sec'], 2)
+        print(json.dumps(row, ensure_ascii=False))
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'texts': args.texts if not args.html else len(args.html), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""compare_backends.py - сравнение бэкендов инференса (torch / int8 / onnx).
+
+Для каждого бэкенда в отдельном процессе (чтобы честно мерить память):
+    - загружаются модель суммаризации и модель тональности;
+    - суммаризируются тексты основной моделью через summarize_long_text;
+    - классифицируются комментарии через CommentAnalyzer.analyze_sentiment_batch.
+
+В отчете по каждому бэкенду:
+    - время загрузки, латентность суммаризации (mean / p50 / p95), комментариев в секунду;
+    - RSS после загрузки и пиковый RSS процесса;
+    - совпадение с бэкендом torch: ROUGE-1 и ROUGE-L (F1) для суммаризаций,
+      доля совпавших меток для тональности.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.compare_backends --backends torch int8 onnx`
+
+Вместо синтетических текстов можно передать сохраненные страницы статей Habr:
+    `python -m benchmarks.compare_backends --html page1.html page2.html`
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса в МБ"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r'\w+', text.lower())
+
+
+def rouge_1(reference: str, candidate: str) -> float:
+    ref, cand = Counter(_tokens(reference)), Counter(_tokens(candidate))
+    overlap = sum((ref & cand).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_l(reference: str, candidate: str) -> float:
+    ref, cand = _tokens(reference), _tokens(candidate)
+    if not ref or not cand:
+        return 0.0
+    # Длина наибольшей общей подпоследовательности
+    previous = [0] * (len(cand) + 1)
+    for ref_token in ref:
+        current = [0]
+        for j, cand_token in enumerate(cand):
+            current.append(previous[j] + 1 if ref_token == cand_token else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision = lcs / len(cand)
+    recall = lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def make_texts(n_texts: int, seed: int = 7) -> list:
+    """Синтетические тексты длиной от одного до нескольких чанков"""
+    import random
+    from benchmarks.bench_sentiment import WORDS
+
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n_texts):
+        sentences = []
+        for _ in range(rng.randint(5, 60 if i % 4 == 0 else 25)):
+            sentences.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + '.')
+        texts.append(' '.join(sentences))
+    return texts
+
+
+def load_texts(html_paths: list) -> list:
+    from src.extractor import extract_article_page
+
+    texts = []
+    for path in html_paths:
+        with open(path, encoding='utf-8') as f:
+            data = extract_article_page(f.read(), path)
+        for section in data['structure']:
+            text = ' '.join(item if isinstance(item, str) else ' '.join(item) for item in section['content'])
+            if text:
+                texts.append(text)
+    return texts
+
+
+def run_backend(args) -> dict:
+    """Замеры для одного бэкенда (выполняется в дочернем процессе, INFERENCE_BACKEND задан в окружении)"""
+    start = time.perf_counter()
+    from src.comment_analyzer import SentimentCache, comment_analyzer as analyzer
+    from src.registry import model_registry
+    from src.summarizator import summarize_long_text
+    summary_model = model_registry.load("primary")
+    analyzer.load()
+    load_seconds = time.perf_counter() - start
+    rss_after_load = rss_mb()
+
+    from benchmarks.bench_sentiment import make_thread
+    texts = load_texts(args.html) if args.html else make_texts(args.texts)
+    comments = make_thread(args.comments)
+
+    # Кэш тональностей отключен, прогрев не должен влиять на замер
+    analyzer.sentiment_cache = SentimentCache(max_size=0)
+    summarize_long_text(texts[0], summary_model)
+
+    summaries = []
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        summaries.append(summarize_long_text(text, summary_model))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    labels = analyzer.analyze_sentiment_batch(comments)
+    sentiment_seconds = time.perf_counter() - start
+
+    return {
+        'backend': args.run_backend,
+        'load_seconds': round(load_seconds, 2),
+        'rss_after_load_mb': round(rss_after_load, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'latency_mean_s': round(statistics.mean(latencies), 3),
+        'latency_p50_s': round(statistics.median(latencies), 3),
+        'latency_p95_s': round(sorted(latencies)[math.ceil(len(latencies) * 0.95) - 1], 3),
+        'comments_per_sec': round(len(comments) / sentiment_seconds, 1),
+        'summaries': summaries,
+        'labels': labels,
+    }
+
+
+def compare(args) -> dict:
+    results = {}
+    for backend in args.backends:
+        print(f"Замеряем бэкенд {backend}...")
+        command = [sys.executable, "-m", "benchmarks.compare_backends", "--run-backend", backend,
+                   "--texts", str(args.texts), "--comments", str(args.comments)]
+        if args.html:
+            command += ["--html", *args.html]
+        env = {**os.environ, "INFERENCE_BACKEND": backend}
+        completed = subprocess.run(command, capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            print(f"✗ {backend}: {completed.stderr.strip().splitlines()[-1] if completed.stderr else 'ошибка'}")
+            continue
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    reference = results.get("torch")
+    report = []
+    for backend, result in results.items():
+        row = {key: value for key, value in result.items() if key not in ('summaries', 'labels')}
+        if reference is not None:
+            pairs = list(zip(reference['summaries'], result['summaries']))
+            row['rouge1_vs_torch'] = round(statistics.mean(rouge_1(a, b) for a, b in pairs), 4)
+            row['rougeL_vs_torch'] = round(statistics.mean(rouge_l(a, b) for a, b in pairs), 4)
+            row['sentiment_agreement_vs_torch'] = round(
+                sum(a == b for a, b in zip(reference['labels'], result['labels'])) / len(result['labels']), 4
+            )
+        report.append(row)
+    return {'texts': args.texts if not args.html else len(args.html), 'results': report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов инференса")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--texts", type=int, default=16, help="число синтетических текстов")
+    parser.add_argument("--comments", type=int, default=400, help="число синтетических комментариев")
+    parser.add_argument("--html", nargs="+", help="сохраненные страницы статей Habr")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    parser.add_argument("--run-backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_backend:
+        print(json.dumps(run_backend(args), ensure_ascii=False))
+        return
+
+    report = compare(args)
+    for row in report['results']:
+        print(json.dumps(row, ensure_ascii=False))
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
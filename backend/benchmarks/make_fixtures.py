@@ -0,0 +1,76 @@
+"""make_fixtures.py - корпус страниц Habr для офлайн-бенчмарков (benchmarks/suite.py).
+
+Записывает в benchmarks/fixtures пары страниц в разметке Habr:
+    - <name>.html          - страница статьи;
+    - <name>.comments.html - страница комментариев статьи.
+Статьи разной длины (от нескольких секций до длинного лонгрида), тела -
+с абзацами, списками, цитатами, кодом и картинками, комментарии - тред
+с комментариями разной длины, частью коротких повторов и ответами автора.
+
+Корпус генерируется детерминированно и хранится в репозитории, чтобы
+результаты бенчмарков сравнивались на одних и тех же страницах. В ту же
+директорию можно положить сохраненные реальные страницы Habr по тем же
+правилам именования.
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.make_fixtures`
+"""
+
+import argparse
+import html
+import os
+import random
+
+from benchmarks.bench_extract import make_page
+from benchmarks.bench_sentiment import make_thread
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Имя статьи -> (число секций, число комментариев)
+ARTICLES = {
+    "short": (6, 12),
+    "medium": (20, 60),
+    "long": (48, 180),
+}
+
+USERS = ["author", "reader", "habrauser", "devops", "backend_dev", "ml_engineer", "student"]
+
+
+def make_comments_page(n_comments: int, seed: int) -> str:
+    """Страница комментариев в разметке Habr; часть комментариев - от автора статьи"""
+    rng = random.Random(seed)
+    blocks = []
+    for i, text in enumerate(make_thread(n_comments, seed=seed)):
+        user = "author" if i % 7 == 3 else rng.choice(USERS[1:])
+        blocks.append(
+            '<article class="tm-comment-thread__comment">'
+            f'<a class="tm-user-info__username">{user}</a>'
+            f'<div class="tm-comment__body-content"><p>{html.escape(text)}</p></div>'
+            '</article>'
+        )
+    return (
+        '<html><head><title>Комментарии</title></head><body>'
+        '<div class="tm-comments-wrapper">' + '\n'.join(blocks) + '</div>'
+        '</body></html>'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Корпус страниц Habr для офлайн-бенчмарков")
+    parser.add_argument("--output", default=FIXTURES_DIR, help="директория корпуса")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for seed, (name, (n_sections, n_comments)) in enumerate(ARTICLES.items(), start=1):
+        pages = {
+            f"{name}.html": make_page(n_sections, seed=seed),
+            f"{name}.comments.html": make_comments_page(n_comments, seed=seed),
+        }
+        for filename, page in pages.items():
+            with open(os.path.join(args.output, filename), 'w', encoding='utf-8') as f:
+                f.write(page)
+        print(f"{name}: секций {n_sections}, комментариев {n_comments}")
+
+
+if __name__ == "__main__":
+    main()
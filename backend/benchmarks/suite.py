@@ -0,0 +1,372 @@
+"""suite.py - офлайн-набор бенчмарков конвейера с базовой линией и порогами регрессии.
+
+Работает без сети и без моделей с HuggingFace Hub:
+    - страницы статей и комментариев берутся из корпуса benchmarks/fixtures
+      (см. make_fixtures.py);
+    - модели суммаризации и тональности - крошечные T5 и BERT со случайными
+      весами, создаются локально (см. tiny_models.py).
+
+Стадии (каждая - весь корпус за один прогон):
+    - parse_article          - разбор страниц статьи и комментариев (без загрузки);
+    - parse_html_content     - clean_text + parse_html_content тела статьи (прежний путь);
+    - split_text_into_chunks - токенизация секций и нарезка на чанки;
+    - batch_summarize        - батчевая суммаризация секций;
+    - process_comments       - анализ комментариев (кэш тональностей сбрасывается);
+    - pipeline               - весь конвейер для всех статей одновременно: разбор,
+                               суммаризация секций через общий батчер и пул
+                               инференса, анализ комментариев.
+Модель со случайными весами почти никогда не выдает </s> и генерирует до
+max_length, поэтому длина суммаризаций ограничивается --max-output-tokens.
+
+Для стадии по --repeats прогонам после прогрева считаются медиана и лучшее
+время, а также пропускная способность по медиане (страниц, текстов или
+комментариев в секунду).
+
+Число потоков PyTorch (intra- и inter-op) фиксируется через --threads,
+параллелизм токенизаторов HuggingFace выключается.
+
+Результаты сравниваются с базовой линией (benchmarks/baseline.json) по
+лучшему времени - оно меньше всего зависит от фоновой нагрузки на машине.
+Базовые линии хранятся отдельно для каждой машины: ключ - модель
+процессора, число ядер, число потоков, размер пула инференса и версии
+Python, torch и transformers. Стадия считается регрессией, если лучшее время выросло
+больше чем на порог стадии (thresholds в файле базовой линии). При
+регрессии скрипт завершается с кодом 1. Если для текущей машины базовой
+линии нет, сравнение не выполняется - ее нужно записать через
+--update-baseline (базовые линии других машин при этом сохраняются).
+
+Для запуска из директории backend введите в терминал:
+    `python -m benchmarks.suite`
+    `python -m benchmarks.suite --json results.json`
+    `python -m benchmarks.suite --update-baseline`
+"""
+
+import argparse
+import asyncio
+import gc
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.make_fixtures import FIXTURES_DIR
+from benchmarks.tiny_models import DEFAULT_CACHE_DIR, ensure_tiny_models
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLDS = {"default": 0.3}
+
+STAGES = (
+    "parse_article",
+    "parse_html_content",
+    "split_text_into_chunks",
+    "batch_summarize",
+    "process_comments",
+    "pipeline",
+)
+
+
+def load_fixtures(directory: str) -> list:
+    """Пары страниц корпуса: (имя, HTML статьи, HTML комментариев или None)"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        if path.endswith(".comments.html"):
+            continue
+        name = os.path.basename(path)[:-len(".html")]
+        comments_path = os.path.join(directory, f"{name}.comments.html")
+        with open(path, encoding='utf-8') as f:
+            article_html = f.read()
+        comments_html = None
+        if os.path.exists(comments_path):
+            with open(comments_path, encoding='utf-8') as f:
+                comments_html = f.read()
+        pages.append((name, article_html, comments_html))
+    if not pages:
+        raise SystemExit(f"В {directory} нет страниц статей")
+    return pages
+
+
+def section_texts(structure: list) -> list:
+    """Тексты непустых секций - то, что суммаризатор получает на вход"""
+    texts = []
+    for section in structure:
+        text = ' '.join(item if isinstance(item, str) else ' '.join(item) for item in section['content'])
+        if text:
+            texts.append(text)
+    return texts
+
+
+class Context:
+    """Корпус, разобранные страницы и загруженные крошечные модели"""
+
+    def __init__(self, args):
+        from transformers import T5TokenizerFast
+
+        from src.backends import load_summarization_model
+        from src.comment_analyzer import CommentAnalyzer
+        from src.parser import _parse_article_with_comments, parse_article_page
+        from src.registry import model_registry
+
+        self.pages = load_fixtures(args.fixtures)
+        self.parsed = [
+            _parse_article_with_comments(article, comments, name) for name, article, comments in self.pages
+        ]
+        self.bodies = [parse_article_page(article, name)['text_content'] for name, article, _ in self.pages]
+        self.texts = [text for data in self.parsed for text in section_texts(data['structure'])]
+        self.comments = [data['comments'] for data in self.parsed]
+
+        corpus = [line for data in self.parsed for line in data['text_content'].split('\n')]
+        corpus += [comment['text'] for comments in self.comments for comment in comments]
+        paths = ensure_tiny_models(corpus, args.models_dir)
+
+        # Крошечная T5 подключается как основная модель глобального реестра: ее используют батчеры
+        self.summary_model = model_registry.models["primary"]
+        self.summary_model.max_output_length = args.max_output_tokens
+        self.summary_model.min_output_length = min(self.summary_model.min_output_length, args.max_output_tokens)
+        self.summary_model.attach(
+            load_summarization_model(paths["t5"], device=self.summary_model.device),
+            T5TokenizerFast.from_pretrained(paths["t5"]),
+        )
+        self.analyzer = CommentAnalyzer(model_name=paths["bert"])
+
+        # Очереди батчеров и семафор пула инференса привязаны к одному event loop на все прогоны
+        self.loop = asyncio.new_event_loop()
+
+    def close(self) -> None:
+        """Останавливает фоновые задачи батчеров"""
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+
+def stage_runners(context: Context) -> dict:
+    """Стадия -> (функция прогона по всему корпусу, число обработанных единиц, единица)"""
+    from src.comment_analyzer import SentimentCache
+    from src.executor import inference_executor
+    from src.parser import _parse_article_with_comments
+    from src.summarizator import (
+        batch_summarize, clean_text, parse_html_content, process_structure_streaming, split_text_into_chunks,
+    )
+
+    summary_model = context.summary_model
+    analyzer = context.analyzer
+
+    def parse_article():
+        for name, article, comments in context.pages:
+            _parse_article_with_comments(article, comments, name)
+
+    def parse_html():
+        for body in context.bodies:
+            parse_html_content(clean_text(body))
+
+    def split_chunks():
+        for text in context.texts:
+            split_text_into_chunks(text, summary_model.tokenizer, summary_model.chunk_tokens)
+
+    def summarize():
+        batch_summarize(context.texts, summary_model)
+
+    def process_comments():
+        analyzer.sentiment_cache = SentimentCache(analyzer.sentiment_cache.max_size)
+        for comments in context.comments:
+            analyzer.process_comments(comments)
+
+    async def one_article(name, article, comments):
+        data = await asyncio.to_thread(_parse_article_with_comments, article, comments, name)
+        async for _ in process_structure_streaming(data['structure']):
+            pass
+        if data['comments']:
+            await inference_executor.run(analyzer.process_comments, data['comments'])
+
+    async def all_articles():
+        await asyncio.gather(*(one_article(*page) for page in context.pages))
+
+    def pipeline():
+        analyzer.sentiment_cache = SentimentCache(analyzer.sentiment_cache.max_size)
+        context.loop.run_until_complete(all_articles())
+
+    n_comments = sum(len(comments) for comments in context.comments)
+    return {
+        "parse_article": (parse_article, len(context.pages), "pages"),
+        "parse_html_content": (parse_html, len(context.bodies), "pages"),
+        "split_text_into_chunks": (split_chunks, len(context.texts), "texts"),
+        "batch_summarize": (summarize, len(context.texts), "texts"),
+        "process_comments": (process_comments, n_comments, "comments"),
+        "pipeline": (pipeline, len(context.pages), "pages"),
+    }
+
+
+def measure(fn, repeats: int) -> list:
+    """Время прогонов fn после прогрева; сборщик мусора во время замера выключен, как в timeit"""
+    fn()
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return timings
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Строки сравнения с базовой линией: (стадия, изменение лучшего времени, порог, регрессия)"""
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get('thresholds', {})}
+    rows = []
+    for stage, result in results.items():
+        reference = baseline.get('results', {}).get(stage)
+        if reference is None:
+            continue
+        change = result['min_s'] / reference['min_s'] - 1
+        threshold = thresholds.get(stage, thresholds['default'])
+        rows.append((stage, change, threshold, change > threshold))
+    return rows
+
+
+def cpu_model() -> str:
+    """Модель процессора (из /proc/cpuinfo, иначе platform.processor())"""
+    try:
+        with open("/proc/cpuinfo", encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment() -> dict:
+    import torch
+    import transformers
+
+    from src.executor import inference_executor
+    from src.process_pool import process_pool
+
+    return {
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'transformers': transformers.__version__,
+        'machine': platform.machine(),
+        'cpu_model': cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'torch_interop_threads': torch.get_num_interop_threads(),
+        'inference_concurrency': inference_executor.max_concurrency,
+        'inference_processes': process_pool.processes,
+    }
+
+
+def machine_key(env: dict) -> str:
+    """Ключ базовой линии: результаты сравнимы только при совпадении всех полей"""
+    return (
+        f"{env['cpu_model']} x{env['cpu_count']} {env['machine']}, "
+        f"threads {env['torch_threads']}/{env['torch_interop_threads']}, "
+        f"inference {env['inference_concurrency']}/{env['inference_processes']}, "
+        f"python {env['python']}, torch {env['torch']}, transformers {env['transformers']}"
+    )
+
+
+def pin_threads(threads: int) -> None:
+    """Фиксирует число потоков до загрузки моделей"""
+    # Токенизаторы иначе берут по потоку на ядро
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарки конвейера с базовой линией")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="директория корпуса страниц")
+    parser.add_argument("--models-dir", default=DEFAULT_CACHE_DIR, help="директория крошечных моделей")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="стадии")
+    parser.add_argument("--repeats", type=int, default=5, help="замеров на стадию (после прогрева)")
+    parser.add_argument("--threads", type=int, default=1, help="потоков PyTorch (1 - стабильнее замеры)")
+    parser.add_argument("--max-output-tokens", type=int, default=32, help="макс. длина суммаризации в токенах")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="файл базовой линии")
+    parser.add_argument("--update-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    # Упрощение генерации под нагрузкой сделало бы замеры конвейера зависимыми от очереди
+    # (src.config уже загружен, поэтому переменная окружения здесь не подействовала бы)
+    from src.degradation import degradation_controller
+    degradation_controller.enabled = False
+    logging.getLogger("src.comment_analyzer").setLevel(logging.WARNING)
+
+    pin_threads(args.threads)
+
+    context = Context(args)
+    runners = stage_runners(context)
+
+    results = {}
+    for stage in args.stages:
+        fn, items, unit = runners[stage]
+        timings = measure(fn, args.repeats)
+        median = statistics.median(timings)
+        results[stage] = {
+            'median_s': round(median, 4),
+            'min_s': round(min(timings), 4),
+            'items': items,
+            f'{unit}_per_sec': round(items / median, 2),
+        }
+        print(json.dumps({'stage': stage, **results[stage]}, ensure_ascii=False))
+    context.close()
+
+    report = {'environment': environment(), 'repeats': args.repeats,
+              'max_output_tokens': args.max_output_tokens, 'results': results}
+    key = machine_key(report['environment'])
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+    thresholds = baselines.get('thresholds', DEFAULT_THRESHOLDS)
+    baseline = baselines.get('machines', {}).get(key)
+
+    regressions = []
+    if baseline is None and not args.update_baseline:
+        print(f"\nВ {args.baseline} нет базовой линии для машины \"{key}\", сравнение пропущено "
+              f"(запишите ее через --update-baseline)")
+    elif not args.update_baseline:
+        report['comparison'] = {}
+        print(f"\nСравнение с базовой линией {args.baseline} ({key}):")
+        for stage, change, threshold, regression in compare(results, {**baseline, 'thresholds': thresholds}):
+            status = "РЕГРЕССИЯ" if regression else "ok"
+            print(f"  {stage:<24} {change:+.1%} (порог +{threshold:.0%}) {status}")
+            report['comparison'][stage] = {'change': round(change, 4), 'threshold': threshold,
+                                           'regression': regression}
+            if regression:
+                regressions.append(stage)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        # Пороги и базовые линии других машин сохраняются, результаты этой машины - новые
+        updated = dict(report)
+        if baseline is not None and set(args.stages) != set(STAGES):
+            updated['results'] = {**baseline.get('results', {}), **results}
+        machines = {**baselines.get('machines', {}), key: updated}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'thresholds': thresholds, 'machines': machines}, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия для машины \"{key}\" записана в {args.baseline}")
+
+    if regressions:
+        print(f"Регрессии: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""tiny_models.py - крошечные локальные модели для офлайн-бенчмарков.
+
+Создает без обращения к HuggingFace Hub две модели со случайными весами:
+    - T5 (T5ForConditionalGeneration) - вместо модели суммаризации;
+    - BERT (BertForSequenceClassification) с метками NEUTRAL / POSITIVE /
+      NEGATIVE - вместо модели тональности.
+Токенизаторы обучаются на текстах корпуса benchmarks/fixtures, веса
+инициализируются с фиксированным seed, поэтому модели (а значит, и длины
+генерации) одинаковы от запуска к запуску.
+
+Качество суммаризаций не имеет смысла - модели нужны, чтобы бенчмарк
+проходил весь конвейер (токенизация, батчи, generate с beam search,
+декодирование, pipeline тональности) быстро и без сети.
+
+Модели кэшируются в директории (по умолчанию во временной директории
+системы) и пересоздаются при изменении MODELS_VERSION.
+"""
+
+import os
+import tempfile
+from typing import Dict, List
+
+MODELS_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), f"habr-bench-models-v{MODELS_VERSION}")
+SEED = 13
+
+T5_CONFIG = {"d_model": 64, "d_ff": 128, "num_layers": 2, "num_heads": 2, "d_kv": 32}
+BERT_CONFIG = {"hidden_size": 64, "num_hidden_layers": 2, "num_attention_heads": 2, "intermediate_size": 128}
+VOCAB_SIZE = 2000
+
+
+def make_tiny_t5(path: str, corpus: List[str]) -> None:
+    import torch
+    from tokenizers import SentencePieceUnigramTokenizer
+    from tokenizers.processors import TemplateProcessing
+    from transformers import T5Config, T5ForConditionalGeneration, T5TokenizerFast
+
+    spm = SentencePieceUnigramTokenizer()
+    spm.train_from_iterator(corpus, vocab_size=VOCAB_SIZE, special_tokens=["<pad>", "</s>", "<unk>"],
+                            unk_token="<unk>", show_progress=False)
+    spm.post_processor = TemplateProcessing(single="$A </s>", pair="$A </s> $B </s>", special_tokens=[("</s>", 1)])
+    tokenizer = T5TokenizerFast(tokenizer_object=spm, pad_token="<pad>", eos_token="</s>", unk_token="<unk>",
+                                extra_ids=0)
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(SEED)
+    config = T5Config(vocab_size=len(tokenizer), decoder_start_token_id=0, pad_token_id=0, eos_token_id=1,
+                      **T5_CONFIG)
+    T5ForConditionalGeneration(config).save_pretrained(path)
+
+
+def make_tiny_bert(path: str, corpus: List[str]) -> None:
+    import torch
+    from tokenizers import BertWordPieceTokenizer
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    wordpiece = BertWordPieceTokenizer(lowercase=False)
+    wordpiece.train_from_iterator(corpus, vocab_size=VOCAB_SIZE, show_progress=False)
+    os.makedirs(path, exist_ok=True)
+    wordpiece.save_model(path)
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(path, "vocab.txt"), do_lower_case=False)
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(SEED)
+    labels = ["NEUTRAL", "POSITIVE", "NEGATIVE"]
+    config = BertConfig(vocab_size=len(tokenizer), max_position_embeddings=512, num_labels=len(labels),
+                        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)},
+                        **BERT_CONFIG)
+    BertForSequenceClassification(config).save_pretrained(path)
+
+
+def ensure_tiny_models(corpus: List[str], cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[str, str]:
+    """Пути к крошечным моделям {"t5": ..., "bert": ...}; создает их, если их еще нет"""
+    paths = {"t5": os.path.join(cache_dir, "t5"), "bert": os.path.join(cache_dir, "bert")}
+    builders = {"t5": make_tiny_t5, "bert": make_tiny_bert}
+    for name, path in paths.items():
+        if not os.path.exists(os.path.join(path, "config.json")):
+            builders[name](path, corpus)
+    return paths
@@ -1,18 +1,34 @@
+import asyncio
 import json
 import os
+from typing import Any, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
-from src.normalize_url import normalize_habr_url
-from src.parser import parse_article
-from src.summarizator import process_article_streaming
-from src.models import get_db, ArticleRating
+from src.normalize_url import INVALID_HABR_URL, is_habr_article_url, normalize_habr_url
+from src.fetcher import habr_fetcher
+from src.summarizator import summary_batchers
+from src.registry import model_registry
+from src.cache import summary_cache
+from src.config import BULK_CONFIG
+from src.events import format_event
+from src.pipeline import coalesced_article_events, profiled_article_events
+from src.bulk import summarize_urls
+from src.singleflight import article_flights
+from src.jobs import JobQueueFull, job_store, job_workers
+from src.degradation import degradation_controller
+from src.executor import inference_executor
+from src.process_pool import process_pool
+from src.lifecycle import model_manager
+from src.metrics import metrics
+from src.profiling import request_profiler
+from src.models import get_db, init_db, ArticleRating
+from src.ratings import article_stats, global_stats, rating_writer, store_summaries, top_articles, update_aggregates
 from src.comment_analyzer import comment_analyzer
 
 load_dotenv()
@@ -20,6 +36,13 @@ app = FastAPI()
 
 class Link(BaseModel):
     link: str
+    stream_tokens: bool = False
+    preset: Optional[str] = None
+    timings: bool = False
+
+class BulkRequest(BaseModel):
+    links: List[str]
+    preset: Optional[str] = None
 
 class RatingRequest(BaseModel):
     article_url: str
@@ -30,131 +53,329 @@ class RatingRequest(BaseModel):
 async def read_root():
     return {"message": "Hello from FastAPI backend!"}
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Type": "text/event-stream",
+}
+
+def _unavailable_response() -> Optional[JSONResponse]:
+    """503, если модели еще не готовы или пул инференса перегружен"""
+    if not model_manager.is_ready():
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Модели загружаются, попробуйте позже"},
+            headers={"Retry-After": "10"},
+        )
+
+    if inference_executor.is_saturated():
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Сервис перегружен, попробуйте позже"},
+            headers={"Retry-After": "5"},
+        )
+    return None
+
+def _resolve_preset(preset: Optional[str]) -> str:
+    try:
+        return model_registry.resolve_preset(preset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _require_admin(token: Optional[str]) -> None:
+    """404, если профилирование выключено; 403, если токен администратора неверный"""
+    if not request_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Профилирование отключено")
+    if not request_profiler.is_admin(token):
+        raise HTTPException(status_code=403, detail="Нужен токен администратора")
+
 @app.post("/summarize")
-async def summarize_stream(link: Link):
-    """Эндпоинт для потоковой суммаризации"""
+async def summarize_stream(link: Link, profile: bool = False, x_profile: Optional[str] = Header(None),
+                           x_admin_token: Optional[str] = Header(None)):
+    """Эндпоинт для потоковой суммаризации (`?profile=1` или `X-Profile: 1` - с профилированием)"""
+    profiled = profile or x_profile == "1"
+    if profiled:
+        _require_admin(x_admin_token)
+        if request_profiler.is_busy():
+            raise HTTPException(status_code=409, detail="Уже профилируется другой запрос")
+
+    unavailable = _unavailable_response()
+    if unavailable is not None:
+        return unavailable
+
+    preset = _resolve_preset(link.preset)
+
     try:
         # Нормализуем URL
-        normalized_url = normalize_habr_url(link.link)    
-        # Получаем контент статьи
-        response = parse_article(normalized_url)
-        
-        if not response or 'text_content' not in response:
-            async def error_stream():
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Не удалось получить контент статьи'})}\n\n"
-            
-            return StreamingResponse(
-                error_stream(),
-                media_type="text/plain",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "Content-Type": "text/event-stream",
-                }
-            )
-        
-        async def enhanced_stream():
-            # Сначала отправляем метаданные
-            metadata = {
-                'type': 'metadata',
-                'title': response.get('title', 'Без названия'),
-                'url': normalized_url
-            }
-            yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
-            
-            # Затем передаем управление основному потоку обработки
-            async for chunk in process_article_streaming(response["text_content"]):
-                yield chunk
-            
-            # После завершения суммаризации анализируем комментарии
-            if 'comments' in response and response['comments']:
-                yield f"data: {json.dumps({'type': 'analyzing_comments'}, ensure_ascii=False)}\n\n"
-                
-                try:
-                    # Анализируем комментарии
-                    comments_analysis = comment_analyzer.process_comments(response['comments'])
-                    
-                    # Отправляем результат анализа комментариев
-                    yield f"data: {json.dumps({'type': 'comments_analysis', 'analysis': comments_analysis}, ensure_ascii=False)}\n\n"
-                    
-                except Exception as e:
-                    yield f"data: {json.dumps({'type': 'comments_error', 'message': f'Ошибка анализа комментариев: {str(e)}'}, ensure_ascii=False)}\n\n"
-        
-        # Возвращаем поток
-        return StreamingResponse(
-            enhanced_stream(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Content-Type": "text/event-stream",
-            }
-        )
-        
+        normalized_url = normalize_habr_url(link.link)
     except Exception as e:
         error_message = str(e)
-        
+
         async def error_stream():
-            yield f"data: {json.dumps({'type': 'error', 'message': error_message}, ensure_ascii=False)}\n\n"
-        
-        return StreamingResponse(
-            error_stream(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Content-Type": "text/event-stream",
-            }
+            yield format_event({'type': 'error', 'message': error_message})
+
+        return StreamingResponse(error_stream(), media_type="text/plain", headers=SSE_HEADERS)
+
+    # Возвращаем поток
+    events = profiled_article_events if profiled else coalesced_article_events
+    return StreamingResponse(
+        events(normalized_url, preset, stream_tokens=link.stream_tokens, timings=link.timings),
+        media_type="text/plain",
+        headers=SSE_HEADERS,
+    )
+
+@app.post("/summarize/batch")
+async def summarize_batch(request: BulkRequest):
+    """
+    Эндпоинт для пакетной суммаризации: по одной NDJSON-записи на статью
+    в порядке завершения обработки
+    """
+    if not request.links:
+        raise HTTPException(status_code=400, detail="Список ссылок пуст")
+    if len(request.links) > BULK_CONFIG["max_urls"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много ссылок: максимум {BULK_CONFIG['max_urls']}",
         )
 
+    unavailable = _unavailable_response()
+    if unavailable is not None:
+        return unavailable
+
+    preset = _resolve_preset(request.preset)
+
+    async def ndjson_stream():
+        async for record in summarize_urls(
+            request.links, preset, max_concurrency=BULK_CONFIG["max_concurrency"]
+        ):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_job(link: Link):
+    """Эндпоинт для постановки суммаризации в очередь задач"""
+    preset = _resolve_preset(link.preset)
+
+    try:
+        # Задача с чужим или некорректным URL упала бы только в воркере, при загрузке
+        if not is_habr_article_url(link.link):
+            raise HTTPException(status_code=400, detail=INVALID_HABR_URL)
+        normalized_url = normalize_habr_url(link.link)
+        job_id = await asyncio.to_thread(job_store.create, normalized_url, preset, link.stream_tokens)
+    except JobQueueFull as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    job_workers.notify()
+
+    return {"job_id": job_id, "status": "queued", "events_url": f"/jobs/{job_id}/events"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Эндпоинт для получения состояния задачи"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Эндпоинт для потока событий задачи; с заголовком Last-Event-ID поток
+    продолжается после указанного события
+    """
+    if await asyncio.to_thread(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    try:
+        after_seq = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный Last-Event-ID")
+
+    return StreamingResponse(
+        job_workers.events(job_id, after_seq), media_type="text/plain", headers=SSE_HEADERS
+    )
+
 @app.post("/rate")
 async def rate_article(rating_request: RatingRequest, db: Session = Depends(get_db)):
     """Эндпоинт для сохранения оценки статьи"""
+    # Валидация рейтинга
+    if rating_request.rating < 1 or rating_request.rating > 5:
+        raise HTTPException(status_code=400, detail="Рейтинг должен быть от 1 до 5")
+
+    # Фронтенд присылает ссылку в том виде, в каком ее ввел пользователь:
+    # оценки и агрегаты хранятся по нормализованному URL, как и статистика статьи
+    article_url = normalize_habr_url(rating_request.article_url)
+
     try:
-        # Валидация рейтинга
-        if rating_request.rating < 1 or rating_request.rating > 5:
-            raise HTTPException(status_code=400, detail="Рейтинг должен быть от 1 до 5")
-        
-        # Создаем новую запись в БД
-        article_rating = ArticleRating(
-            article_url=rating_request.article_url,
-            summarized_text=rating_request.summarized_text,
-            rating=rating_request.rating
-        )
-        
-        db.add(article_rating)
-        db.commit()
-        db.refresh(article_rating)
+        if rating_writer is not None:
+            # Оценка записывается одним коммитом с оценками других запросов
+            rating_id = await rating_writer.add(
+                article_url, rating_request.summarized_text, rating_request.rating
+            )
+        else:
+            # Создаем новую запись в БД
+            article_rating = ArticleRating(
+                article_url=article_url,
+                summary_hash=store_summaries(db, [rating_request.summarized_text])[0],
+                rating=rating_request.rating
+            )
+
+            db.add(article_rating)
+            update_aggregates(db, [(article_rating.article_url, article_rating.rating)])
+            db.commit()
+            db.refresh(article_rating)
+            rating_id = article_rating.id
         
         return {
             "success": True,
             "message": "Спасибо за вашу оценку!",
-            "rating_id": article_rating.id
+            "rating_id": rating_id
         }
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении оценки: {str(e)}")
 
+def _etag_response(request: Request, etag: str, content: Any) -> Response:
+    """
+    Ответ с ETag: если клиент прислал тот же ETag в If-None-Match,
+    вместо тела отдается 304 - фронтенд может опрашивать статистику дешево
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
 @app.get("/ratings/stats")
-async def get_ratings_stats(db: Session = Depends(get_db)):
+async def get_ratings_stats(request: Request, db: Session = Depends(get_db)):
     """Эндпоинт для получения статистики оценок"""
     try:
-        total_ratings = db.query(ArticleRating).count()
-        if total_ratings == 0:
-            return {"total_ratings": 0, "average_rating": 0}
-        
-        # Вычисляем среднюю оценку
-        avg_rating = db.query(
-            func.avg(ArticleRating.rating)
-        ).scalar()
-        
-        return {
-            "total_ratings": total_ratings,
-            "average_rating": round(float(avg_rating or 0), 2)
-        }
+        stats, version = global_stats(db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики: {str(e)}")
+    return _etag_response(request, f'W/"ratings-{version}"', stats)
+
+@app.get("/ratings/top")
+async def get_top_rated(request: Request, limit: int = 10, min_ratings: int = 1,
+                        db: Session = Depends(get_db)):
+    """Эндпоинт для получения статей с наибольшей средней оценкой"""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit должен быть от 1 до 100")
+    try:
+        # Любая новая оценка может изменить топ, поэтому версия - общая
+        _, version = global_stats(db)
+        articles = top_articles(db, limit=limit, min_ratings=min_ratings)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики: {str(e)}")
+    return _etag_response(request, f'W/"top-{version}-{limit}-{min_ratings}"', {"articles": articles})
+
+@app.get("/ratings/stats/{article:path}")
+async def get_article_ratings_stats(article: str, request: Request, db: Session = Depends(get_db)):
+    """Эндпоинт для получения статистики оценок одной статьи (URL статьи или ее id на Habr)"""
+    article_url = f"https://habr.com/ru/articles/{article}/" if article.isdigit() else normalize_habr_url(article)
+    try:
+        stats, version = article_stats(db, article_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики: {str(e)}")
+    return _etag_response(request, f'W/"article-{version}"', stats)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Эндпоинт для получения статистики кэша суммаризаций"""
+    if summary_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(summary_cache.stats)}
+
+@app.get("/inference/stats")
+async def get_inference_stats():
+    """Эндпоинт для получения статистики батчинга и пула инференса"""
+    return {
+        "models": model_registry.stats(),
+        "degradation": degradation_controller.stats(),
+        "batching": {role: batcher.stats() for role, batcher in summary_batchers.items()},
+        "executor": inference_executor.stats(),
+        "processes": process_pool.stats(),
+        "coalescing": article_flights.stats(),
+        "jobs": await asyncio.to_thread(job_workers.stats),
+        "sentiment_cache": comment_analyzer.sentiment_cache.stats(),
+    }
+
+# Состояние очередей на момент выдачи метрик
+metrics.gauge("habr_inference_active", "Вызовы моделей, выполняющиеся сейчас",
+              lambda: inference_executor.stats()['active'])
+metrics.gauge("habr_inference_waiting", "Вызовы моделей, ожидающие слота в пуле инференса",
+              lambda: inference_executor.stats()['waiting'])
+metrics.gauge("habr_batcher_queue_depth", "Тексты, ожидающие батча",
+              lambda: sum(batcher.stats()['queue_depth'] for batcher in summary_batchers.values()))
+metrics.gauge("habr_degradation_level",
+              "Текущий уровень генерации: номер в DEGRADATION_CONFIG[\"levels\"], 0 - полная генерация",
+              lambda: degradation_controller.level)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Метрики стадий конвейера в текстовом формате Prometheus"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Метрики отключены")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Список сохраненных профилей запросов, новые первыми"""
+    _require_admin(x_admin_token)
+    return {"profiles": request_profiler.list()}
+
+@app.get("/profiles/{profile_id}/{kind}")
+async def download_profile(profile_id: str, kind: str, x_admin_token: Optional[str] = Header(None)):
+    """Файл профиля: `folded` - свернутые стеки для flamegraph, `trace` - Chrome trace"""
+    _require_admin(x_admin_token)
+    path = request_profiler.path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@app.get("/ratings/writer/stats")
+async def get_rating_writer_stats():
+    """Эндпоинт для получения статистики групповых коммитов оценок"""
+    if rating_writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **rating_writer.stats()}
+
+@app.get("/health/live")
+async def health_live():
+    """Проба живости: процесс отвечает, даже пока модели загружаются"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Проба готовности: 200 только после загрузки и прогрева моделей"""
+    status = model_manager.status()
+    if not model_manager.is_ready():
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@app.on_event("startup")
+def migrate_database():
+    # Миграции базы оценок - до приема запросов, один раз на процесс
+    init_db()
+
+@app.on_event("startup")
+async def start_models():
+    # Загрузка моделей идет в фоне, сервер сразу принимает запросы к /health/*
+    model_manager.start()
+    # Воркеры очереди задач начинают брать задачи после готовности моделей
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    await job_workers.stop()
+    inference_executor.shutdown()
+    process_pool.shutdown()
+    await habr_fetcher.aclose()
 
 app.add_middleware(
     CORSMiddleware,
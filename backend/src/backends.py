@@ -0,0 +1,92 @@
+"""backends.py - загрузка моделей под выбранный бэкенд инференса.
+
+Поддерживаемые бэкенды (выбираются при старте через INFERENCE_BACKEND):
+    - "torch" - обычная модель PyTorch (fp32, CPU или GPU);
+    - "int8"  - динамическая int8-квантизация линейных слоев PyTorch (только CPU);
+    - "onnx"  - экспорт в ONNX и инференс через ONNX Runtime (только CPU),
+                декодер экспортируется с KV-кэшем (use_cache=True).
+                Требует дополнительного пакета: `pip install -r requirements-onnx.txt`
+                (optimum[onnxruntime]; в образ Dockerfile.cpu он уже установлен).
+
+Во всех бэкендах генерация идет через стандартный `model.generate`, поэтому
+для T5 сохраняется инкрементальное декодирование с кэшем ключей/значений.
+"""
+
+import logging
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, T5ForConditionalGeneration, pipeline
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд инференса: {backend} (доступны: {', '.join(BACKENDS)})")
+
+
+def _import_optimum():
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError as e:
+        raise RuntimeError(
+            "Бэкенд 'onnx' требует пакет optimum: pip install -r requirements-onnx.txt"
+        ) from e
+    return ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+
+
+def quantize_int8(model):
+    """Динамическая int8-квантизация линейных слоев (веса int8, активации квантуются на лету)"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def resolve_device(backend: str) -> torch.device:
+    """int8 и onnx работают только на CPU"""
+    _check_backend(backend)
+    if backend == "torch" and torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+
+def load_summarization_model(model_name: str, backend: str = "torch", device: torch.device = None):
+    """Загружает seq2seq-модель суммаризации под выбранный бэкенд"""
+    _check_backend(backend)
+    device = device or resolve_device(backend)
+
+    if backend == "onnx":
+        ORTModelForSeq2SeqLM, _ = _import_optimum()
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+        logger.info(f"Модель {model_name} экспортирована в ONNX")
+        return model
+
+    model = T5ForConditionalGeneration.from_pretrained(model_name, trust_remote_code=False)
+    model.eval()  # Переводим в режим инференса
+
+    if backend == "int8":
+        model = quantize_int8(model)
+        logger.info(f"Модель {model_name} квантизована в int8")
+        return model
+
+    return model.to(device)
+
+
+def load_sentiment_pipeline(model_name: str, backend: str = "torch"):
+    """Создает pipeline анализа тональности под выбранный бэкенд"""
+    _check_backend(backend)
+
+    if backend == "torch":
+        return pipeline("sentiment-analysis", model=model_name)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == "onnx":
+        _, ORTModelForSequenceClassification = _import_optimum()
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        model = quantize_int8(model)
+
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device="cpu")
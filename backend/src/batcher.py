@@ -0,0 +1,199 @@
+"""batcher.py - общий батчинг запросов к модели суммаризации.
+
+Тексты секций от всех одновременных запросов `/summarize` попадают в одну
+очередь. Фоновый воркер собирает из нее батч, пока не наберется
+`max_batch_size` текстов или не истечет `max_wait_ms`, и отправляет каждую
+группу батча (одна модель, одинаковые параметры) отдельной задачей в пул
+инференса - группы разной формы выполняются одновременно, если в пуле есть
+свободные слоты. Новый батч собирается, только когда есть свободный слот:
+пока все заняты, тексты копятся в очереди и батчи получаются полнее.
+Каждая суммаризация возвращается запросу-владельцу. Очередь ограничена:
+при переполнении новые тексты отклоняются с `InferenceOverloaded`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.executor import InferenceExecutor, InferenceOverloaded
+
+logger = logging.getLogger(__name__)
+
+
+class _BatchItem:
+    __slots__ = ('inputs', 'model', 'generation_params', 'future', 'enqueued_at')
+
+    def __init__(self, inputs: Any, model, generation_params: Dict[str, Any], future: asyncio.Future):
+        self.inputs = inputs
+        self.model = model
+        self.generation_params = generation_params
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+    @property
+    def group_key(self) -> tuple:
+        """В одном вызове generate - только тексты одной модели с одинаковыми параметрами"""
+        return id(self.model), tuple(sorted(self.generation_params.items()))
+
+
+class SummaryBatcher:
+    def __init__(self, batch_fn: Callable[..., List[Any]], executor: InferenceExecutor,
+                 max_batch_size: int = 8, max_wait_ms: float = 20, max_queue: int = 256):
+        """
+        Args:
+            batch_fn: функция вида batch_fn(inputs, model, generation_params) -> summaries
+            executor: пул, в котором выполняется batch_fn
+            max_batch_size: макс. размер батча
+            max_wait_ms: макс. время ожидания заполнения батча
+            max_queue: макс. число текстов, ожидающих батча
+        """
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches = set()
+        self._counters = {
+            'batches': 0,
+            'items': 0,
+            'wait_time_total': 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        """Лениво запускает воркер в текущем event loop (и перезапускает, если он завершился)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Очередь и семафор привязаны к event loop: запросы из прежнего цикла отклоняются
+            self._fail_pending(RuntimeError("Батчер перезапущен в другом event loop"))
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._slots = asyncio.Semaphore(self.executor.max_concurrency)
+            self._worker = None
+
+        if self._worker is None or self._worker.done():
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        # Очередь сохраняется: тексты, ожидающие батча, обработает новый воркер
+        self._worker = self._loop.create_task(self._run())
+        self._worker.add_done_callback(self._on_worker_done)
+
+    def _on_worker_done(self, worker: asyncio.Task) -> None:
+        """Воркер, упавший с ошибкой, сразу перезапускается, чтобы запросы в очереди не зависли"""
+        if worker.cancelled() or worker is not self._worker or self._loop.is_closed():
+            return
+        logger.error(f"Воркер батчера завершился с ошибкой, перезапуск: {worker.exception()}")
+        self._start_worker()
+
+    def _fail_pending(self, error: Exception) -> None:
+        """Завершает ошибкой запросы, оставшиеся в очереди"""
+        if self._queue is None:
+            return
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            try:
+                if not item.future.done():
+                    item.future.set_exception(error)
+            except RuntimeError:
+                # event loop запроса уже закрыт
+                pass
+
+    async def summarize(self, inputs: Any, model, generation_params: Dict[str, Any]) -> Any:
+        """Ставит текст (или id его токенов) в общую очередь и ждет суммаризацию"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_BatchItem(inputs, model, generation_params, future))
+        except asyncio.QueueFull:
+            raise InferenceOverloaded("Очередь суммаризации переполнена, попробуйте позже")
+        return await future
+
+    async def summarize_many(self, inputs: List[Any], model, generation_params: Dict[str, Any]) -> List[Any]:
+        """Суммаризирует несколько текстов, сохраняя порядок"""
+        return list(await asyncio.gather(*(self.summarize(item, model, generation_params) for item in inputs)))
+
+    async def _collect(self) -> List[_BatchItem]:
+        """Собирает батч до max_batch_size элементов или до истечения дедлайна"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Запросы, клиенты которых отключились, не обрабатываем
+        return [item for item in batch if not item.future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            # Пока все слоты пула заняты, новые тексты копятся в очереди,
+            # поэтому под нагрузкой батчи получаются полнее
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+
+            groups: Dict[tuple, List[_BatchItem]] = {}
+            for item in batch:
+                groups.setdefault(item.group_key, []).append(item)
+
+            for i, items in enumerate(groups.values()):
+                if i > 0:
+                    await self._slots.acquire()
+                task = asyncio.create_task(self._dispatch(items))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, items: List[_BatchItem]) -> None:
+        """Выполняет группу текстов одним вызовом batch_fn и раздает результаты"""
+        try:
+            now = time.perf_counter()
+            self._counters['batches'] += 1
+            self._counters['items'] += len(items)
+            self._counters['wait_time_total'] += sum(now - item.enqueued_at for item in items)
+
+            try:
+                summaries = await self.executor.run(
+                    self.batch_fn, [item.inputs for item in items], items[0].model, items[0].generation_params
+                )
+            except Exception as e:
+                logger.error(f"Ошибка батчевой суммаризации: {e}")
+                for item in items:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                return
+
+            for item, summary in zip(items, summaries):
+                if not item.future.done():
+                    item.future.set_result(summary)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика работы батчера"""
+        batches = self._counters['batches']
+        items = self._counters['items']
+        return {
+            'batches': batches,
+            'items': items,
+            'avg_batch_size': round(items / batches, 2) if batches else 0.0,
+            'avg_wait_ms': round(self._counters['wait_time_total'] / items * 1000, 2) if items else 0.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': len(self._dispatches),
+        }
@@ -0,0 +1,115 @@
+"""bulk.py - пакетная суммаризация списка статей для `/summarize/batch`.
+
+URL нормализуются normalize_habr_url и дедуплицируются: одна статья
+обрабатывается один раз, даже если пришла в списке в разных форматах.
+URL, которые не ведут на статью Habr, не загружаются: для каждого сразу
+отдается запись с ошибкой "invalid Habr URL".
+Одновременно обрабатывается не больше `max_concurrency` статей; их секции
+попадают в общие батчи инференса вместе с секциями остальных запросов.
+Результаты отдаются по одной записи на статью в порядке завершения.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, List, Tuple
+
+from src.events import parse_event
+from src.normalize_url import INVALID_HABR_URL, is_habr_article_url, normalize_habr_url
+from src.pipeline import coalesced_article_events
+
+
+def dedupe_urls(urls: List[str]) -> Tuple["OrderedDict[str, List[str]]", List[str]]:
+    """
+    Нормализованный URL -> исходные URL, которые к нему свелись (в порядке
+    запроса), и список URL, которые не ведут на статью Habr
+    """
+    groups: "OrderedDict[str, List[str]]" = OrderedDict()
+    invalid = []
+    for url in urls:
+        if not is_habr_article_url(url.strip()):
+            invalid.append(url)
+            continue
+        groups.setdefault(normalize_habr_url(url.strip()), []).append(url)
+    return groups, invalid
+
+
+async def summarize_article(normalized_url: str, preset: str) -> Dict[str, Any]:
+    """
+    Обрабатывает статью тем же конвейером, что и `/summarize`, и собирает
+    итоговую запись вместо потока событий. Время по стадиям:
+        - fetch_s     - загрузка и разбор статьи с комментариями;
+        - summarize_s - суммаризация секций (или повтор из кэша);
+        - comments_s  - анализ тональности комментариев;
+        - total_s     - вся обработка статьи.
+    """
+    start = time.perf_counter()
+    stage_start = start
+    record = {
+        'url': normalized_url,
+        'status': 'ok',
+        'title': None,
+        'sections': None,
+        'models': [],
+        'comments_analysis': None,
+        'error': None,
+        'timings': {},
+    }
+
+    def mark(stage: str) -> None:
+        nonlocal stage_start
+        now = time.perf_counter()
+        record['timings'][stage] = round(now - stage_start, 3)
+        stage_start = now
+
+    async for chunk in coalesced_article_events(normalized_url, preset):
+        event = parse_event(chunk)
+        event_type = event.get('type')
+
+        if event_type == 'metadata':
+            record['title'] = event['title']
+            mark('fetch_s')
+        elif event_type == 'section_complete' and event.get('model'):
+            if event['model'] not in record['models']:
+                record['models'].append(event['model'])
+        elif event_type == 'complete':
+            record['sections'] = event['result']
+            mark('summarize_s')
+        elif event_type == 'comments_analysis':
+            record['comments_analysis'] = event['analysis']
+            mark('comments_s')
+        elif event_type in ('error', 'comments_error'):
+            if event_type == 'error':
+                record['status'] = 'error'
+            record['error'] = event['message']
+
+    record['timings']['total_s'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+async def summarize_urls(urls: List[str], preset: str,
+                         max_concurrency: int = 4) -> AsyncGenerator[Dict[str, Any], None]:
+    """Обрабатывает статьи конкурентно и отдает записи по мере готовности"""
+    groups, invalid = dedupe_urls(urls)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run(normalized_url: str, requested: List[str]) -> None:
+        async with semaphore:
+            try:
+                record = await summarize_article(normalized_url, preset)
+            except Exception as e:
+                record = {'url': normalized_url, 'status': 'error', 'error': str(e), 'timings': {}}
+        record['requested_urls'] = requested
+        results.put_nowait(record)
+
+    tasks = [asyncio.ensure_future(run(url, requested)) for url, requested in groups.items()]
+    try:
+        for url in invalid:
+            yield {'url': url, 'requested_urls': [url], 'status': 'error', 'error': INVALID_HABR_URL, 'timings': {}}
+        for _ in range(len(tasks)):
+            yield await results.get()
+    finally:
+        # Клиент отключился - оставшиеся статьи не нужны
+        for task in tasks:
+            task.cancel()
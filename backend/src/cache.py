@@ -0,0 +1,250 @@
+"""cache.py - двухуровневый кэш результатов суммаризации.
+
+Первый уровень - LRU-кэш в памяти процесса, второй - SQLite-файл на диске,
+который переживает перезапуск сервиса. Обращения к SQLite из асинхронного
+кода (replay_or_record) выполняются в потоке (asyncio.to_thread), чтобы
+дисковый ввод-вывод не блокировал event loop; LRU в памяти проверяется
+синхронно. В кэше хранится последовательность
+SSE-событий (`start`, `processing`, `section_complete`, `complete`), поэтому
+при попадании клиент получает тот же поток, что и при полной обработке.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+from src.config import CACHE_CONFIG
+from src.events import parse_event
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    def __init__(self, db_path: str, max_memory_items: int = 256,
+                 max_disk_items: int = 10000, ttl_seconds: float = 7 * 24 * 60 * 60):
+        """Инициализация кэша и создание таблицы в SQLite"""
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Отдельная блокировка SQLite: пока поток ждет диск, LRU в памяти доступен event loop
+        self._db_lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summary_cache ("
+            "key TEXT PRIMARY KEY, "
+            "events TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_summary_cache_accessed_at "
+            "ON summary_cache (accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(url: str, text_content: str, model_name: str, generation_params: Dict[str, Any]) -> str:
+        """Формирует ключ кэша из URL, хэша контента, модели и параметров генерации"""
+        content_hash = hashlib.sha256(text_content.encode('utf-8')).hexdigest()
+        params = json.dumps(generation_params, sort_keys=True)
+        raw = '\n'.join([url, content_hash, model_name, params])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def get_memory(self, key: str) -> Optional[List[str]]:
+        """События из LRU в памяти или None (без обращения к диску)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            events, created_at = entry
+            if not self._expired(created_at, now):
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return events
+            del self._memory[key]
+            self._counters['evictions'] += 1
+            return None
+
+    def get_disk(self, key: str) -> Optional[List[str]]:
+        """События из SQLite или None; найденная запись поднимается в LRU в памяти"""
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT events, created_at FROM summary_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                with self._lock:
+                    self._counters['misses'] += 1
+                return None
+
+            events_json, created_at = row
+            if self._expired(created_at, now):
+                self._db.execute("DELETE FROM summary_cache WHERE key = ?", (key,))
+                self._db.commit()
+                with self._lock:
+                    self._counters['evictions'] += 1
+                    self._counters['misses'] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE summary_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+
+        events = json.loads(events_json)
+        with self._lock:
+            self._remember(key, events, created_at)
+            self._counters['disk_hits'] += 1
+        return events
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Возвращает сохраненные события или None"""
+        events = self.get_memory(key)
+        if events is not None:
+            return events
+        return self.get_disk(key)
+
+    def set_disk(self, key: str, events: List[str], created_at: float) -> None:
+        """Сохраняет события в SQLite и вытесняет лишние записи"""
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO summary_cache (key, events, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(events, ensure_ascii=False), created_at, created_at)
+            )
+            evicted = self._evict_disk(created_at)
+            self._db.commit()
+        with self._lock:
+            self._counters['evictions'] += evicted
+            self._counters['stores'] += 1
+
+    def set(self, key: str, events: List[str]) -> None:
+        """Сохраняет события в оба уровня кэша"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, events, now)
+        self.set_disk(key, events, now)
+
+    async def aget(self, key: str) -> Optional[List[str]]:
+        """get для event loop: промах в памяти проверяется в SQLite в потоке"""
+        events = self.get_memory(key)
+        if events is not None:
+            return events
+        return await asyncio.to_thread(self.get_disk, key)
+
+    async def aset(self, key: str, events: List[str]) -> None:
+        """set для event loop: запись в SQLite выполняется в потоке"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, events, now)
+        await asyncio.to_thread(self.set_disk, key, events, now)
+
+    def _remember(self, key: str, events: List[str], created_at: float) -> None:
+        """Кладет запись в LRU в памяти, вытесняя самые старые"""
+        self._memory[key] = (events, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _evict_disk(self, now: float) -> int:
+        """Удаляет просроченные записи и самые давние сверх лимита; возвращает их число"""
+        expired = self._db.execute(
+            "DELETE FROM summary_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM summary_cache WHERE key IN ("
+            "SELECT key FROM summary_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_items,)
+        ).rowcount
+        return max(expired, 0) + max(overflow, 0)
+
+    def clear(self) -> None:
+        """Полностью очищает кэш"""
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            self._db.execute("DELETE FROM summary_cache")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            counters = dict(self._counters)
+            memory_items = len(self._memory)
+        with self._db_lock:
+            disk_items = self._db.execute("SELECT COUNT(*) FROM summary_cache").fetchone()[0]
+
+        hits = counters['memory_hits'] + counters['disk_hits']
+        lookups = hits + counters['misses']
+        return {
+            **counters,
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_items': memory_items,
+            'disk_items': disk_items,
+        }
+
+    async def replay_or_record(self, key: str, stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """
+        Отдает события из кэша или проксирует поток обработки, запоминая его.
+
+        В кэш попадают только потоки, завершившиеся событием `complete` без ошибок
+        и без секций, обработанных запасной моделью или упрощенной под нагрузкой
+        генерацией (ключ кэша - по основной модели и полным параметрам).
+        """
+        events = await self.aget(key)
+        if events is not None:
+            for chunk in events:
+                yield chunk
+            return
+
+        recorded = []
+        completed = False
+        failed = False
+        async for chunk in stream:
+            recorded.append(chunk)
+            event = parse_event(chunk)
+            event_type = event.get('type')
+            if event_type == 'error' or event.get('fallback') or event.get('degraded'):
+                failed = True
+            elif event_type == 'complete':
+                completed = True
+            yield chunk
+
+        if completed and not failed:
+            try:
+                await self.aset(key, recorded)
+            except sqlite3.Error as e:
+                logger.warning(f"Не удалось сохранить результат в кэш: {e}")
+
+
+# Глобальный экземпляр кэша
+summary_cache = SummaryCache(
+    CACHE_CONFIG["db_path"],
+    max_memory_items=CACHE_CONFIG["max_memory_items"],
+    max_disk_items=CACHE_CONFIG["max_disk_items"],
+    ttl_seconds=CACHE_CONFIG["ttl_seconds"],
+) if CACHE_CONFIG["enabled"] else None
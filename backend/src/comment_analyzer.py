@@ -1,43 +1,182 @@
-from transformers import pipeline
-from collections import Counter, defaultdict
-from typing import List, Dict
+from collections import Counter, OrderedDict, defaultdict
+from typing import List, Dict, Optional
+import hashlib
 import logging
+import threading
+
+from src.backends import load_sentiment_pipeline
+from src.config import INFERENCE_CONFIG, SENTIMENT_CONFIG
+from src.metrics import SENTIMENT_TEXTS, stage_timer
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class SentimentCache:
+    """Ограниченный LRU-кэш тональностей по хэшу текста и id модели"""
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return model_name + ':' + hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            sentiment = self._items.get(key)
+            if sentiment is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return sentiment
+
+    def put(self, key: str, sentiment: str) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = sentiment
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._items),
+                'max_size': self.max_size,
+            }
+
 class CommentAnalyzer:
-    def __init__(self):
-        """Инициализация анализатора комментариев"""
+    def __init__(self, model_name: str = SENTIMENT_CONFIG["model_name"],
+                 batch_size: int = SENTIMENT_CONFIG["batch_size"],
+                 max_length: int = SENTIMENT_CONFIG["max_length"],
+                 cache_size: int = SENTIMENT_CONFIG["cache_size"],
+                 backend: str = INFERENCE_CONFIG["backend"],
+                 lazy: bool = False):
+        """
+        Инициализация анализатора комментариев.
+
+        При lazy=True модель не загружается в конструкторе: ее загружает
+        менеджер жизненного цикла вызовом load(). До загрузки все комментарии
+        получают нейтральную тональность.
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.model_id = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self.batch_size = batch_size
+        self.max_length = max_length
+        # Общий для всех методов кэш: повторный анализ того же треда - только поиск в словаре
+        self.sentiment_cache = SentimentCache(cache_size)
+        self.sentiment_analyzer = None
+        if not lazy:
+            self.load()
+
+    def __reduce__(self):
+        # В процесс инференса передается ссылка на глобальный анализатор, а не модель
+        return _shared_comment_analyzer, ()
+
+    def load(self) -> None:
+        """Загружает pipeline тональности (при ошибке анализатор остается без модели)"""
         try:
-            self.sentiment_analyzer = pipeline(
-                "sentiment-analysis", 
-                model="blanchefort/rubert-base-cased-sentiment"
-            )
+            self.sentiment_analyzer = load_sentiment_pipeline(self.model_name, self.backend)
             logger.info("Модель анализа тональности загружена успешно")
         except Exception as e:
             logger.error(f"Ошибка загрузки модели: {e}")
             self.sentiment_analyzer = None
 
+    def warmup(self, texts: List[str]) -> None:
+        """Прогон модели на батче текстов в обход кэша тональностей"""
+        if self.sentiment_analyzer:
+            self.sentiment_analyzer(texts, batch_size=self.batch_size, truncation=True, max_length=self.max_length)
+
     def analyze_sentiment(self, text: str) -> str:
         """Анализирует тональность текста"""
         if not self.sentiment_analyzer or not text or not text.strip():
             return 'нейтральная'
         
+        key = SentimentCache.make_key(self.model_id, text)
+        sentiment = self.sentiment_cache.get(key)
+        if sentiment is not None:
+            return sentiment
+        
+        return self._classify(text, key)
+
+    def _classify(self, text: str, key: str) -> str:
+        """Классифицирует текст, которого нет в кэше, и кладет результат в кэш"""
         try:
-            result = self.sentiment_analyzer(text[:512])[0]  # Ограничиваем длину текста
-            label = result['label']
-            
-            if label == 'POSITIVE':
-                return 'позитивная'
-            elif label == 'NEGATIVE':
-                return 'негативная'
-            else:
-                return 'нейтральная'
+            result = self.sentiment_analyzer(text, truncation=True, max_length=self.max_length)[0]
+            sentiment = self._map_label(result['label'])
         except Exception as e:
             logger.warning(f"Ошибка анализа тональности: {e}")
             return 'нейтральная'
+        
+        self.sentiment_cache.put(key, sentiment)
+        return sentiment
+
+    @staticmethod
+    def _map_label(label: str) -> str:
+        if label == 'POSITIVE':
+            return 'позитивная'
+        elif label == 'NEGATIVE':
+            return 'негативная'
+        else:
+            return 'нейтральная'
+
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[str]:
+        """
+        Батчевый анализ тональности списка текстов.
+
+        Одинаковые тексты классифицируются один раз, уже известные берутся
+        из кэша, остальные сортируются по длине (меньше паддинга в батче)
+        и обрезаются по токенам, а не по символам.
+        """
+        if not texts:
+            return []
+        if not self.sentiment_analyzer:
+            return ['нейтральная'] * len(texts)
+        
+        sentiments = {}
+        keys = {}
+        for text in set(texts):
+            if not text or not text.strip():
+                continue
+            keys[text] = SentimentCache.make_key(self.model_id, text)
+            sentiment = self.sentiment_cache.get(keys[text])
+            if sentiment is not None:
+                sentiments[text] = sentiment
+        
+        unique_texts = sorted((text for text in keys if text not in sentiments), key=len)
+        
+        if unique_texts:
+            try:
+                with stage_timer("sentiment"):
+                    results = self.sentiment_analyzer(
+                        unique_texts,
+                        batch_size=self.batch_size,
+                        truncation=True,
+                        max_length=self.max_length
+                    )
+                SENTIMENT_TEXTS.inc(len(unique_texts))
+                for text, result in zip(unique_texts, results):
+                    sentiments[text] = self._map_label(result['label'])
+                    self.sentiment_cache.put(keys[text], sentiments[text])
+            except Exception as e:
+                logger.warning(f"Ошибка батчевого анализа тональности: {e}")
+                # Промахи кэша по этим текстам уже учтены выше - по одному без повторного поиска в кэше
+                for text in unique_texts:
+                    sentiments[text] = self._classify(text, keys[text])
+        
+        return [sentiments.get(text, 'нейтральная') for text in texts]
 
     def process_comments(self, comments_list: List[Dict]) -> Dict:
         """
@@ -86,8 +225,9 @@ class CommentAnalyzer:
             sentiment_groups = defaultdict(list)
             sentiment_counts = Counter()
             
-            for comment in valid_comments:
-                sentiment = self.analyze_sentiment(comment['text'])
+            sentiments = self.analyze_sentiment_batch([comment['text'] for comment in valid_comments])
+            
+            for comment, sentiment in zip(valid_comments, sentiments):
                 sentiment_groups[sentiment].append(comment)
                 sentiment_counts[sentiment] += 1
             
@@ -161,12 +301,11 @@ class CommentAnalyzer:
             
             # Фильтруем по тональности если указана
             if sentiment:
-                filtered_comments = []
-                for comment in valid_comments:
-                    comment_sentiment = self.analyze_sentiment(comment['text'])
-                    if comment_sentiment == sentiment:
-                        filtered_comments.append(comment)
-                valid_comments = filtered_comments
+                comment_sentiments = self.analyze_sentiment_batch([str(comment['text']).strip() for comment in valid_comments])
+                valid_comments = [
+                    comment for comment, comment_sentiment in zip(valid_comments, comment_sentiments)
+                    if comment_sentiment == sentiment
+                ]
             
             # Объединяем все тексты
             all_texts = [str(comment['text']) for comment in valid_comments]
@@ -249,5 +388,9 @@ class CommentAnalyzer:
             logger.error(f"Ошибка создания сводки: {e}")
             return "Ошибка анализа комментариев"
 
-# Глобальный экземпляр анализатора
-comment_analyzer = CommentAnalyzer()
\ No newline at end of file
+# Глобальный экземпляр анализатора (модель загружается в src/lifecycle.py)
+comment_analyzer = CommentAnalyzer(lazy=True)
+
+
+def _shared_comment_analyzer() -> CommentAnalyzer:
+    return comment_analyzer
@@ -20,8 +20,133 @@
         - "temperature"          - уровень случайности (оптимально: 0.5-1.0);
         - "top_p"                - top-p sampling (оптимально: 0.7-0.95);
         - "repetition_penalty"   - штраф за повторы (оптимально: 1.0-1.5).
+
+3. CACHE_CONFIG: настройка кэша результатов суммаризации.
+
+    - Описание параметров:
+        - "enabled"          - включить кэширование;
+        - "db_path"          - путь к SQLite-файлу дискового кэша;
+        - "max_memory_items" - макс. число статей в LRU-кэше в памяти;
+        - "max_disk_items"   - макс. число статей в дисковом кэше;
+        - "ttl_seconds"      - время жизни записи в секундах.
+
+4. BATCHING_CONFIG: настройка общего батчинга запросов к модели суммаризации.
+
+    - Описание параметров:
+        - "max_batch_size" - макс. число текстов в одном вызове generate;
+        - "max_wait_ms"    - макс. время ожидания заполнения батча в мс;
+        - "parallel_sections" - отправлять все секции статьи в батчер сразу
+                                и стримить их по мере готовности.
+
+5. INFERENCE_CONFIG: настройка пула потоков для инференса моделей.
+
+    - Описание параметров:
+        - "max_concurrency" - макс. число одновременных вызовов моделей;
+        - "max_queue"       - макс. число задач в очереди (сверх лимита - отказ);
+        - "queue_timeout"   - макс. время ожидания в очереди в секундах;
+        - "backend"         - бэкенд инференса: "torch", "int8" (динамическая
+                              квантизация, CPU) или "onnx" (ONNX Runtime, CPU);
+        - "processes"       - число процессов инференса с общими (copy-on-write)
+                              весами моделей (0 - инференс в процессе API);
+        - "threads_per_process" - потоков intra-op PyTorch на процесс инференса
+                                  (0 - ядра делятся поровну между процессами);
+        - "pin_cpus"        - закреплять за каждым процессом инференса свои ядра.
+
+6. FETCH_CONFIG: настройка загрузки страниц с Habr.
+
+    - Описание параметров:
+        - "max_connections"    - макс. размер общего пула соединений;
+        - "max_keepalive"      - макс. число keep-alive соединений в пуле;
+        - "max_per_host"       - макс. число одновременных запросов к одному хосту;
+        - "timeout"            - таймаут запроса в секундах;
+        - "connect_timeout"    - таймаут установки соединения в секундах.
+
+7. SENTIMENT_CONFIG: настройка анализа тональности комментариев.
+
+    - Описание параметров:
+        - "model_name" - название модели c HuggingFace Hub;
+        - "batch_size" - размер батча при анализе комментариев;
+        - "max_length" - макс. длина комментария в токенах (остальное обрезается);
+        - "cache_size" - макс. число запомненных тональностей комментариев.
+
+8. LIFECYCLE_CONFIG: настройка фоновой загрузки и прогрева моделей при старте.
+
+    - Описание параметров:
+        - "warmup"               - выполнять прогрев моделей перед готовностью;
+        - "warmup_batch_sizes"   - размеры батчей, на которых прогревается generate;
+        - "warmup_input_tokens"  - длины входов прогрева в токенах;
+        - "warmup_output_tokens" - макс. длина суммаризации при прогреве.
+
+9. SUMMARIZATION_CONFIG: выбор пресета и переключение на запасную модель.
+
+    - Описание параметров:
+        - "default_preset"         - пресет из GENERATION_PRESETS, если запрос его не указал;
+        - "fallback_enabled"       - переключаться на модель "fallback" из MODEL_CONFIG;
+        - "section_latency_budget" - макс. время суммаризации секции основной моделью
+                                     в секундах, после которого секция отдается запасной.
+
+10. DEGRADATION_CONFIG: упрощение генерации под нагрузкой ради ограниченного p95.
+
+    - Описание параметров:
+        - "enabled"         - включить контроллер деградации;
+        - "target_p95"      - целевой p95 времени суммаризации секции в секундах;
+        - "max_queue_depth" - глубина очереди инференса, при которой генерация упрощается;
+        - "window_seconds"  - окно, за которое считается p95;
+        - "cooldown"        - мин. время между сменами уровня в секундах;
+        - "levels"          - уровни генерации от полного к самому простому:
+                              "num_beams" - макс. число лучей, "do_sample" - сэмплирование,
+                              "length_factor" - множитель max_length/min_length.
+
+11. BULK_CONFIG: настройка пакетной суммаризации `/summarize/batch`.
+
+    - Описание параметров:
+        - "max_concurrency" - макс. число статей, обрабатываемых одновременно;
+        - "max_urls"        - макс. число ссылок в одном запросе.
+
+12. COALESCING_CONFIG: объединение одновременных запросов одной статьи.
+
+    - Описание параметров:
+        - "enabled" - обслуживать одновременные запросы одной статьи одним прогоном.
+
+13. JOBS_CONFIG: настройка очереди задач суммаризации `/jobs`.
+
+    - Описание параметров:
+        - "db_path"       - путь к SQLite-файлу задач и их событий;
+        - "workers"       - число воркеров в процессе API (0 - задачи выполняет
+                            отдельный процесс `python -m src.jobs`);
+        - "max_queued"    - макс. число задач в очереди (сверх лимита - отказ);
+        - "ttl_seconds"   - время хранения завершенной задачи в секундах;
+        - "lease_seconds" - время без событий, после которого задача считается
+                            прерванной и возвращается в очередь;
+        - "poll_interval" - интервал опроса очереди и новых событий в секундах;
+        - "flush_events"  - макс. число фрагментов `section_delta` в одной записи
+                            событий (остальные события записываются сразу).
+
+14. RATINGS_CONFIG: настройка записи оценок `/rate`.
+
+    - Описание параметров:
+        - "group_commit"      - записывать оценки группами одной транзакцией;
+        - "flush_interval_ms" - макс. время сбора группы в мс;
+        - "max_batch_size"    - макс. число оценок в одной транзакции.
+
+15. METRICS_CONFIG: настройка метрик стадий конвейера (`/metrics`).
+
+    - Описание параметров:
+        - "enabled" - собирать метрики и отдавать их на `/metrics`.
+
+16. PROFILING_CONFIG: профилирование отдельных запросов `/summarize` по требованию.
+
+    - Описание параметров:
+        - "admin_token"  - токен администратора (заголовок `X-Admin-Token`),
+                           пустой токен - профилирование выключено;
+        - "dir"          - директория сохраненных профилей;
+        - "interval_ms"  - интервал сэмплирования стеков в мс;
+        - "max_profiles" - макс. число хранимых профилей (старые удаляются);
+        - "torch_trace"  - дополнительно записывать Chrome trace torch.profiler.
 """
 
+import os
+
 MODEL_CONFIG = {
     "primary": {
         "model_name": "denisnaenko/t5_habr_summarizer", 
@@ -38,6 +163,12 @@ MODEL_CONFIG = {
 }
 
 GENERATION_PRESETS = {
+    "default": {
+        "num_beams": 5,
+        "length_penalty": 2.0,
+        "no_repeat_ngram_size": 2,
+        "early_stopping": True,
+    },
     "general": {
         "num_beams": 3,
         "length_penalty": 0.9,
@@ -49,3 +180,109 @@ GENERATION_PRESETS = {
         "repetition_penalty": 1.15,
     },
 }
+
+CACHE_CONFIG = {
+    "enabled": os.getenv("SUMMARY_CACHE_ENABLED", "1") == "1",
+    "db_path": os.getenv("SUMMARY_CACHE_PATH", "./summary_cache.db"),
+    "max_memory_items": 256,
+    "max_disk_items": 10000,
+    "ttl_seconds": 7 * 24 * 60 * 60,
+}
+
+BATCHING_CONFIG = {
+    "max_batch_size": int(os.getenv("BATCH_MAX_SIZE", "8")),
+    "max_wait_ms": float(os.getenv("BATCH_MAX_WAIT_MS", "20")),
+    "parallel_sections": os.getenv("BATCH_PARALLEL_SECTIONS", "1") == "1",
+}
+
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+
+INFERENCE_CONFIG = {
+    # В режиме пула процессов одновременных вызовов не меньше, чем процессов
+    "max_concurrency": int(os.getenv("INFERENCE_MAX_CONCURRENCY", str(max(2, INFERENCE_PROCESSES)))),
+    "max_queue": int(os.getenv("INFERENCE_MAX_QUEUE", "256")),
+    "queue_timeout": float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "60")),
+    "backend": os.getenv("INFERENCE_BACKEND", "torch"),
+    "processes": INFERENCE_PROCESSES,
+    "threads_per_process": int(os.getenv("INFERENCE_THREADS_PER_PROCESS", "0")),
+    "pin_cpus": os.getenv("INFERENCE_PIN_CPUS", "1") == "1",
+}
+
+FETCH_CONFIG = {
+    "max_connections": int(os.getenv("FETCH_MAX_CONNECTIONS", "50")),
+    "max_keepalive": int(os.getenv("FETCH_MAX_KEEPALIVE", "20")),
+    "max_per_host": int(os.getenv("FETCH_MAX_PER_HOST", "10")),
+    "timeout": float(os.getenv("FETCH_TIMEOUT", "10")),
+    "connect_timeout": float(os.getenv("FETCH_CONNECT_TIMEOUT", "5")),
+}
+
+SENTIMENT_CONFIG = {
+    "model_name": "blanchefort/rubert-base-cased-sentiment",
+    "batch_size": int(os.getenv("SENTIMENT_BATCH_SIZE", "32")),
+    "max_length": 512,
+    "cache_size": int(os.getenv("SENTIMENT_CACHE_SIZE", "50000")),
+}
+
+LIFECYCLE_CONFIG = {
+    "warmup": os.getenv("MODEL_WARMUP", "1") == "1",
+    "warmup_batch_sizes": [1, BATCHING_CONFIG["max_batch_size"]],
+    "warmup_input_tokens": [64, 512],
+    "warmup_output_tokens": int(os.getenv("MODEL_WARMUP_OUTPUT_TOKENS", "16")),
+}
+
+SUMMARIZATION_CONFIG = {
+    "default_preset": os.getenv("GENERATION_PRESET", "default"),
+    "fallback_enabled": os.getenv("MODEL_FALLBACK_ENABLED", "1") == "1",
+    "section_latency_budget": float(os.getenv("SECTION_LATENCY_BUDGET", "60")),
+}
+
+DEGRADATION_CONFIG = {
+    "enabled": os.getenv("DEGRADATION_ENABLED", "1") == "1",
+    "target_p95": float(os.getenv("DEGRADATION_TARGET_P95", "20")),
+    "max_queue_depth": int(os.getenv("DEGRADATION_MAX_QUEUE_DEPTH", "32")),
+    "window_seconds": 60.0,
+    "cooldown": float(os.getenv("DEGRADATION_COOLDOWN", "10")),
+    "levels": [
+        {"name": "full"},
+        {"name": "fewer_beams", "num_beams": 2},
+        {"name": "short", "num_beams": 2, "length_factor": 0.6},
+        {"name": "greedy", "num_beams": 1, "do_sample": False, "length_factor": 0.5},
+    ],
+}
+
+BULK_CONFIG = {
+    "max_concurrency": int(os.getenv("BULK_MAX_CONCURRENCY", "4")),
+    "max_urls": int(os.getenv("BULK_MAX_URLS", "100")),
+}
+
+COALESCING_CONFIG = {
+    "enabled": os.getenv("REQUEST_COALESCING_ENABLED", "1") == "1",
+}
+
+JOBS_CONFIG = {
+    "db_path": os.getenv("JOBS_DB_PATH", "./jobs.db"),
+    "workers": int(os.getenv("JOBS_WORKERS", "2")),
+    "max_queued": int(os.getenv("JOBS_MAX_QUEUED", "1000")),
+    "ttl_seconds": float(os.getenv("JOBS_TTL_SECONDS", str(24 * 60 * 60))),
+    "lease_seconds": float(os.getenv("JOBS_LEASE_SECONDS", "300")),
+    "poll_interval": 0.5,
+    "flush_events": int(os.getenv("JOBS_FLUSH_EVENTS", "32")),
+}
+
+RATINGS_CONFIG = {
+    "group_commit": os.getenv("RATINGS_GROUP_COMMIT", "1") == "1",
+    "flush_interval_ms": float(os.getenv("RATINGS_FLUSH_INTERVAL_MS", "20")),
+    "max_batch_size": int(os.getenv("RATINGS_MAX_BATCH_SIZE", "256")),
+}
+
+METRICS_CONFIG = {
+    "enabled": os.getenv("METRICS_ENABLED", "1") == "1",
+}
+
+PROFILING_CONFIG = {
+    "admin_token": os.getenv("PROFILING_ADMIN_TOKEN", ""),
+    "dir": os.getenv("PROFILES_DIR", "./profiles"),
+    "interval_ms": float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+    "max_profiles": int(os.getenv("PROFILING_MAX_PROFILES", "50")),
+    "torch_trace": os.getenv("PROFILING_TORCH_TRACE", "1") == "1",
+}
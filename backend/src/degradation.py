@@ -0,0 +1,151 @@
+"""degradation.py - деградация параметров генерации под нагрузкой.
+
+Контроллер держит текущий уровень генерации из DEGRADATION_CONFIG["levels"]:
+от полного beam search до жадного декодирования с укороченной суммаризацией.
+Перед суммаризацией каждой секции он смотрит на два сигнала:
+    - глубину очереди инференса (тексты в батчерах + задачи в пуле);
+    - p95 времени суммаризации секций за последние `window_seconds`.
+
+Если очередь длиннее `max_queue_depth` или p95 выше `target_p95`, уровень
+понижается на одну ступень; когда очередь почти пуста, а p95 ниже половины
+цели, уровень повышается обратно. Между сменами уровня проходит не меньше
+`cooldown` секунд, чтобы контроллер не раскачивался от каждой секции.
+
+Текущий уровень отдается в метаданных SSE, в `/inference/stats` и на
+`/metrics` (gauge `habr_degradation_level`: номер уровня, 0 - полная генерация).
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from src.config import DEGRADATION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Параметры, которые имеют смысл только для beam search
+BEAM_ONLY_PARAMS = ("early_stopping", "length_penalty")
+
+
+class DegradationController:
+    def __init__(self, levels: List[Dict[str, Any]], enabled: bool = True, target_p95: float = 20.0,
+                 max_queue_depth: int = 32, window_seconds: float = 60.0, cooldown: float = 10.0):
+        """Инициализация контроллера (уровень 0 - генерация без изменений)"""
+        self.levels = levels
+        self.enabled = enabled
+        self.target_p95 = target_p95
+        self.max_queue_depth = max_queue_depth
+        self.window_seconds = window_seconds
+        self.cooldown = cooldown
+
+        self.level = 0
+        self.reason: Optional[str] = None
+        self._changed_at = 0.0
+        self._queue_depth = 0
+        self._latencies: deque = deque()
+        self._decisions: deque = deque(maxlen=20)
+        self._sections_by_level = Counter()
+        self._transitions = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Запоминает время суммаризации секции"""
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def _p95(self, now: float) -> Optional[float]:
+        while self._latencies and now - self._latencies[0][0] > self.window_seconds:
+            self._latencies.popleft()
+        if not self._latencies:
+            return None
+        latencies = sorted(seconds for _, seconds in self._latencies)
+        return latencies[math.ceil(len(latencies) * 0.95) - 1]
+
+    def decide(self, queue_depth: int) -> Dict[str, Any]:
+        """Пересчитывает уровень по текущей нагрузке и возвращает его"""
+        if not self.enabled:
+            return self.levels[0]
+
+        now = time.monotonic()
+        with self._lock:
+            self._queue_depth = queue_depth
+            p95 = self._p95(now)
+
+            if now - self._changed_at >= self.cooldown:
+                if queue_depth >= self.max_queue_depth and self.level < len(self.levels) - 1:
+                    self._set_level(self.level + 1, f"queue_depth={queue_depth}>={self.max_queue_depth}", now)
+                elif p95 is not None and p95 > self.target_p95 and self.level < len(self.levels) - 1:
+                    self._set_level(self.level + 1, f"p95={p95:.2f}s>{self.target_p95}s", now)
+                elif (self.level > 0 and queue_depth <= self.max_queue_depth // 4
+                        and (p95 is None or p95 < self.target_p95 / 2)):
+                    p95_text = f"{p95:.2f}s" if p95 is not None else "n/a"
+                    self._set_level(self.level - 1, f"queue_depth={queue_depth}, p95={p95_text}", now)
+
+            self._sections_by_level[self.levels[self.level]["name"]] += 1
+            return self.levels[self.level]
+
+    def _set_level(self, level: int, reason: str, now: float) -> None:
+        previous = self.levels[self.level]["name"]
+        self.level = level
+        self.reason = reason
+        self._changed_at = now
+        self._transitions += 1
+        self._decisions.append({
+            'time': round(time.time(), 3),
+            'from': previous,
+            'to': self.levels[level]["name"],
+            'reason': reason,
+        })
+        logger.warning(f"Уровень генерации: {previous} -> {self.levels[level]['name']} ({reason})")
+
+    @staticmethod
+    def apply(generation_params: Dict[str, Any], level: Dict[str, Any]) -> Dict[str, Any]:
+        """Параметры generate с учетом уровня (уровень может только упростить генерацию)"""
+        params = dict(generation_params)
+
+        if "num_beams" in level:
+            params["num_beams"] = min(params.get("num_beams", 1), level["num_beams"])
+        if "do_sample" in level:
+            params["do_sample"] = level["do_sample"]
+        if params.get("num_beams", 1) == 1:
+            for key in BEAM_ONLY_PARAMS:
+                params.pop(key, None)
+
+        if "length_factor" in level:
+            params["max_length"] = max(1, int(params["max_length"] * level["length_factor"]))
+            params["min_length"] = min(int(params.get("min_length", 0) * level["length_factor"]),
+                                       params["max_length"])
+        return params
+
+    def current(self) -> Dict[str, Any]:
+        """Текущий уровень и причина последней смены (для метаданных потока)"""
+        return {'level': self.levels[self.level]["name"], 'reason': self.reason}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            p95 = self._p95(time.monotonic())
+            return {
+                'enabled': self.enabled,
+                'level': self.levels[self.level]["name"],
+                'reason': self.reason,
+                'queue_depth': self._queue_depth,
+                'section_p95_s': round(p95, 3) if p95 is not None else None,
+                'target_p95_s': self.target_p95,
+                'transitions': self._transitions,
+                'sections_by_level': dict(self._sections_by_level),
+                'decisions': list(self._decisions),
+            }
+
+
+# Глобальный контроллер деградации
+degradation_controller = DegradationController(
+    DEGRADATION_CONFIG["levels"],
+    enabled=DEGRADATION_CONFIG["enabled"],
+    target_p95=DEGRADATION_CONFIG["target_p95"],
+    max_queue_depth=DEGRADATION_CONFIG["max_queue_depth"],
+    window_seconds=DEGRADATION_CONFIG["window_seconds"],
+    cooldown=DEGRADATION_CONFIG["cooldown"],
+)
@@ -0,0 +1,28 @@
+"""events.py - формат SSE-событий потока суммаризации.
+
+Каждое событие - строка `data: {json}\n\n`. Эти же строки хранит кэш
+суммаризаций и разбирают потребители конвейера, которым нужен итоговый
+результат, а не поток (например, `/summarize/batch`).
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+
+def format_event(payload: Dict[str, Any]) -> str:
+    """Сериализует событие в строку SSE"""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def parse_event(chunk: str) -> Dict[str, Any]:
+    """Возвращает данные SSE-события вида `data: {...}` (пустой словарь, если это не событие)"""
+    try:
+        event = json.loads(chunk[len("data: "):])
+    except ValueError:
+        return {}
+    return event if isinstance(event, dict) else {}
+
+
+def event_type(chunk: str) -> Optional[str]:
+    """Тип SSE-события (None, если это не событие): по разобранному JSON, а не по началу строки"""
+    return parse_event(chunk).get('type')
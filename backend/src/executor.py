@@ -0,0 +1,118 @@
+"""executor.py - выполнение инференса моделей вне event loop.
+
+Вызовы T5 и модели тональности блокируют поток на секунды, поэтому они
+выполняются в выделенном пуле потоков. Число одновременных вызовов
+ограничено `max_concurrency`, а очередь ожидающих задач - `max_queue`:
+при переполнении задача сразу отклоняется с `InferenceOverloaded`.
+
+Если запущен пул процессов инференса (src/process_pool.py), поток пула
+только передает вызов одному из процессов и ждет результат.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from src.config import INFERENCE_CONFIG
+from src.process_pool import process_pool
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceOverloaded(Exception):
+    """Очередь инференса переполнена"""
+
+
+class InferenceExecutor:
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 256, queue_timeout: float = 60):
+        """Инициализация пула потоков для инференса"""
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="inference")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._active = 0
+        self._counters = {
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+        }
+
+    def is_saturated(self) -> bool:
+        """Очередь заполнена, новые задачи будут отклонены"""
+        return self._waiting >= self.max_queue
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет fn(*args, **kwargs) в пуле потоков с учетом лимитов"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+
+        if self.is_saturated():
+            self._counters['rejected'] += 1
+            raise InferenceOverloaded("Сервис перегружен, попробуйте позже")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._counters['rejected'] += 1
+            raise InferenceOverloaded("Превышено время ожидания в очереди инференса")
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        self._active += 1
+
+        def _release(_):
+            # Слот освобождается только когда поток реально завершил работу,
+            # даже если ожидающая корутина была отменена
+            loop.call_soon_threadsafe(self._finish, semaphore)
+
+        try:
+            if process_pool.is_running():
+                concurrent_future = self._pool.submit(partial(process_pool.call, fn, *args, **kwargs))
+            else:
+                concurrent_future = self._pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._finish(semaphore)
+            raise
+        concurrent_future.add_done_callback(_release)
+
+        try:
+            result = await asyncio.wrap_future(concurrent_future)
+        except Exception:
+            self._counters['failed'] += 1
+            raise
+
+        self._counters['completed'] += 1
+        return result
+
+    def _finish(self, semaphore: asyncio.Semaphore) -> None:
+        self._active -= 1
+        semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика пула инференса"""
+        return {
+            **self._counters,
+            'active': self._active,
+            'waiting': self._waiting,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Глобальный пул инференса
+inference_executor = InferenceExecutor(
+    max_concurrency=INFERENCE_CONFIG["max_concurrency"],
+    max_queue=INFERENCE_CONFIG["max_queue"],
+    queue_timeout=INFERENCE_CONFIG["queue_timeout"],
+)
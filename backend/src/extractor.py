@@ -0,0 +1,193 @@
+"""extractor.py - однопроходное извлечение статьи Habr через lxml.
+
+Прежний путь разбирает страницу трижды: BeautifulSoup (html.parser)
+снимает со статьи все теги, кроме структурных, и сериализует тело обратно
+в строку, затем clean_text нормализует пробелы в этой строке, и
+parse_html_content строит из нее второе дерево BeautifulSoup.
+
+Здесь страница разбирается один раз парсером libxml2 (lxml), а тело статьи
+обходится один раз: теги из KEEP_TAGS остаются узлами, текст остальных
+тегов склеивается в непрерывные фрагменты - то же дерево, что получалось
+после unwrap, сериализации и повторного разбора. Из него сразу строится
+структура [{header, content}], которую ожидает суммаризатор; результат
+совпадает с parse_html_content(clean_text(...)) прежнего пути.
+"""
+
+from typing import Any, Dict, List, Tuple, Union
+
+import lxml.html
+from lxml import etree
+
+# Теги, которые прежний путь не снимал с тела статьи
+KEEP_TAGS = {'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'li', 'blockquote', 'br', 'b'}
+# Заголовки, начинающие новую секцию (h4-h6 идут в текст секции)
+HEADER_TAGS = {'h2', 'h3'}
+
+# Узел упрощенного дерева: (тег, дети), дети - строки и такие же узлы
+Node = Tuple[str, List[Union[str, 'Node']]]
+
+
+def _by_class(tag: str, class_name: str) -> etree.XPath:
+    return etree.XPath(
+        f'.//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]'
+    )
+
+
+FIND_TITLE = _by_class('h1', 'tm-title')
+FIND_AUTHOR = _by_class('span', 'tm-user-info__user')
+FIND_READING_TIME = _by_class('span', 'tm-article-reading-time__label')
+FIND_VIEWS = _by_class('span', 'tm-icon-counter__value')
+FIND_TAGS = _by_class('a', 'tm-tags-list__link')
+FIND_BODY = etree.XPath('.//div[@id="post-content-body"]')
+
+
+def _required(elements: list, what: str):
+    if not elements:
+        raise ValueError(f"На странице не найден элемент: {what}")
+    return elements[0]
+
+
+def _normalize(text: str) -> str:
+    """Схлопывает пробельные символы, как clean_text, и обрезает края"""
+    return ' '.join(text.split())
+
+
+def flatten(element) -> List[Union[str, Node]]:
+    """
+    Дети элемента после снятия всех тегов, кроме KEEP_TAGS: соседние куски
+    текста склеиваются в один фрагмент, сохраненные теги становятся узлами.
+    """
+    children: List[Union[list, Node]] = []
+
+    def add_text(text):
+        if not text:
+            return
+        if children and isinstance(children[-1], list):
+            children[-1].append(text)
+        else:
+            children.append([text])
+
+    def walk(parent):
+        for child in parent:
+            if isinstance(child.tag, str):
+                if child.tag in KEEP_TAGS:
+                    children.append((child.tag, flatten(child)))
+                else:
+                    add_text(child.text)
+                    walk(child)
+            add_text(child.tail)
+
+    add_text(element.text)
+    walk(element)
+    return [''.join(child) if isinstance(child, list) else child for child in children]
+
+
+def get_text(children: List[Union[str, Node]]) -> str:
+    """Аналог get_text(strip=True): обрезанные фрагменты текста без разделителя"""
+    parts = []
+    for child in children:
+        if isinstance(child, str):
+            text = _normalize(child)
+            if text:
+                parts.append(text)
+        else:
+            parts.append(get_text(child[1]))
+    return ''.join(parts)
+
+
+def build_structure(children: List[Union[str, Node]]) -> List[Dict[str, Any]]:
+    """Секции [{header, content}] из упрощенного дерева тела статьи"""
+    result = []
+    current_header = None
+    current_content = []
+
+    for child in children:
+        if isinstance(child, str):
+            text = _normalize(child)
+            if text:
+                current_content.append(text)
+            continue
+
+        tag, kids = child
+        if tag in HEADER_TAGS:
+            if current_content:
+                result.append({'header': current_header, 'content': current_content})
+                current_content = []
+            current_header = get_text(kids)
+        elif tag == 'blockquote':
+            # Цитата делится на части по <br>
+            parts = []
+            current_part = []
+            for kid in kids:
+                if not isinstance(kid, str) and kid[0] == 'br':
+                    if current_part:
+                        parts.append(' '.join(current_part))
+                        current_part = []
+                    continue
+                text = _normalize(kid) if isinstance(kid, str) else get_text(kid[1])
+                if text:
+                    current_part.append(text)
+            if current_part:
+                parts.append(' '.join(current_part))
+            if parts:
+                current_content.append(parts)
+        elif tag == 'ul':
+            list_items = [get_text(kid[1]) for kid in kids if not isinstance(kid, str) and kid[0] == 'li']
+            if list_items:
+                current_content.append(list_items)
+        elif tag not in ('br', 'b'):
+            text = get_text(kids)
+            if text:
+                current_content.append(text)
+
+    if current_content:
+        result.append({'header': current_header, 'content': current_content})
+
+    return result
+
+
+def structure_text(structure: List[Dict[str, Any]]) -> str:
+    """Плоский текст статьи из структуры секций (для ключа кэша и логов)"""
+    parts = []
+    for section in structure:
+        if section['header']:
+            parts.append(section['header'])
+        for item in section['content']:
+            parts.append(item if isinstance(item, str) else ' '.join(item))
+    return '\n'.join(parts)
+
+
+def extract_article_page(html: str, url: str) -> Dict[str, Any]:
+    """
+    Разбирает HTML статьи (без комментариев) за один проход.
+
+    Возвращает те же поля, что parse_article_page, но вместо HTML тела
+    статьи - готовую структуру секций `structure` и ее плоский текст
+    `text_content`.
+    """
+    root = lxml.html.fromstring(html)
+    data = {}
+
+    data['url'] = url
+    data['title'] = _required(FIND_TITLE(root), 'заголовок').text_content().strip()
+    data['author'] = _required(FIND_AUTHOR(root), 'автор').text_content().strip().split(' ')[0]
+    data['date'] = _required(root.xpath('.//time'), 'дата').attrib['datetime']
+
+    reading_time = FIND_READING_TIME(root)
+    data['reading_time'] = reading_time[0].text_content().strip() if reading_time else None
+
+    views = FIND_VIEWS(root)
+    data['views'] = views[-1].text_content().strip() if views else None
+
+    body = FIND_BODY(root)
+    if body:
+        data['structure'] = build_structure(flatten(body[0]))
+        data['image_content'] = [str(src) for src in body[0].xpath('.//img/@src')]
+    else:
+        data['structure'] = []
+        data['image_content'] = []
+    data['text_content'] = structure_text(data['structure'])
+
+    data['tags'] = [tag.text_content().strip() for tag in FIND_TAGS(root)]
+
+    return data
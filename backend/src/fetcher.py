@@ -0,0 +1,76 @@
+"""fetcher.py - асинхронная загрузка страниц с общим пулом соединений.
+
+Один `httpx.AsyncClient` на процесс держит keep-alive соединения к habr.com,
+поэтому повторные запросы не тратят время на TCP/TLS-рукопожатие. Число
+одновременных запросов к одному хосту ограничено семафором.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from src.config import FETCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0'
+
+
+class HabrFetcher:
+    def __init__(self, max_connections: int = 50, max_keepalive: int = 20, max_per_host: int = 10,
+                 timeout: float = 10, connect_timeout: float = 5):
+        """Инициализация параметров пула (сам клиент создается лениво)"""
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={'User-Agent': USER_AGENT},
+                verify=False,
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, url: str) -> str:
+        """Загружает страницу и возвращает ее текст (исключение при ошибке HTTP)"""
+        async with self._host_limit(url):
+            response = await self._get_client().get(url)
+            response.raise_for_status()
+            return response.text
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Глобальный загрузчик страниц
+habr_fetcher = HabrFetcher(
+    max_connections=FETCH_CONFIG["max_connections"],
+    max_keepalive=FETCH_CONFIG["max_keepalive"],
+    max_per_host=FETCH_CONFIG["max_per_host"],
+    timeout=FETCH_CONFIG["timeout"],
+    connect_timeout=FETCH_CONFIG["connect_timeout"],
+)
@@ -0,0 +1,422 @@
+"""jobs.py - очередь задач суммаризации с сохраняемыми потоками событий.
+
+Поток `/summarize` привязан к одному HTTP-соединению: если клиент
+отключился посреди суммаризации, работа теряется. Задача (`POST /jobs`)
+живет отдельно от соединения:
+    - задача и ее события хранятся в SQLite: каждое SSE-событие получает
+      порядковый номер `seq` внутри задачи;
+    - пул воркеров забирает задачи из очереди и прогоняет их через тот же
+      конвейер, что и `/summarize` (src/pipeline.py);
+    - клиент читает события `GET /jobs/{id}/events` и после обрыва
+      продолжает с места остановки по заголовку `Last-Event-ID`;
+    - завершенные задачи и их события хранятся `ttl_seconds`.
+
+Воркер пишет события в базу пачками одной транзакцией: пачка сбрасывается
+на каждом событии, кроме фрагментов `section_delta`, а фрагменты копятся до
+`flush_events` штук или до `poll_interval` секунд. Все обращения к SQLite
+из event loop выполняются в потоке (asyncio.to_thread).
+
+Выполняемая задача продлевает аренду (`heartbeat_at`) с каждой пачкой.
+Задачи, аренда которых истекла (`lease_seconds` без событий - процесс
+воркера остановлен или упал), возвращаются в очередь; перед повторным
+прогоном в поток добавляется событие `restarted`, после которого события
+идут заново с `metadata`. Номер попытки (`attempts`) служит признаком
+владения: события и завершение записываются, только пока задача
+выполняется в той же попытке, поэтому прогон, у которого задачу забрали
+(аренда истекла, а он еще работает), не пишет события поверх нового
+прогона, а останавливается.
+
+Воркеры могут работать в отдельном процессе с общей базой задач
+(`python -m src.jobs`), тогда у API-процесса `JOBS_WORKERS=0`.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from src.config import JOBS_CONFIG
+from src.events import format_event, parse_event
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('done', 'failed')
+
+
+class JobQueueFull(Exception):
+    """В очереди слишком много задач"""
+
+
+class JobStore:
+    def __init__(self, db_path: str, ttl_seconds: float = 24 * 60 * 60, max_queued: int = 1000,
+                 lease_seconds: float = 300):
+        """Инициализация хранилища и создание таблиц в SQLite"""
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.max_queued = max_queued
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "url TEXT NOT NULL, "
+            "preset TEXT NOT NULL, "
+            "stream_tokens INTEGER NOT NULL, "
+            "status TEXT NOT NULL, "
+            "error TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, "
+            "started_at REAL, "
+            "heartbeat_at REAL, "
+            "finished_at REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_status_created_at ON jobs (status, created_at)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "job_id TEXT NOT NULL, "
+            "seq INTEGER NOT NULL, "
+            "event TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, seq))"
+        )
+        self._db.commit()
+
+    def create(self, url: str, preset: str, stream_tokens: bool = False) -> str:
+        """Ставит задачу в очередь и возвращает ее id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            queued = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            if queued >= self.max_queued:
+                raise JobQueueFull("Очередь задач заполнена, попробуйте позже")
+
+            self._db.execute(
+                "INSERT INTO jobs (id, url, preset, stream_tokens, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, url, preset, int(stream_tokens), time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Забирает самую старую задачу из очереди. Захват условный (`status = 'queued'`),
+        поэтому одну задачу не заберут два воркера, даже из разных процессов.
+        """
+        with self._lock:
+            while True:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+
+                now = time.time()
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+                    (now, now, row[0])
+                ).rowcount
+                self._db.commit()
+                if claimed:
+                    return self._get(row[0])
+
+    def append_events(self, job_id: str, attempt: int, events: List[Tuple[int, str]]) -> bool:
+        """
+        Сохраняет пачку SSE-событий задачи (seq, событие) одной транзакцией и
+        продлевает аренду. False - задача больше не выполняется в этой попытке
+        (ее вернули в очередь или забрал другой воркер), события не записаны
+        """
+        with self._lock:
+            owned = self._db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND attempts = ? AND status = 'running'",
+                (time.time(), job_id, attempt)
+            ).rowcount
+            if not owned:
+                self._db.rollback()
+                return False
+            self._db.executemany(
+                "INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                [(job_id, seq, chunk) for seq, chunk in events]
+            )
+            self._db.commit()
+        return True
+
+    def last_seq(self, job_id: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(seq) FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def finish(self, job_id: str, attempt: int, status: str, error: Optional[str] = None) -> bool:
+        """Отмечает задачу завершенной (status: done или failed), если она еще в этой попытке"""
+        with self._lock:
+            finished = self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND attempts = ? AND status = 'running'",
+                (status, error, time.time(), job_id, attempt)
+            ).rowcount
+            self._db.commit()
+        return bool(finished)
+
+    def poll(self, job_id: str, after_seq: int = 0) -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, str]]]:
+        """Состояние задачи и ее события после after_seq (состояние читается первым)"""
+        with self._lock:
+            job = self._get(job_id)
+            events = self._db.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return job, events
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Состояние задачи или None, если ее нет (или срок хранения истек)"""
+        with self._lock:
+            return self._get(job_id)
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT id, url, preset, stream_tokens, status, error, attempts, "
+            "created_at, started_at, finished_at, "
+            "(SELECT COUNT(*) FROM job_events WHERE job_id = jobs.id) "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {
+            'id': row[0],
+            'url': row[1],
+            'preset': row[2],
+            'stream_tokens': bool(row[3]),
+            'status': row[4],
+            'error': row[5],
+            'attempts': row[6],
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9],
+            'events': row[10],
+        }
+
+    def requeue_stale(self) -> int:
+        """Возвращает в очередь выполняемые задачи с истекшей арендой"""
+        with self._lock:
+            requeued = self._db.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (time.time() - self.lease_seconds,)
+            ).rowcount
+            self._db.commit()
+        return max(requeued, 0)
+
+    def purge_expired(self) -> int:
+        """Удаляет завершенные задачи старше ttl_seconds вместе с событиями"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM job_events WHERE job_id IN ("
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?)",
+                (cutoff,)
+            )
+            purged = self._db.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            ).rowcount
+            self._db.commit()
+        return max(purged, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Число задач по статусам"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ('queued', 'running', *FINISHED_STATUSES)}
+        counts.update(dict(rows))
+        return counts
+
+
+class JobLost(Exception):
+    """Задачу вернули в очередь или забрал другой воркер, пока прогон еще шел"""
+
+
+class JobWorkers:
+    def __init__(self, store: JobStore, workers: int = 2, poll_interval: float = 0.5,
+                 flush_events: int = 32):
+        """Инициализация пула воркеров (workers=0 - задачи выполняет другой процесс)"""
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.flush_events = flush_events
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._counters = {
+            'completed': 0,
+            'failed': 0,
+            'requeued': 0,
+            'purged': 0,
+            'lost': 0,
+        }
+
+    def start(self) -> None:
+        """Запускает воркеры в текущем event loop"""
+        if self.workers <= 0 or self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Запущено воркеров задач: {self.workers}")
+
+    async def join(self) -> None:
+        """Ждет завершения воркеров (для отдельного процесса воркеров)"""
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Будит воркеры после постановки новой задачи"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, index: int) -> None:
+        # Импорт здесь: конвейер тянет за собой модели и кэш
+        from src.lifecycle import model_manager
+
+        while not model_manager.is_ready():
+            await asyncio.sleep(self.poll_interval)
+
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                self._counters['requeued'] += await asyncio.to_thread(self.store.requeue_stale)
+                self._counters['purged'] += await asyncio.to_thread(self.store.purge_expired)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.run_job(job)
+            except JobLost:
+                logger.warning(f"Воркер {index}: задача {job['id']} перехвачена другим прогоном, "
+                               f"попытка {job['attempts']} остановлена")
+                self._counters['lost'] += 1
+            except Exception as e:
+                logger.error(f"Воркер {index}: задача {job['id']} завершилась с ошибкой: {e}")
+                if await asyncio.to_thread(self.store.finish, job['id'], job['attempts'], 'failed', str(e)):
+                    self._counters['failed'] += 1
+
+    async def run_job(self, job: Dict[str, Any]) -> None:
+        """
+        Прогоняет задачу через конвейер статьи, сохраняя события пачками.
+        JobLost - задача больше не принадлежит этой попытке, прогон остановлен
+        """
+        from src.pipeline import coalesced_article_events
+
+        job_id, attempt = job['id'], job['attempts']
+        buffer: List[Tuple[int, str]] = []
+        last_flush = time.monotonic()
+
+        async def flush() -> None:
+            nonlocal last_flush
+            if buffer:
+                owned = await asyncio.to_thread(self.store.append_events, job_id, attempt, list(buffer))
+                buffer.clear()
+                if not owned:
+                    raise JobLost(job_id)
+            last_flush = time.monotonic()
+
+        seq = await asyncio.to_thread(self.store.last_seq, job_id)
+        if seq:
+            # Повторный прогон после перезапуска: клиент начинает поток заново
+            seq += 1
+            buffer.append((seq, format_event({'type': 'restarted', 'attempt': attempt})))
+            await flush()
+
+        error = None
+        events = coalesced_article_events(job['url'], job['preset'], stream_tokens=job['stream_tokens'])
+        try:
+            async for chunk in events:
+                seq += 1
+                buffer.append((seq, chunk))
+                event = parse_event(chunk)
+                if event.get('type') == 'section_delta':
+                    # Фрагменты токенов копятся: одна транзакция на пачку, а не на каждый фрагмент
+                    if len(buffer) >= self.flush_events or time.monotonic() - last_flush >= self.poll_interval:
+                        await flush()
+                    continue
+
+                if event.get('type') == 'error':
+                    error = event.get('message')
+                await flush()
+        finally:
+            await events.aclose()
+
+        status = 'done' if error is None else 'failed'
+        if not await asyncio.to_thread(self.store.finish, job_id, attempt, status, error):
+            raise JobLost(job_id)
+        self._counters['completed' if error is None else 'failed'] += 1
+
+    async def events(self, job_id: str, last_event_id: int = 0) -> AsyncGenerator[str, None]:
+        """
+        SSE-поток задачи начиная с события после last_event_id: сохраненные
+        события, затем новые по мере появления, до завершения задачи
+        """
+        position = last_event_id
+        while True:
+            job, new_events = await asyncio.to_thread(self.store.poll, job_id, position)
+            for seq, chunk in new_events:
+                yield f"id: {seq}\n{chunk}"
+                position = seq
+
+            if job is None or job['status'] in FINISHED_STATUSES:
+                # Статус прочитан до событий: все события завершенной задачи уже отданы
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'jobs': self.store.stats(),
+            **self._counters,
+        }
+
+
+# Глобальные экземпляры хранилища и пула воркеров
+job_store = JobStore(
+    JOBS_CONFIG["db_path"],
+    ttl_seconds=JOBS_CONFIG["ttl_seconds"],
+    max_queued=JOBS_CONFIG["max_queued"],
+    lease_seconds=JOBS_CONFIG["lease_seconds"],
+)
+job_workers = JobWorkers(
+    job_store,
+    workers=JOBS_CONFIG["workers"],
+    poll_interval=JOBS_CONFIG["poll_interval"],
+    flush_events=JOBS_CONFIG["flush_events"],
+)
+
+
+async def _serve_workers() -> None:
+    from src.lifecycle import model_manager
+
+    model_manager.start()
+    job_workers.start()
+    await job_workers.join()
+
+
+if __name__ == "__main__":
+    # Отдельный процесс только с воркерами: `python -m src.jobs`
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve_workers())
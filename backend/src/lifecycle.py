@@ -0,0 +1,159 @@
+"""lifecycle.py - жизненный цикл моделей: фоновая загрузка, прогрев и готовность.
+
+Модели не загружаются при импорте модулей. При старте приложения
+ModelManager в отдельном потоке выполняет стадии:
+    - "summarizer_<роль>"        - загрузка модели суммаризации из MODEL_CONFIG;
+    - "sentiment"                - загрузка модели тональности;
+    - "warmup_summarizer_<роль>" - generate на характерных формах батча
+                                   (размеры батча x длины входа из LIFECYCLE_CONFIG);
+    - "warmup_sentiment"         - прогон модели тональности на батче комментариев;
+и пишет в лог длительность каждой стадии.
+
+В режиме пула процессов (INFERENCE_CONFIG["processes"] > 0) после загрузки
+моделей выполняется стадия "inference_processes": форк процессов
+инференса (src/process_pool.py), каждый из которых прогревается сам.
+
+Состояния: "starting" -> "loading" -> "warming_up" -> "ready" (или "failed").
+Пока процесс жив, `/health/live` отвечает 200; `/health/ready` отвечает 200
+только в состоянии "ready", до этого - 503 с текущей стадией.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from src.comment_analyzer import comment_analyzer
+from src.config import LIFECYCLE_CONFIG
+from src.process_pool import process_pool
+from src.registry import SummaryModel, model_registry
+from src.summarizator import batch_summarize_ids
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = (
+    "Автор статьи рассказывает, как команда перенесла сервис на новую архитектуру, "
+    "какие проблемы возникли с производительностью и как их удалось решить. "
+)
+
+
+class ModelManager:
+    def __init__(self, warmup: bool = True, warmup_batch_sizes: List[int] = (1,),
+                 warmup_input_tokens: List[int] = (64,), warmup_output_tokens: int = 16):
+        """Инициализация менеджера моделей"""
+        self.warmup = warmup
+        self.warmup_batch_sizes = list(warmup_batch_sizes)
+        self.warmup_input_tokens = list(warmup_input_tokens)
+        self.warmup_output_tokens = warmup_output_tokens
+
+        self.state = "starting"
+        self.error = None
+        self.stages: Dict[str, float] = {}
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запускает загрузку моделей в фоновом потоке (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict:
+        return {
+            "status": self.state,
+            "stages": dict(self.stages),
+            "error": self.error,
+        }
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 3)
+            logger.info(f"Стадия старта '{name}': {self.stages[name]:.2f} с")
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        try:
+            self.state = "loading"
+            for role in model_registry.models:
+                with self._stage(f"summarizer_{role}"):
+                    try:
+                        model_registry.load(role)
+                    except Exception as e:
+                        # Без одной из моделей сервис работает на оставшейся
+                        logger.error(f"Не удалось загрузить модель {role}: {e}")
+            if not model_registry.available():
+                raise RuntimeError("Не удалось загрузить ни одной модели суммаризации")
+            with self._stage("sentiment"):
+                comment_analyzer.load()
+
+            if process_pool.processes > 0:
+                # Веса уже в памяти и разделяются с процессами инференса, прогрев - в каждом из них
+                self.state = "warming_up"
+                with self._stage("inference_processes"):
+                    process_pool.start(initializer=self._warmup_models if self.warmup else None)
+            elif self.warmup:
+                self.state = "warming_up"
+                self._warmup_models()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.exception("Ошибка загрузки моделей")
+            return
+        finally:
+            self.stages["total"] = round(time.perf_counter() - start, 3)
+
+        self.state = "ready"
+        self._ready.set()
+        logger.info(
+            "Модели готовы за %.2f с (%s)", self.stages["total"],
+            ", ".join(f"{name}={seconds:.2f}с" for name, seconds in self.stages.items() if name != "total")
+        )
+
+    def _warmup_models(self) -> None:
+        for summary_model in model_registry.available():
+            with self._stage(f"warmup_summarizer_{summary_model.role}"):
+                self._warmup_summarizer(summary_model)
+        with self._stage("warmup_sentiment"):
+            comment_analyzer.warmup([WARMUP_TEXT] * comment_analyzer.batch_size)
+
+    def _warmup_summarizer(self, summary_model: SummaryModel) -> None:
+        """
+        Прогон generate на каждой комбинации размера батча и длины входа,
+        чтобы выделение памяти, подбор ядер и ленивая инициализация
+        произошли до первого запроса, а не во время него.
+        """
+        text_ids = summary_model.tokenizer(WARMUP_TEXT, add_special_tokens=False)["input_ids"]
+        generation_params = {
+            **summary_model.generation_params(),
+            "max_length": self.warmup_output_tokens,
+            "min_length": 0,
+        }
+
+        for input_tokens in self.warmup_input_tokens:
+            input_tokens = min(input_tokens, summary_model.chunk_tokens)
+            ids = (text_ids * (input_tokens // len(text_ids) + 1))[:input_tokens]
+            for batch_size in self.warmup_batch_sizes:
+                batch_summarize_ids([ids] * batch_size, summary_model, generation_params, batch_size=batch_size)
+
+
+# Глобальный менеджер моделей
+model_manager = ModelManager(
+    warmup=LIFECYCLE_CONFIG["warmup"],
+    warmup_batch_sizes=LIFECYCLE_CONFIG["warmup_batch_sizes"],
+    warmup_input_tokens=LIFECYCLE_CONFIG["warmup_input_tokens"],
+    warmup_output_tokens=LIFECYCLE_CONFIG["warmup_output_tokens"],
+)
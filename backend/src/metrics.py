@@ -0,0 +1,229 @@
+"""metrics.py - метрики стадий конвейера в формате Prometheus.
+
+Каждая стадия обработки статьи замеряется гистограммой длительности
+`habr_stage_duration_seconds{stage=...}`:
+    - fetch_article / fetch_comments - загрузка страниц статьи и комментариев;
+    - parse_article / parse_comments - разбор HTML статьи и комментариев;
+    - tokenize / generate / decode   - токенизация, model.generate и декодирование;
+    - sentiment                      - классификация тональности комментариев.
+Счетчик гистограммы дает пропускную способность стадии. Дополнительно
+считаются входные и выходные токены генерации, размер батча и доля
+паддинга в батче, а также статьи по статусу обработки.
+
+Метрики отдает `/metrics` в текстовом формате Prometheus. Внешних
+зависимостей нет: метрики хранятся в памяти процесса API.
+
+В процессах инференса (src/process_pool.py) наблюдения не агрегируются, а
+копятся в буфере и после каждой задачи отправляются в процесс API, где
+применяются к тем же метрикам.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.config import METRICS_CONFIG
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+RATIO_BUCKETS = (0.0, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _record(self, value: float, labels: Dict[str, Any]) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self.registry._lock:
+            if self.registry._buffer is not None:
+                self.registry._buffer.append((self.name, key, value))
+            else:
+                self._apply(key, value)
+
+    def _apply(self, key: Tuple[str, ...], value: float) -> None:
+        raise NotImplementedError
+
+    def _samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, value: float = 1, **labels) -> None:
+        self._record(value, labels)
+
+    def _apply(self, key, value):
+        self._values[key] = self._values.get(key, 0) + value
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self._record(value, labels)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Замеряет длительность блока (в том числе завершившегося исключением)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _apply(self, key, value):
+        state = self._values.get(key)
+        if state is None:
+            # Счетчики по корзинам (не накопительные), сумма, число наблюдений
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in sorted(self._values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Gauge(_Metric):
+    """Значение, которое считывается функцией в момент выдачи метрик"""
+    kind = "gauge"
+
+    def __init__(self, registry, name, documentation, read: Callable[[], float]):
+        super().__init__(registry, name, documentation, ())
+        self.read = read
+
+    def _samples(self):
+        yield self.name, {}, self.read()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._buffer: Optional[List[Tuple[str, Tuple[str, ...], float]]] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DURATION_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(self, name, documentation, read))
+
+    def start_buffering(self) -> None:
+        """Копить наблюдения вместо агрегации (в процессах инференса)"""
+        self._buffer = []
+
+    def drain(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        """Забирает накопленные наблюдения"""
+        with self._lock:
+            if self._buffer is None:
+                return []
+            observations, self._buffer = self._buffer, []
+        return observations
+
+    def replay(self, observations: List[Tuple[str, Tuple[str, ...], float]]) -> None:
+        """Применяет наблюдения, полученные из процесса инференса"""
+        with self._lock:
+            for name, key, value in observations:
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    metric._apply(key, value)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry(enabled=METRICS_CONFIG["enabled"])
+
+STAGE_DURATION = metrics.histogram(
+    "habr_stage_duration_seconds", "Длительность стадии обработки статьи", ("stage",)
+)
+GENERATION_TOKENS = metrics.counter(
+    "habr_generation_tokens_total", "Токены на входе и выходе model.generate", ("model", "direction")
+)
+GENERATION_BATCH_SIZE = metrics.histogram(
+    "habr_generation_batch_size", "Число текстов в одном вызове model.generate", ("model",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+GENERATION_PADDING_RATIO = metrics.histogram(
+    "habr_generation_padding_ratio", "Доля паддинга во входном батче model.generate", ("model",),
+    buckets=RATIO_BUCKETS,
+)
+SENTIMENT_TEXTS = metrics.counter(
+    "habr_sentiment_texts_total", "Комментарии, классифицированные моделью тональности"
+)
+ARTICLES = metrics.counter(
+    "habr_articles_total", "Обработанные статьи по статусу", ("status",)
+)
+
+
+def stage_timer(stage: str):
+    """Контекстный менеджер замера стадии: `with stage_timer("tokenize"): ...`"""
+    return STAGE_DURATION.time(stage=stage)
@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import create_engine, inspect, Column, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, DateTime, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import hashlib
+import logging
 import os
+import zlib
+
+from src.normalize_url import normalize_habr_url
+
+logger = logging.getLogger(__name__)
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
@@ -16,17 +23,204 @@ engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} i
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class SummaryText(Base):
+    """
+    Тексты суммаризаций, адресуемые по содержимому: каждый уникальный текст
+    хранится один раз в сжатом виде, оценки ссылаются на него по хешу
+    """
+    __tablename__ = "summary_texts"
+
+    hash = Column(String(64), primary_key=True)  # sha256 текста
+    content = Column(LargeBinary, nullable=False)  # текст в UTF-8, сжатый zlib
+    size = Column(Integer, nullable=False)  # размер несжатого текста в байтах
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 class ArticleRating(Base):
     """Модель для хранения оценок статей"""
     __tablename__ = "article_ratings"
     
     id = Column(Integer, primary_key=True, index=True)
-    article_url = Column(Text, nullable=False)
-    summarized_text = Column(Text, nullable=False)
+    article_url = Column(Text, nullable=False, index=True)
+    summary_hash = Column(String(64), ForeignKey("summary_texts.hash"), nullable=False)
     rating = Column(Integer, nullable=False)  # от 1 до 5
 
-# Создаем таблицы
-Base.metadata.create_all(bind=engine)
+def summary_hash(summarized_text: str) -> str:
+    """Хеш текста суммаризации - ключ в summary_texts"""
+    return hashlib.sha256(summarized_text.encode("utf-8")).hexdigest()
+
+def compress_summary(summarized_text: str) -> bytes:
+    return zlib.compress(summarized_text.encode("utf-8"))
+
+def decompress_summary(content: bytes) -> str:
+    return zlib.decompress(content).decode("utf-8")
+
+class ArticleRatingStats(Base):
+    """Агрегаты оценок одной статьи, обновляются в транзакции каждой вставки оценок"""
+    __tablename__ = "article_rating_stats"
+
+    article_url = Column(Text, primary_key=True)
+    ratings_count = Column(Integer, nullable=False, default=0)
+    ratings_sum = Column(Integer, nullable=False, default=0)
+    average_rating = Column(Float, nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=0)  # для ETag
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Топ статей по средней оценке читается по индексу, без сортировки таблицы
+    __table_args__ = (
+        Index("ix_article_rating_stats_top", "average_rating", "ratings_count"),
+    )
+
+class RatingTotals(Base):
+    """Глобальные агрегаты оценок (одна строка с id = 1)"""
+    __tablename__ = "rating_totals"
+
+    id = Column(Integer, primary_key=True)
+    ratings_count = Column(Integer, nullable=False, default=0)
+    ratings_sum = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)  # для ETag
+
+# Ключ advisory-блокировки PostgreSQL для миграций
+MIGRATION_LOCK_ID = 7402718
+
+def _lock_migrations(connection) -> None:
+    """
+    Блокирует миграции в других процессах до конца транзакции: воркеры,
+    запущенные одновременно, выполняют миграции по очереди, и каждый
+    проверяет схему уже после того, как получил блокировку
+    """
+    if connection.dialect.name == "sqlite":
+        # Транзакция сразу берет блокировку записи базы
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+
+def init_aggregates(bind) -> None:
+    """
+    Создает индекс по article_url в уже существующей таблице оценок и
+    заполняет агрегаты по накопленным оценкам, если таблицы агрегатов
+    только что созданы
+    """
+    with bind.begin() as connection:
+        _lock_migrations(connection)
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_article_ratings_article_url ON article_ratings (article_url)"
+        ))
+        if connection.execute(text("SELECT COUNT(*) FROM rating_totals")).scalar():
+            return
+
+        # Старые оценки хранят URL в том виде, в каком его прислал фронтенд:
+        # группы одной статьи под разными URL сливаются по нормализованному URL
+        per_article = {}
+        for article_url, count, total in connection.execute(text(
+            "SELECT article_url, COUNT(*), SUM(rating) FROM article_ratings GROUP BY article_url"
+        )):
+            sums = per_article.setdefault(normalize_habr_url(article_url), [0, 0])
+            sums[0] += count
+            sums[1] += total
+        if per_article:
+            now = datetime.utcnow()
+            connection.execute(ArticleRatingStats.__table__.insert(), [
+                {"article_url": article_url, "ratings_count": count, "ratings_sum": total,
+                 "average_rating": total / count, "version": 1, "updated_at": now}
+                for article_url, (count, total) in per_article.items()
+            ])
+        connection.execute(text(
+            "INSERT INTO rating_totals (id, ratings_count, ratings_sum, version) "
+            "SELECT 1, COUNT(*), COALESCE(SUM(rating), 0), 1 FROM article_ratings"
+        ))
+
+def migrate_summary_texts(bind, batch_size: int = 1000) -> None:
+    """
+    Переносит тексты суммаризаций из строк article_ratings в summary_texts:
+    вместо столбца summarized_text оценка получает summary_hash, как в
+    модели ArticleRating - NOT NULL и внешний ключ на summary_texts.hash,
+    поэтому перенесенная и новая базы имеют одну и ту же схему.
+
+    SQLite не умеет добавлять к существующей таблице NOT NULL и внешний
+    ключ, поэтому таблица пересоздается по модели и оценки копируются в нее;
+    в остальных базах столбец и ограничения добавляются через ALTER TABLE.
+    Для SQLite после переноса освобожденное место возвращается VACUUM.
+    """
+    migrated, stored = 0, set()
+    with bind.begin() as connection:
+        _lock_migrations(connection)
+        if "summarized_text" not in {column["name"] for column in inspect(connection).get_columns("article_ratings")}:
+            return
+
+        logger.info("Перенос текстов суммаризаций из article_ratings в summary_texts...")
+        rebuild = connection.dialect.name == "sqlite"
+        if rebuild:
+            # Имена индексов освобождаются для индексов новой таблицы
+            for index in inspect(connection).get_indexes("article_ratings"):
+                connection.execute(text(f"DROP INDEX {index['name']}"))
+            connection.execute(text("ALTER TABLE article_ratings RENAME TO article_ratings_old"))
+            ArticleRating.__table__.create(connection)
+            source = "article_ratings_old"
+        else:
+            connection.execute(text("ALTER TABLE article_ratings ADD COLUMN summary_hash VARCHAR(64)"))
+            source = "article_ratings"
+
+        last_id = 0
+        while True:
+            rows = connection.execute(text(
+                f"SELECT id, article_url, summarized_text, rating FROM {source} "
+                f"WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).all()
+            if not rows:
+                break
+
+            summaries, ratings = [], []
+            for rating_id, article_url, summarized_text, rating in rows:
+                key = summary_hash(summarized_text)
+                if key not in stored:
+                    stored.add(key)
+                    summaries.append({
+                        "hash": key,
+                        "content": compress_summary(summarized_text),
+                        "size": len(summarized_text.encode("utf-8")),
+                        "created_at": datetime.utcnow(),
+                    })
+                ratings.append({"id": rating_id, "article_url": article_url, "summary_hash": key, "rating": rating})
+
+            if summaries:
+                connection.execute(SummaryText.__table__.insert(), summaries)
+            if rebuild:
+                connection.execute(ArticleRating.__table__.insert(), ratings)
+            else:
+                connection.execute(
+                    text("UPDATE article_ratings SET summary_hash = :summary_hash WHERE id = :id"), ratings
+                )
+            migrated += len(rows)
+            last_id = rows[-1][0]
+
+        if rebuild:
+            connection.execute(text("DROP TABLE article_ratings_old"))
+        else:
+            connection.execute(text("ALTER TABLE article_ratings DROP COLUMN summarized_text"))
+            connection.execute(text("ALTER TABLE article_ratings ALTER COLUMN summary_hash SET NOT NULL"))
+            connection.execute(text(
+                "ALTER TABLE article_ratings ADD CONSTRAINT article_ratings_summary_hash_fkey "
+                "FOREIGN KEY (summary_hash) REFERENCES summary_texts (hash)"
+            ))
+
+    if bind.dialect.name == "sqlite":
+        with bind.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    logger.info(f"Перенесено оценок: {migrated}, уникальных текстов: {len(stored)}")
+
+def init_db(bind=engine) -> None:
+    """
+    Создание таблиц и миграции базы оценок: вызывается один раз при старте
+    приложения, а не при импорте модуля. Каждый шаг выполняется под
+    блокировкой (_lock_migrations), поэтому одновременно стартующие
+    воркеры не выполняют его дважды.
+    """
+    # Создаем таблицы
+    with bind.begin() as connection:
+        _lock_migrations(connection)
+        Base.metadata.create_all(bind=connection)
+    migrate_summary_texts(bind)
+    init_aggregates(bind)
 
 def get_db():
     """Функция для получения сессии базы данных"""
@@ -1,12 +1,19 @@
 import re
 from urllib.parse import urlparse, urlunparse
 
+HABR_HOSTS = ('habr.com', 'www.habr.com')
+HABR_ARTICLE_URL = re.compile(r'https://habr\.com/[a-z]{2}/articles/\d+/')
+INVALID_HABR_URL = "invalid Habr URL"
 
 def normalize_habr_url(url: str) -> str:
     """
     Нормализует URL статьи на Habr.com
     Преобразует различные форматы в стандартный: https://habr.com/{lang}/articles/{id}/
     """
+    if '://' not in url and url.split('/', 1)[0] in HABR_HOSTS:
+        # Ссылка без схемы: habr.com/ru/articles/896594/
+        url = 'https://' + url
+
     parsed = urlparse(url)
     
     # Проверяем, что это действительно habr.com
@@ -58,11 +65,25 @@ def normalize_habr_url(url: str) -> str:
     # Формируем нормализованный URL
     normalized_path = f"/{lang}/articles/{article_id}/"
     
+    # Одна и та же статья по http и с www - тот же URL (ключ кэша, оценок и дедупликации)
     return urlunparse((
-        parsed.scheme,
-        parsed.netloc,
+        'https',
+        'habr.com',
         normalized_path,
         '',
         '',
         ''
     ))
+
+
+def is_habr_article_url(url: str) -> bool:
+    """
+    Ведет ли URL на статью Habr: после нормализации он должен иметь вид
+    https://habr.com/{lang}/articles/{id}/ (normalize_habr_url возвращает
+    чужие и нераспознанные URL без изменений)
+    """
+    try:
+        return HABR_ARTICLE_URL.fullmatch(normalize_habr_url(url)) is not None
+    except ValueError:
+        # urlparse отвергает, например, незакрытый IPv6-адрес в netloc
+        return False
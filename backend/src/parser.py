@@ -1,79 +1,121 @@
-import requests
-import urllib3
+import asyncio
+import time
+
 from bs4 import BeautifulSoup
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from src.extractor import extract_article_page
+from src.fetcher import habr_fetcher
+from src.metrics import stage_timer
 
-def get_comments_html(article_url, article_author):
-    comments_url = article_url.rstrip('/') + '/comments/'
-    try:
-        response = requests.get(comments_url, headers={'User-Agent': 'Mozilla/5.0'}, verify=False, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+def get_comments_url(article_url):
+    return article_url.rstrip('/') + '/comments/'
 
-        comment_blocks = soup.find_all('div', class_='tm-comment__body-content')
-        author_tags = soup.find_all('a', class_='tm-user-info__username')
+def parse_comments_page(html, article_author):
+    soup = BeautifulSoup(html, 'html.parser')
 
-        comments = []
-        author_comments = []
+    comment_blocks = soup.find_all('div', class_='tm-comment__body-content')
+    author_tags = soup.find_all('a', class_='tm-user-info__username')
 
-        for block, author_tag in zip(comment_blocks, author_tags):
-            comment_text = block.get_text(strip=True)
-            author_name = author_tag.text.strip()
-            comment_data = {'author': author_name, 'text': comment_text}
-            comments.append(comment_data)
-            if author_name == article_author:
-                author_comments.append(comment_data)
+    comments = []
+    author_comments = []
 
-        return comments, author_comments
-    except Exception as e:
-        return [], []
+    for block, author_tag in zip(comment_blocks, author_tags):
+        comment_text = block.get_text(strip=True)
+        author_name = author_tag.text.strip()
+        comment_data = {'author': author_name, 'text': comment_text}
+        comments.append(comment_data)
+        if author_name == article_author:
+            author_comments.append(comment_data)
 
-def parse_article(url):
-    try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, verify=False, timeout=10)
-        response.raise_for_status()
-    except Exception as e:
-        return None
+    return comments, author_comments
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+def parse_article_page(html, url):
+    """Разбирает HTML статьи (без комментариев); используется только бенчмарками для сравнения с src/extractor.py"""
+    soup = BeautifulSoup(html, 'html.parser')
     data = {}
 
-    try:
-        data['url'] = url
-        data['title'] = soup.find('h1', class_='tm-title').text.strip()
-        data['author'] = soup.find('span', class_='tm-user-info__user').text.strip().split(' ')[0]
-        data['date'] = soup.find('time')['datetime']
+    data['url'] = url
+    data['title'] = soup.find('h1', class_='tm-title').text.strip()
+    data['author'] = soup.find('span', class_='tm-user-info__user').text.strip().split(' ')[0]
+    data['date'] = soup.find('time')['datetime']
 
-        reading_time_tag = soup.find('span', class_='tm-article-reading-time__label')
-        data['reading_time'] = reading_time_tag.text.strip() if reading_time_tag else None
+    reading_time_tag = soup.find('span', class_='tm-article-reading-time__label')
+    data['reading_time'] = reading_time_tag.text.strip() if reading_time_tag else None
 
-        views_tag = soup.find_all('span', class_='tm-icon-counter__value')
-        data['views'] = views_tag[-1].text.strip() if views_tag else None
+    views_tag = soup.find_all('span', class_='tm-icon-counter__value')
+    data['views'] = views_tag[-1].text.strip() if views_tag else None
 
-        text_block = soup.find('div', id='post-content-body')
+    text_block = soup.find('div', id='post-content-body')
 
-        if text_block:
-            for tag in text_block.find_all():
-                if tag.name not in ['h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'li', 'blockquote', 'br', 'b']:
-                    tag.unwrap()
+    if text_block:
+        for tag in text_block.find_all():
+            if tag.name not in ['h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'li', 'blockquote', 'br', 'b']:
+                tag.unwrap()
 
-            data['text_content'] = ''.join(str(child) for child in text_block.contents)
-        else:
-            data['text_content'] = ''
+        data['text_content'] = ''.join(str(child) for child in text_block.contents)
+    else:
+        data['text_content'] = ''
 
-        images = text_block.find_all('img') if text_block else []
-        data['image_content'] = [img['src'] for img in images if 'src' in img.attrs]
+    images = text_block.find_all('img') if text_block else []
+    data['image_content'] = [img['src'] for img in images if 'src' in img.attrs]
 
-        tags = soup.find_all('a', class_='tm-tags-list__link')
-        data['tags'] = [tag.text.strip() for tag in tags]
+    tags = soup.find_all('a', class_='tm-tags-list__link')
+    data['tags'] = [tag.text.strip() for tag in tags]
 
-        comments, author_comments = get_comments_html(url, data['author'])
-        data['comments'] = comments
-        data['comments_from_author'] = author_comments
+    return data
 
+def _parse_article_with_comments(article_html, comments_html, url):
+    try:
+        with stage_timer("parse_article"):
+            data = extract_article_page(article_html, url)
     except Exception as e:
         return None
 
+    if comments_html is None:
+        comments, author_comments = [], []
+    else:
+        try:
+            with stage_timer("parse_comments"):
+                comments, author_comments = parse_comments_page(comments_html, data['author'])
+        except Exception as e:
+            comments, author_comments = [], []
+
+    data['comments'] = comments
+    data['comments_from_author'] = author_comments
+    return data
+
+async def _timed_fetch(url, stage):
+    with stage_timer(stage):
+        return await habr_fetcher.fetch(url)
+
+async def parse_article_async(url, timings=None):
+    """
+    Загрузка и разбор статьи с комментариями: страница статьи и страница
+    комментариев загружаются параллельно через общий пул соединений, а разбор HTML
+    выполняется в отдельном потоке, чтобы не блокировать event loop.
+
+    Статья разбирается за один проход (src/extractor.py): вместо HTML тела
+    в ответе сразу структура секций `structure` для суммаризатора.
+
+    Если передан словарь timings, в него записывается время загрузки
+    (`fetch_s`) и разбора (`parse_s`) в секундах.
+    """
+    start = time.perf_counter()
+    article_html, comments_html = await asyncio.gather(
+        _timed_fetch(url, "fetch_article"),
+        _timed_fetch(get_comments_url(url), "fetch_comments"),
+        return_exceptions=True
+    )
+    fetched = time.perf_counter()
+    if timings is not None:
+        timings['fetch_s'] = round(fetched - start, 3)
+
+    if isinstance(article_html, BaseException):
+        return None
+    if isinstance(comments_html, BaseException):
+        comments_html = None
 
+    data = await asyncio.to_thread(_parse_article_with_comments, article_html, comments_html, url)
+    if timings is not None:
+        timings['parse_s'] = round(time.perf_counter() - fetched, 3)
     return data
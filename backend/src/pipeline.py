@@ -0,0 +1,146 @@
+"""pipeline.py - конвейер обработки одной статьи.
+
+article_events загружает статью и комментарии, суммаризирует секции (или
+повторяет результат из кэша) и анализирует комментарии, отдавая SSE-события
+в порядке, который видит клиент `/summarize`:
+    metadata -> start / processing / section_delta / section_complete -> complete
+    -> analyzing_comments -> comments_analysis (или comments_error).
+Если статью получить не удалось, поток состоит из одного события `error`.
+Последним идет событие `timings` - время стадий этой статьи в секундах
+(fetch_s, parse_s, summarize_s, comments_s, total_s); клиентам оно
+передается, только если они его запросили.
+
+Тот же конвейер используют `/summarize/batch` и другие потребители, которым
+нужен итоговый результат статьи, а не поток.
+
+Запросы получают поток через coalesced_article_events: одновременные
+запросы одной статьи с одинаковыми параметрами разделяют один прогон
+(src/singleflight.py). Профилируемый запрос получает поток через
+profiled_article_events - отдельным прогоном под профилировщиком.
+"""
+
+import time
+from typing import AsyncGenerator
+
+from src.cache import SummaryCache, summary_cache
+from src.comment_analyzer import comment_analyzer
+from src.degradation import degradation_controller
+from src.events import event_type, format_event
+from src.executor import inference_executor
+from src.metrics import ARTICLES
+from src.parser import parse_article_async
+from src.profiling import request_profiler
+from src.registry import model_registry
+from src.singleflight import article_flights
+from src.summarizator import process_structure_streaming
+
+
+async def article_events(normalized_url: str, preset: str, stream_tokens: bool = False,
+                         use_cache: bool = True) -> AsyncGenerator[str, None]:
+    """Поток SSE-событий обработки статьи по нормализованному URL (use_cache=False - мимо кэша)"""
+    start = time.perf_counter()
+    timings = {}
+
+    def timings_event() -> str:
+        timings['total_s'] = round(time.perf_counter() - start, 3)
+        return format_event({'type': 'timings', 'url': normalized_url, 'timings': timings})
+
+    try:
+        # Получаем контент статьи
+        response = await parse_article_async(normalized_url, timings)
+    except Exception as e:
+        ARTICLES.inc(status="error")
+        yield format_event({'type': 'error', 'message': str(e)})
+        yield timings_event()
+        return
+
+    if not response or 'structure' not in response:
+        ARTICLES.inc(status="error")
+        yield format_event({'type': 'error', 'message': 'Не удалось получить контент статьи'})
+        yield timings_event()
+        return
+
+    # Сначала отправляем метаданные
+    yield format_event({
+        'type': 'metadata',
+        'title': response.get('title', 'Без названия'),
+        'url': normalized_url,
+        'generation': degradation_controller.current(),
+    })
+
+    # Затем передаем управление основному потоку обработки (или кэшу)
+    article_stream = process_structure_streaming(
+        response["structure"], preset=preset, stream_tokens=stream_tokens
+    )
+    if summary_cache is not None and use_cache:
+        primary = model_registry.primary
+        generation_params = primary.generation_params(preset)
+        # Сэмплированный результат (do_sample, например пресет "general") - лишь один из
+        # возможных; в общем кэше он стал бы постоянным ответом, поэтому не кэшируется
+        if not generation_params.get("do_sample"):
+            # В режиме stream_tokens короткие секции генерируются жадно, а длинные (несколько
+            # чанков) - с параметрами пресета, поэтому в ключ входят и те, и другие
+            if stream_tokens:
+                generation_params = {**generation_params, 'streaming': primary.streaming_params()}
+            cache_key = SummaryCache.make_key(
+                normalized_url, response["text_content"], primary.model_id, generation_params
+            )
+            article_stream = summary_cache.replay_or_record(cache_key, article_stream)
+
+    stage_start = time.perf_counter()
+    async for chunk in article_stream:
+        yield chunk
+    timings['summarize_s'] = round(time.perf_counter() - stage_start, 3)
+
+    # После завершения суммаризации анализируем комментарии
+    if response.get('comments'):
+        yield format_event({'type': 'analyzing_comments'})
+
+        stage_start = time.perf_counter()
+        try:
+            comments_analysis = await inference_executor.run(
+                comment_analyzer.process_comments, response['comments']
+            )
+            yield format_event({'type': 'comments_analysis', 'analysis': comments_analysis})
+        except Exception as e:
+            yield format_event({'type': 'comments_error', 'message': f'Ошибка анализа комментариев: {str(e)}'})
+        timings['comments_s'] = round(time.perf_counter() - stage_start, 3)
+
+    ARTICLES.inc(status="ok")
+    yield timings_event()
+
+
+async def coalesced_article_events(normalized_url: str, preset: str, stream_tokens: bool = False,
+                                   timings: bool = False) -> AsyncGenerator[str, None]:
+    """
+    article_events, общий для одновременных запросов той же статьи.
+    Событие `timings` передается, только если timings=True.
+    """
+    events = article_flights.subscribe(
+        (normalized_url, preset, stream_tokens),
+        lambda: article_events(normalized_url, preset, stream_tokens=stream_tokens),
+    )
+    try:
+        async for chunk in events:
+            if timings or event_type(chunk) != 'timings':
+                yield chunk
+    finally:
+        await events.aclose()
+
+
+async def profiled_article_events(normalized_url: str, preset: str, stream_tokens: bool = False,
+                                  timings: bool = False) -> AsyncGenerator[str, None]:
+    """
+    article_events под профилировщиком запросов (src/profiling.py): без
+    объединения с другими запросами и мимо кэша суммаризаций
+    """
+    events = request_profiler.capture(
+        normalized_url,
+        article_events(normalized_url, preset, stream_tokens=stream_tokens, use_cache=False),
+    )
+    try:
+        async for chunk in events:
+            if timings or event_type(chunk) != 'timings':
+                yield chunk
+    finally:
+        await events.aclose()
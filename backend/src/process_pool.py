@@ -0,0 +1,347 @@
+"""process_pool.py - пул процессов инференса на CPU с общими весами.
+
+Несколько воркеров uvicorn умножают память на число процессов (каждый
+загружает свои копии моделей), а потоки PyTorch всех процессов по
+умолчанию делят одни и те же ядра. В режиме пула модели загружаются
+один раз в процессе API, после чего он форкает `processes` процессов
+инференса:
+    - веса разделяются с процессом API по copy-on-write: тензоры только
+      читаются, поэтому страницы с весами не копируются;
+    - перед форком gc.freeze() выносит объекты из сборщика мусора, чтобы
+      обход сборщика в дочерних процессах не копировал их страницы;
+    - каждый процесс получает свое число потоков intra-op
+      (torch.set_num_threads) и, если ядер хватает, свой набор ядер
+      (os.sched_setaffinity) - потоки процессов не конкурируют за ядра.
+
+Процесс API по-прежнему токенизирует тексты, собирает батчи и управляет
+очередью (src/executor.py), а вызовы моделей передает процессам по
+локальному IPC (очереди multiprocessing). Задачи раздает процесс API:
+каждая задача отправляется в собственную очередь свободного процесса, а
+остальные ждут в процессе API. Модели суммаризации и анализатор
+комментариев передаются по ссылке на глобальный экземпляр (см. __reduce__
+в registry.py и comment_analyzer.py), тексты и результаты - по значению.
+
+Процесс API запоминает, какую задачу отправил какому процессу, до
+отправки, поэтому, если процесс упал - в том числе сразу после того, как
+взял задачу из очереди, - монитор завершает именно эту задачу с
+WorkerCrashed, не дожидаясь сообщений от процесса.
+
+Потоковая выдача токенов: если вызов передает `on_text`, процесс шлет
+фрагменты текста обратно отдельными сообщениями по мере генерации.
+
+Метрики стадий (src/metrics.py), замеренные в процессе, отправляются в
+процесс API вместе с результатом каждой задачи.
+"""
+
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.config import INFERENCE_CONFIG
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCrashed(RuntimeError):
+    """Процесс инференса завершился во время выполнения задачи"""
+
+
+def _picklable_error(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _emit_text(results, task_id: int, text: str) -> None:
+    results.put(("text", task_id, text))
+
+
+def _worker_main(index: int, cpus: List[int], threads: int, tasks, results,
+                 initializer: Optional[Callable[[], None]]) -> None:
+    """Цикл процесса инференса: настройка потоков, прогрев, выполнение задач"""
+    # Остановкой процессов управляет процесс API
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import torch
+
+    metrics.start_buffering()
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+
+    if initializer is not None:
+        initializer()
+    results.put(("metrics", None, metrics.drain()))
+    results.put(("ready", index, os.getpid()))
+
+    while True:
+        item = tasks.get()
+        if item is None:
+            return
+
+        task_id, payload = item
+        try:
+            fn, args, kwargs, streaming = pickle.loads(payload)
+            if streaming:
+                kwargs["on_text"] = partial(_emit_text, results, task_id)
+            message = ("result", task_id, fn(*args, **kwargs))
+        except BaseException as e:
+            message = ("error", task_id, _picklable_error(e))
+        results.put(("metrics", None, metrics.drain()))
+        results.put(message)
+
+
+class _Task:
+    __slots__ = ('future', 'on_text')
+
+    def __init__(self, on_text: Optional[Callable[[str], None]]):
+        self.future = Future()
+        self.on_text = on_text
+
+
+class ProcessInferencePool:
+    def __init__(self, processes: int = 0, threads_per_process: int = 0, pin_cpus: bool = True,
+                 start_timeout: float = 600):
+        """
+        Args:
+            processes: число процессов инференса (0 - инференс в процессе API)
+            threads_per_process: потоков intra-op на процесс (0 - ядра поровну между процессами)
+            pin_cpus: закреплять за каждым процессом свой набор ядер
+            start_timeout: макс. время запуска и прогрева процессов в секундах
+        """
+        self.processes = processes
+        self.pin_cpus = pin_cpus
+        self.start_timeout = start_timeout
+
+        self.cpus = sorted(os.sched_getaffinity(0))
+        self.threads_per_process = threads_per_process or max(1, len(self.cpus) // max(processes, 1))
+
+        self._context = multiprocessing.get_context("fork")
+        self._results = None
+        self._workers: Dict[int, multiprocessing.Process] = {}
+        # У каждого процесса своя очередь задач
+        self._queues: Dict[int, Any] = {}
+        self._initializer: Optional[Callable[[], None]] = None
+        self._pending: Dict[int, _Task] = {}
+        # Задачи, ожидающие свободного процесса, свободные процессы
+        # и id задачи, отправленной каждому занятому процессу
+        self._backlog: Deque[Tuple[int, bytes]] = deque()
+        self._idle: Set[int] = set()
+        self._assigned: Dict[int, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Semaphore(0)
+        self._running = False
+        self._stopping = False
+        self._counters = {
+            'completed': 0,
+            'failed': 0,
+            'restarts': 0,
+        }
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def _worker_cpus(self, index: int) -> List[int]:
+        """Ядра процесса index: непересекающиеся наборы, если ядер хватает на все процессы"""
+        if not self.pin_cpus or len(self.cpus) < self.processes * self.threads_per_process:
+            return []
+        start = index * self.threads_per_process
+        return self.cpus[start:start + self.threads_per_process]
+
+    def start(self, initializer: Optional[Callable[[], None]] = None) -> None:
+        """
+        Форкает процессы инференса после загрузки моделей и ждет их готовности.
+        initializer выполняется в каждом процессе до первой задачи (прогрев).
+        """
+        if self.processes <= 0 or self._running:
+            return
+
+        self._initializer = initializer
+        self._results = self._context.Queue()
+
+        # Объекты, созданные до форка, больше не обходятся сборщиком мусора
+        gc.collect()
+        gc.freeze()
+
+        for index in range(self.processes):
+            self._spawn(index)
+
+        threading.Thread(target=self._read_results, name="inference-pool-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="inference-pool-monitor", daemon=True).start()
+
+        deadline = time.monotonic() + self.start_timeout
+        for _ in range(self.processes):
+            if not self._ready.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise RuntimeError("Процессы инференса не запустились за отведенное время")
+
+        self._running = True
+        logger.info(
+            f"Запущено процессов инференса: {self.processes}, потоков на процесс: {self.threads_per_process}"
+            + (", ядра закреплены" if self._worker_cpus(0) else "")
+        )
+
+    def _spawn(self, index: int) -> None:
+        # Новая очередь: в прежней могла остаться задача, уже завершенная с WorkerCrashed
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._worker_cpus(index), self.threads_per_process,
+                  tasks, self._results, self._initializer),
+            name=f"inference-{index}",
+            daemon=True,
+        )
+        process.start()
+        with self._lock:
+            previous = self._queues.get(index)
+            self._queues[index] = tasks
+            self._workers[index] = process
+        if previous is not None:
+            previous.cancel_join_thread()
+
+    def call(self, fn: Callable[..., Any], *args, on_text: Optional[Callable[[str], None]] = None,
+             **kwargs) -> Any:
+        """
+        Выполняет fn(*args, **kwargs) в одном из процессов и возвращает результат
+        (блокирует вызывающий поток). Если передан on_text, процесс получает
+        свой on_text, а фрагменты текста приходят в этот.
+        """
+        task_id = next(self._ids)
+        task = _Task(on_text)
+        payload = pickle.dumps((fn, args, kwargs, on_text is not None))
+
+        with self._lock:
+            self._pending[task_id] = task
+            self._backlog.append((task_id, payload))
+            self._dispatch()
+
+        try:
+            return task.future.result()
+        finally:
+            with self._lock:
+                self._pending.pop(task_id, None)
+
+    def _dispatch(self) -> None:
+        """Отправляет ожидающие задачи свободным процессам (вызывается под _lock)"""
+        while self._backlog and self._idle:
+            index = self._idle.pop()
+            if not self._workers[index].is_alive():
+                # Монитор перезапустит процесс, и он снова станет свободным
+                continue
+            task_id, payload = self._backlog.popleft()
+            # Задача записывается за процессом до отправки: если он упадет, едва взяв ее
+            # из очереди, монитор все равно завершит ее с WorkerCrashed
+            self._assigned[index] = task_id
+            self._queues[index].put((task_id, payload))
+
+    def _release_worker(self, task_id: int) -> None:
+        """Процесс, выполнявший task_id, свободен (вызывается под _lock)"""
+        for index, assigned in self._assigned.items():
+            if assigned == task_id:
+                del self._assigned[index]
+                self._idle.add(index)
+                break
+        self._dispatch()
+
+    def _read_results(self) -> None:
+        while True:
+            kind, key, value = self._results.get()
+
+            if kind == "ready":
+                logger.info(f"Процесс инференса {key} готов (pid {value})")
+                with self._lock:
+                    self._idle.add(key)
+                    self._dispatch()
+                self._ready.release()
+                continue
+            if kind == "metrics":
+                metrics.replay(value)
+                continue
+
+            if kind in ("result", "error"):
+                with self._lock:
+                    self._release_worker(key)
+
+            with self._lock:
+                task = self._pending.get(key)
+            if task is None:
+                continue
+
+            if kind == "text":
+                if task.on_text is not None:
+                    task.on_text(value)
+            elif kind in ("result", "error"):
+                with self._lock:
+                    # Задачу мог уже завершить монитор, если процесс упал сразу после ответа
+                    if task.future.done():
+                        continue
+                    if kind == "result":
+                        self._counters['completed'] += 1
+                        task.future.set_result(value)
+                    else:
+                        self._counters['failed'] += 1
+                        task.future.set_exception(value)
+
+    def _monitor(self) -> None:
+        """Перезапускает упавшие процессы; их задачи завершаются с WorkerCrashed"""
+        while not self._stopping:
+            time.sleep(1.0)
+            for index, process in list(self._workers.items()):
+                if self._stopping or process.is_alive():
+                    continue
+
+                logger.error(f"Процесс инференса {index} завершился с кодом {process.exitcode}, перезапуск")
+                with self._lock:
+                    self._idle.discard(index)
+                    task = self._pending.get(self._assigned.pop(index, None))
+                    if task is not None and not task.future.done():
+                        self._counters['failed'] += 1
+                        task.future.set_exception(WorkerCrashed(f"Процесс инференса {index} завершился"))
+                    self._counters['restarts'] += 1
+                self._spawn(index)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'processes': self.processes if self._running else 0,
+            'threads_per_process': self.threads_per_process,
+            'pids': [process.pid for process in self._workers.values()],
+            'pinned_cpus': {index: self._worker_cpus(index) for index in self._workers},
+            'in_flight': len(self._pending),
+            'queued': len(self._backlog),
+            **counters,
+        }
+
+    def shutdown(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        self._stopping = True
+        for tasks in self._queues.values():
+            tasks.put(None)
+        for process in self._workers.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+# Глобальный пул процессов инференса (запускается менеджером моделей)
+process_pool = ProcessInferencePool(
+    processes=INFERENCE_CONFIG["processes"],
+    threads_per_process=INFERENCE_CONFIG["threads_per_process"],
+    pin_cpus=INFERENCE_CONFIG["pin_cpus"],
+)
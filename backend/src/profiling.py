@@ -0,0 +1,229 @@
+"""profiling.py - профилирование отдельного запроса `/summarize` по требованию.
+
+Запрос с флагом `?profile=1` (или заголовком `X-Profile: 1`) и токеном
+администратора в заголовке `X-Admin-Token` выполняется под двумя
+профилировщиками:
+    - сэмплирующий профилировщик Python: раз в interval_ms снимаются стеки
+      всех потоков процесса (event loop, потоки разбора, потоки инференса);
+      результат - файл `<id>.folded` в формате свернутых стеков
+      (`поток;кадр;кадр... число`), который открывают flamegraph.pl,
+      speedscope и inferno;
+    - torch.profiler: операторы PyTorch во всех потоках процесса API,
+      результат - Chrome trace `<id>.trace.json` (chrome://tracing, Perfetto).
+Такой запрос не объединяется с одновременными запросами той же статьи и не
+берет результат из кэша суммаризаций, чтобы профиль показывал настоящую
+обработку. Профилировщики снимают весь процесс, поэтому в профиль попадают
+и запросы, которые обрабатывались в то же время. В режиме пула процессов
+(INFERENCE_CONFIG["processes"] > 0) generate выполняется в процессах
+инференса и в Chrome trace не попадает - только в стеки ожидания.
+
+Одновременно профилируется только один запрос. Рядом с файлами профиля
+сохраняется `<id>.json` с нормализованным URL, числом секций и
+длительностью; id содержит время, число секций и URL. Хранятся последние
+max_profiles профилей. Список - `/profiles`, файлы -
+`/profiles/{id}/folded` и `/profiles/{id}/trace`.
+
+Обычные запросы профилировщик не затрагивает: без флага запрос идет
+прежним путем, а поток сэмплирования и torch.profiler запускаются только
+на время профилируемого запроса.
+"""
+
+import glob
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import AsyncGenerator, Dict, List, Optional
+
+from src.config import PROFILING_CONFIG
+from src.events import event_type, format_event
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILES = {
+    "folded": ".folded",
+    "trace": ".trace.json",
+}
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик: стеки всех потоков процесса в фоновом потоке"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                # В свернутом формате ';' - разделитель кадров, а корень стека идет первым
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def _start_torch_profiler():
+    """torch.profiler по всем потокам процесса (None, если PyTorch недоступен)"""
+    try:
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        return None
+
+    try:
+        # Без profile_all_threads операторы из потоков инференса в трассу не попадают
+        from torch._C._profiler import _ExperimentalConfig
+        torch_profiler = profile(activities=[ProfilerActivity.CPU],
+                                 experimental_config=_ExperimentalConfig(profile_all_threads=True))
+    except (ImportError, TypeError):
+        torch_profiler = profile(activities=[ProfilerActivity.CPU])
+    torch_profiler.start()
+    return torch_profiler
+
+
+def _slug(url: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", re.sub(r"^https?://", "", url)).strip("_")[:80]
+
+
+class RequestProfiler:
+    def __init__(self, admin_token: str, directory: str, interval_ms: float = 5,
+                 max_profiles: int = 50, torch_trace: bool = True):
+        """Инициализация профилировщика (без токена администратора профилирование выключено)"""
+        self.admin_token = admin_token
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.max_profiles = max_profiles
+        self.torch_trace = torch_trace
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_token)
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def is_busy(self) -> bool:
+        return self._busy.locked()
+
+    async def capture(self, normalized_url: str, events: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """Отдает события потока, профилируя его обработку"""
+        if not self._busy.acquire(blocking=False):
+            await events.aclose()
+            yield format_event({'type': 'error', 'message': 'Уже профилируется другой запрос'})
+            return
+
+        start = time.time()
+        sections = 0
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        torch_profiler = _start_torch_profiler() if self.torch_trace else None
+        try:
+            async for chunk in events:
+                if event_type(chunk) == 'section_complete':
+                    sections += 1
+                yield chunk
+        finally:
+            await events.aclose()
+            stacks = sampler.stop()
+            if torch_profiler is not None:
+                torch_profiler.stop()
+            info = {
+                'url': normalized_url,
+                'sections': sections,
+                'created_at': start,
+                'duration_s': round(time.time() - start, 3),
+                'samples': sampler.samples,
+                'interval_ms': self.interval * 1000,
+            }
+            # Запись файлов (экспорт трассы может занять секунды) - вне event loop,
+            # профилировщик освобождается после записи
+            threading.Thread(target=self._save, args=(info, stacks, torch_profiler),
+                             name="profile-writer", daemon=True).start()
+
+    def _save(self, info: Dict, stacks: Counter, torch_profiler) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile_id = (
+                f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(info['created_at']))}"
+                f"-{info['sections']}sections-{_slug(info['url'])}"
+            )
+            base = os.path.join(self.directory, profile_id)
+
+            with open(base + PROFILE_FILES["folded"], "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            files = ["folded"]
+            if torch_profiler is not None:
+                torch_profiler.export_chrome_trace(base + PROFILE_FILES["trace"])
+                files.append("trace")
+
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump({'id': profile_id, **info, 'files': files}, f, ensure_ascii=False, indent=2)
+            logger.info(f"Профиль {profile_id} сохранен ({info['samples']} сэмплов, {info['duration_s']:.2f} с)")
+            self._prune()
+        except Exception:
+            logger.exception("Не удалось сохранить профиль запроса")
+        finally:
+            self._busy.release()
+
+    def _prune(self) -> None:
+        for meta_path in self._meta_paths()[self.max_profiles:]:
+            base = meta_path[:-len(".json")]
+            for path in [meta_path] + [base + suffix for suffix in PROFILE_FILES.values()]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _meta_paths(self) -> List[str]:
+        """Файлы описаний профилей, новые первыми"""
+        paths = [path for path in glob.glob(os.path.join(self.directory, "*.json"))
+                 if not path.endswith(PROFILE_FILES["trace"])]
+        return sorted(paths, reverse=True)
+
+    def list(self) -> List[Dict]:
+        profiles = []
+        for path in self._meta_paths():
+            with open(path, encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        return profiles
+
+    def path(self, profile_id: str, kind: str) -> Optional[str]:
+        """Путь к файлу профиля или None, если такого профиля нет"""
+        if kind not in PROFILE_FILES or os.path.basename(profile_id) != profile_id:
+            return None
+        path = os.path.join(self.directory, profile_id + PROFILE_FILES[kind])
+        return path if os.path.exists(path) else None
+
+
+# Глобальный профилировщик запросов
+request_profiler = RequestProfiler(
+    admin_token=PROFILING_CONFIG["admin_token"],
+    directory=PROFILING_CONFIG["dir"],
+    interval_ms=PROFILING_CONFIG["interval_ms"],
+    max_profiles=PROFILING_CONFIG["max_profiles"],
+    torch_trace=PROFILING_CONFIG["torch_trace"],
+)
@@ -0,0 +1,280 @@
+"""ratings.py - буферизованная запись оценок с групповыми коммитами.
+
+Прежний `/rate` на каждую оценку выполнял add, commit и refresh через
+синхронную сессию SQLAlchemy прямо в async-обработчике: каждый запрос
+блокировал event loop на fsync SQLite, и под нагрузкой запросы
+выстраивались в очередь за диском.
+
+RatingWriter принимает оценки в очередь, а фоновая задача собирает их в
+группы - пока не наберется `max_batch_size` оценок или не пройдет
+`flush_interval_ms` с первой оценки группы - и записывает группу одной
+транзакцией в отдельном потоке (один commit и один fsync на группу).
+Обработчик получает id своей оценки после коммита группы, поэтому ответ
+`/rate` по-прежнему означает, что оценка сохранена.
+
+Агрегаты оценок (по статье и общие, src/models.py) обновляются в той же
+транзакции, что и вставка: `/ratings/stats`, `/ratings/stats/{article}` и
+`/ratings/top` читают готовые суммы вместо COUNT/AVG по всей таблице.
+Каждое обновление увеличивает `version` агрегата - из нее строится ETag.
+
+Тексты суммаризаций хранятся отдельно от оценок (summary_texts в
+src/models.py): одна сжатая копия на уникальный текст, а оценка хранит
+только его хеш. Тысячи оценок популярной статьи с одной и той же
+суммаризацией больше не копируют ее в каждую строку.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.config import RATINGS_CONFIG
+from src.models import (
+    ArticleRating, ArticleRatingStats, RatingTotals, SessionLocal, SummaryText, compress_summary, summary_hash,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def store_summaries(db: Session, texts: List[str]) -> List[str]:
+    """
+    Сохраняет тексты суммаризаций, которых еще нет в summary_texts,
+    и возвращает их хеши в порядке texts. Уже сохраненные тексты
+    не сжимаются и не пишутся повторно.
+    """
+    hashes = [summary_hash(summarized_text) for summarized_text in texts]
+    unique = dict(zip(hashes, texts))
+    existing = {
+        key for (key,) in db.query(SummaryText.hash).filter(SummaryText.hash.in_(list(unique)))
+    }
+    missing = [
+        {
+            "hash": key,
+            "content": compress_summary(summarized_text),
+            "size": len(summarized_text.encode("utf-8")),
+            "created_at": datetime.utcnow(),
+        }
+        for key, summarized_text in unique.items() if key not in existing
+    ]
+    if missing:
+        # Тот же текст мог только что сохранить другой процесс
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            statement = sqlite.insert(SummaryText).on_conflict_do_nothing()
+        elif dialect == "postgresql":
+            statement = postgresql.insert(SummaryText).on_conflict_do_nothing()
+        else:
+            statement = SummaryText.__table__.insert()
+        db.execute(statement, missing)
+    return hashes
+
+
+def _upsert(db: Session, model, values: Dict[str, Any], increments: Dict[str, Any]) -> None:
+    """
+    Вставляет строку агрегата или, если она уже есть, применяет к ней
+    increments (INSERT ... ON CONFLICT DO UPDATE) - одной командой, без гонки
+    двух вставок одной и той же новой строки
+    """
+    key = model.__table__.primary_key.columns.values()[0].name
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(insert(model).values(**values).on_conflict_do_update(index_elements=[key], set_=increments))
+        return
+
+    updated = db.query(model).filter(getattr(model, key) == values[key]).update(
+        increments, synchronize_session=False
+    )
+    if not updated:
+        db.add(model(**values))
+
+
+def update_aggregates(db: Session, ratings: List[Tuple[str, int]]) -> None:
+    """
+    Добавляет оценки (article_url, rating) к агрегатам в текущей транзакции.
+    article_url должен быть уже нормализован (normalize_habr_url) - по нему
+    статистику статьи ищет `/ratings/stats/{article}`. Суммы увеличиваются
+    атомарным upsert (ON CONFLICT DO UPDATE SET x = x + n), поэтому
+    одновременные записи из разных процессов не теряют обновлений и не
+    конфликтуют на первой оценке статьи.
+    """
+    if not ratings:
+        return
+    now = datetime.utcnow()
+
+    per_article = defaultdict(lambda: [0, 0])
+    for article_url, rating in ratings:
+        per_article[article_url][0] += 1
+        per_article[article_url][1] += rating
+
+    for article_url, (count, total) in per_article.items():
+        _upsert(db, ArticleRatingStats, {
+            "article_url": article_url, "ratings_count": count, "ratings_sum": total,
+            "average_rating": total / count, "version": 1, "updated_at": now,
+        }, {
+            "ratings_count": ArticleRatingStats.ratings_count + count,
+            "ratings_sum": ArticleRatingStats.ratings_sum + total,
+            "average_rating":
+                (ArticleRatingStats.ratings_sum + total) * 1.0 / (ArticleRatingStats.ratings_count + count),
+            "version": ArticleRatingStats.version + 1,
+            "updated_at": now,
+        })
+
+    count, total = len(ratings), sum(rating for _, rating in ratings)
+    _upsert(db, RatingTotals, {"id": 1, "ratings_count": count, "ratings_sum": total, "version": 1}, {
+        "ratings_count": RatingTotals.ratings_count + count,
+        "ratings_sum": RatingTotals.ratings_sum + total,
+        "version": RatingTotals.version + 1,
+    })
+
+
+def global_stats(db: Session) -> Tuple[Dict[str, Any], int]:
+    """Общая статистика оценок и версия агрегата"""
+    totals = db.get(RatingTotals, 1)
+    if totals is None or not totals.ratings_count:
+        return {"total_ratings": 0, "average_rating": 0}, totals.version if totals else 0
+    return {
+        "total_ratings": totals.ratings_count,
+        "average_rating": round(totals.ratings_sum / totals.ratings_count, 2),
+    }, totals.version
+
+
+def article_stats(db: Session, article_url: str) -> Tuple[Dict[str, Any], int]:
+    """Статистика оценок статьи и версия ее агрегата"""
+    stats = db.get(ArticleRatingStats, article_url)
+    if stats is None:
+        return {"article_url": article_url, "total_ratings": 0, "average_rating": 0}, 0
+    return {
+        "article_url": article_url,
+        "total_ratings": stats.ratings_count,
+        "average_rating": round(stats.average_rating, 2),
+        "updated_at": stats.updated_at.isoformat(),
+    }, stats.version
+
+
+def top_articles(db: Session, limit: int = 10, min_ratings: int = 1) -> List[Dict[str, Any]]:
+    """Статьи с наибольшей средней оценкой (не меньше min_ratings оценок)"""
+    rows = (
+        db.query(ArticleRatingStats)
+        .filter(ArticleRatingStats.ratings_count >= min_ratings)
+        .order_by(ArticleRatingStats.average_rating.desc(), ArticleRatingStats.ratings_count.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "article_url": row.article_url,
+            "total_ratings": row.ratings_count,
+            "average_rating": round(row.average_rating, 2),
+        }
+        for row in rows
+    ]
+
+
+class RatingWriter:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 flush_interval_ms: float = 20, max_batch_size: int = 256):
+        """Инициализация писателя (фоновая задача запускается при первой оценке)"""
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._counters = {
+            'ratings': 0,
+            'commits': 0,
+            'failed_commits': 0,
+            'commit_time_total': 0.0,
+        }
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return self._queue
+
+    async def add(self, article_url: str, summarized_text: str, rating: int) -> int:
+        """Ставит оценку в очередь и возвращает ее id после коммита группы"""
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait(((article_url, summarized_text, rating), future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.flush_interval
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Пока группа пишется, новые оценки копятся в очереди и войдут в следующую
+            start = time.perf_counter()
+            try:
+                ids = await asyncio.to_thread(self._write, [values for values, _ in batch])
+            except Exception as e:
+                self._counters['failed_commits'] += 1
+                logger.error(f"Ошибка группового коммита {len(batch)} оценок: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._counters['ratings'] += len(batch)
+            self._counters['commits'] += 1
+            self._counters['commit_time_total'] += time.perf_counter() - start
+            for (_, future), rating_id in zip(batch, ids):
+                if not future.done():
+                    future.set_result(rating_id)
+
+    def _write(self, rows: List[Tuple[str, str, int]]) -> List[int]:
+        """Записывает группу оценок одной транзакцией (выполняется в потоке)"""
+        db = self.session_factory()
+        try:
+            hashes = store_summaries(db, [summarized_text for _, summarized_text, _ in rows])
+            ratings = [
+                ArticleRating(article_url=article_url, summary_hash=key, rating=rating)
+                for (article_url, _, rating), key in zip(rows, hashes)
+            ]
+            db.add_all(ratings)
+            update_aggregates(db, [(article_url, rating) for article_url, _, rating in rows])
+            # id назначаются при flush; после commit обращение к атрибутам перечитывало бы строки
+            db.flush()
+            ids = [rating.id for rating in ratings]
+            db.commit()
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        commits = self._counters['commits']
+        return {
+            'ratings': self._counters['ratings'],
+            'commits': commits,
+            'failed_commits': self._counters['failed_commits'],
+            'avg_batch_size': round(self._counters['ratings'] / commits, 2) if commits else 0.0,
+            'avg_commit_ms': round(self._counters['commit_time_total'] / commits * 1000, 2) if commits else 0.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+# Глобальный писатель оценок
+rating_writer = RatingWriter(
+    flush_interval_ms=RATINGS_CONFIG["flush_interval_ms"],
+    max_batch_size=RATINGS_CONFIG["max_batch_size"],
+) if RATINGS_CONFIG["group_commit"] else None
@@ -0,0 +1,166 @@
+"""registry.py - реестр моделей суммаризации из MODEL_CONFIG.
+
+Каждая модель из MODEL_CONFIG ("primary", "fallback") загружается один раз
+и используется всеми запросами. Если у двух ролей одинаковое имя модели,
+веса и токенизатор загружаются один раз и разделяются между ролями.
+
+Параметры генерации собираются из лимитов длины модели и пресета из
+GENERATION_PRESETS, выбранного запросом (или пресета по умолчанию).
+
+Порядок обслуживания - порядок ролей в MODEL_CONFIG: если primary не
+загрузилась, запросы сразу обслуживает fallback. Переключение на запасную
+модель во время обработки секции выполняется в summarizator.summarize_section.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from transformers import T5TokenizerFast
+
+from src.backends import load_summarization_model, resolve_device
+from src.config import GENERATION_PRESETS, INFERENCE_CONFIG, MODEL_CONFIG, SUMMARIZATION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Префикс задачи, добавляется к уже готовым id токенов текста
+PREFIX = "summarize: "
+
+
+class SummaryModel:
+    """Модель суммаризации одной роли: веса, токенизатор и лимиты длины"""
+
+    def __init__(self, role: str, model_name: str, max_input_length: int,
+                 max_output_length: int, min_output_length: int, backend: str = "torch"):
+        self.role = role
+        self.model_name = model_name
+        self.backend = backend
+        # Идентификатор модели для ключа кэша: int8/onnx дают немного другие суммаризации
+        self.model_id = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self.max_input_length = max_input_length
+        self.max_output_length = max_output_length
+        self.min_output_length = min_output_length
+        self.device = resolve_device(backend)
+
+        self.model = None
+        self.tokenizer = None
+        self.prefix_ids: List[int] = []
+        # Бюджет токенов текста в одном чанке: префикс и </s> тоже входят в max_input_length
+        self.chunk_tokens = max_input_length - 1
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def __reduce__(self):
+        # В процесс инференса передается роль, а не веса: там уже есть своя копия реестра
+        return _registered_model, (self.role,)
+
+    def attach(self, model, tokenizer) -> None:
+        """Подключает загруженные веса и токенизатор"""
+        self.model = model
+        self.tokenizer = tokenizer
+        self.prefix_ids = tokenizer(PREFIX, add_special_tokens=False)["input_ids"]
+        self.chunk_tokens = self.max_input_length - len(self.prefix_ids) - 1
+
+    def generation_params(self, preset: str = SUMMARIZATION_CONFIG["default_preset"]) -> Dict[str, Any]:
+        """Параметры generate: лимиты длины модели + пресет из GENERATION_PRESETS"""
+        return {
+            "max_length": self.max_output_length,
+            "min_length": self.min_output_length,
+            **GENERATION_PRESETS[preset],
+        }
+
+    def streaming_params(self) -> Dict[str, Any]:
+        """
+        Параметры generate в режиме потоковой выдачи токенов: жадное
+        декодирование, потому что beam search не знает финальную гипотезу
+        до самого конца
+        """
+        return {
+            "max_length": self.max_output_length,
+            "min_length": self.min_output_length,
+            "num_beams": 1,
+            "do_sample": False,
+            "no_repeat_ngram_size": 2,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, model_config: Dict[str, Dict] = MODEL_CONFIG,
+                 backend: str = INFERENCE_CONFIG["backend"],
+                 default_preset: str = SUMMARIZATION_CONFIG["default_preset"],
+                 fallback_enabled: bool = SUMMARIZATION_CONFIG["fallback_enabled"]):
+        """Инициализация реестра (модели загружаются вызовом load)"""
+        if default_preset not in GENERATION_PRESETS:
+            raise ValueError(f"Неизвестный пресет генерации: {default_preset}")
+
+        self.backend = backend
+        self.default_preset = default_preset
+        self.fallback_enabled = fallback_enabled
+        self.models: Dict[str, SummaryModel] = {
+            role: SummaryModel(role, backend=backend, **config)
+            for role, config in model_config.items()
+        }
+
+        self._weights: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'fallbacks': 0,
+            'sections': {role: 0 for role in self.models},
+        }
+
+    def load(self, role: str) -> SummaryModel:
+        """Загружает модель роли; веса моделей с одинаковым именем разделяются"""
+        summary_model = self.models[role]
+        with self._lock:
+            if summary_model.model_name not in self._weights:
+                tokenizer = T5TokenizerFast.from_pretrained(summary_model.model_name, trust_remote_code=False)
+                model = load_summarization_model(summary_model.model_name, self.backend, summary_model.device)
+                self._weights[summary_model.model_name] = (model, tokenizer)
+                logger.info(f"Модель {summary_model.model_name} ({role}) загружена")
+            summary_model.attach(*self._weights[summary_model.model_name])
+        return summary_model
+
+    def available(self) -> List[SummaryModel]:
+        """Загруженные модели в порядке обслуживания"""
+        models = [summary_model for summary_model in self.models.values() if summary_model.is_loaded]
+        return models if self.fallback_enabled else models[:1]
+
+    @property
+    def primary(self) -> Optional[SummaryModel]:
+        models = self.available()
+        return models[0] if models else None
+
+    def resolve_preset(self, preset: Optional[str]) -> str:
+        """Пресет запроса или пресет по умолчанию; неизвестный пресет - ValueError"""
+        preset = preset or self.default_preset
+        if preset not in GENERATION_PRESETS:
+            raise ValueError(
+                f"Неизвестный пресет генерации: {preset} (доступны: {', '.join(GENERATION_PRESETS)})"
+            )
+        return preset
+
+    def record_section(self, summary_model: SummaryModel, fallback: bool) -> None:
+        self._counters['sections'][summary_model.role] += 1
+        if fallback:
+            self._counters['fallbacks'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'models': {
+                role: {'model_id': summary_model.model_id, 'loaded': summary_model.is_loaded}
+                for role, summary_model in self.models.items()
+            },
+            'default_preset': self.default_preset,
+            'sections': dict(self._counters['sections']),
+            'fallbacks': self._counters['fallbacks'],
+        }
+
+
+# Глобальный реестр моделей суммаризации
+model_registry = ModelRegistry()
+
+
+def _registered_model(role: str) -> SummaryModel:
+    return model_registry.models[role]
@@ -0,0 +1,129 @@
+"""singleflight.py - объединение одновременных запросов одной статьи.
+
+Когда статья в тренде, десятки клиентов присылают один и тот же URL в
+течение нескольких секунд. Первый запрос по ключу запускает поток событий
+(загрузка статьи и суммаризация) в отдельной задаче, а остальные
+подписываются на него: сначала получают уже отправленные события, затем -
+новые по мере появления. N одинаковых одновременных запросов стоят одной
+загрузки и одного прогона модели.
+
+Запись о потоке удаляется сразу после его завершения: следующие запросы
+той же статьи обслуживает кэш суммаризаций. Если все подписчики отключились
+до завершения, задача отменяется, как и одиночный запрос при обрыве.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+from src.config import COALESCING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """Поток событий в процессе: журнал событий и текущие подписчики"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        """Инициализация (enabled=False - каждый запрос выполняется отдельно)"""
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._counters = {
+            'leaders': 0,
+            'joined': 0,
+            'cancelled': 0,
+        }
+
+    async def subscribe(self, key: Hashable,
+                        factory: Callable[[], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """
+        Поток событий по ключу: factory() вызывается только первым запросом,
+        остальные получают повтор уже отправленных событий и продолжение.
+        """
+        if not self.enabled:
+            async for event in factory():
+                yield event
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, factory))
+            self._counters['leaders'] += 1
+        else:
+            self._counters['joined'] += 1
+            logger.debug("Запрос присоединен к потоку %s (событий: %d)", key, len(flight.events))
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.events) or flight.done)
+                    pending = flight.events[position:]
+                    finished = flight.done
+
+                for event in pending:
+                    yield event
+                position += len(pending)
+
+                if finished and position == len(flight.events):
+                    break
+
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Результат больше никому не нужен; новые запросы начнут свой поток
+                self._counters['cancelled'] += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _produce(self, key: Hashable, flight: _Flight,
+                       factory: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for event in factory():
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            logger.error("Поток %s завершился с ошибкой: %s", key, e)
+            flight.error = e
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    def in_flight(self) -> int:
+        """Число потоков, выполняющихся прямо сейчас"""
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика объединения запросов"""
+        return {
+            'enabled': self.enabled,
+            'in_flight': self.in_flight(),
+            'subscribers': sum(flight.subscribers for flight in self._flights.values()),
+            **self._counters,
+        }
+
+
+# Глобальный экземпляр для потоков суммаризации статей
+article_flights = SingleFlight(**COALESCING_CONFIG)
@@ -1,27 +1,29 @@
 import re
-import json
 import asyncio
-from typing import Any, Dict, List, AsyncGenerator
+import logging
+import time
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple
 
 import torch
 from bs4 import BeautifulSoup
-from transformers import T5ForConditionalGeneration, T5Tokenizer
+from transformers import TextStreamer
 
-# Загрузка токенизатора и модели
-model = T5ForConditionalGeneration.from_pretrained("ghostbim21/ru_text_summary", trust_remote_code=False)
-tokenizer = T5Tokenizer.from_pretrained("ghostbim21/ru_text_summary", trust_remote_code=False)
+from src.batcher import SummaryBatcher
+from src.config import BATCHING_CONFIG, INFERENCE_CONFIG, SUMMARIZATION_CONFIG
+from src.degradation import degradation_controller
+from src.events import format_event
+from src.executor import InferenceOverloaded, inference_executor
+from src.metrics import GENERATION_BATCH_SIZE, GENERATION_PADDING_RATIO, GENERATION_TOKENS, stage_timer
+from src.registry import SummaryModel, model_registry
 
-# Определяем устройство (GPU если доступен)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-model.eval()  # Переводим в режим инференса
+logger = logging.getLogger(__name__)
+
+# Модели, токенизаторы и лимиты длины берутся из реестра (src/registry.py),
+# который заполняется менеджером жизненного цикла (src/lifecycle.py)
 
 # Параметры батчинга
 BATCH_SIZE = 8
-MAX_INPUT_LENGTH = 512
-MAX_OUTPUT_LENGTH = 350
-MIN_OUTPUT_LENGTH = 150
-CHUNK_SIZE = 450
+MAX_REDUCE_DEPTH = 3
 
 def basic_clean(text):
     if not isinstance(text, str):
@@ -48,88 +50,242 @@ def clean_text(text, advanced=False):
         return text
     return advanced_clean(text) if advanced else basic_clean(text)
 
-def split_text_into_chunks(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
-    """Разбивает текст на чанки с учетом границ предложений"""
-    words = text.split()
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+')
+
+def encode_sentences(text: str, tokenizer) -> List[List[int]]:
+    """Токенизирует текст по предложениям одним батчевым вызовом быстрого токенизатора"""
+    sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+    if not sentences:
+        return []
+    with stage_timer("tokenize"):
+        return tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
+def pack_token_units(units: List[List[int]], max_tokens: int) -> List[List[int]]:
+    """
+    Склеивает последовательности токенов (предложения или суммаризации
+    чанков) в чанки не длиннее max_tokens, не разрывая их без необходимости.
+    Единица длиннее бюджета режется на части по max_tokens.
+    """
     chunks = []
     current_chunk = []
-    current_size = 0
     
-    for word in words:
-        current_chunk.append(word)
-        current_size += 1
+    for unit in units:
+        if len(unit) > max_tokens:
+            if current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = []
+            for i in range(0, len(unit), max_tokens):
+                chunks.append(unit[i:i + max_tokens])
+            continue
         
-        # Проверяем, является ли слово концом предложения
-        if current_size >= chunk_size and word.endswith(('.', '!', '?')):
-            chunks.append(' '.join(current_chunk))
+        if len(current_chunk) + len(unit) > max_tokens:
+            chunks.append(current_chunk)
             current_chunk = []
-            current_size = 0
+        current_chunk.extend(unit)
     
-    # Добавляем оставшийся текст
     if current_chunk:
-        chunks.append(' '.join(current_chunk))
+        chunks.append(current_chunk)
     
     return chunks
 
-def batch_summarize(texts: List[str], model, tokenizer, batch_size: int = BATCH_SIZE) -> List[str]:
-    """Батчевая суммаризация текстов"""
-    summaries = []
+def split_text_into_chunks(text: str, tokenizer, max_tokens: int) -> List[List[int]]:
+    """Разбивает текст на чанки токенов с учетом границ предложений"""
+    return pack_token_units(encode_sentences(text, tokenizer), max_tokens)
+
+def batch_summarize_ids(inputs: List[List[int]], summary_model: SummaryModel,
+                        generation_params: Dict[str, Any] = None,
+                        batch_size: int = BATCH_SIZE) -> List[List[int]]:
+    """
+    Батчевая суммаризация уже токенизированных текстов.
+
+    Возвращает id токенов суммаризаций без служебных токенов, чтобы их
+    можно было без повторной токенизации подать на следующий уровень.
+    generation_params по умолчанию - пресет по умолчанию для этой модели.
+    """
+    model, tokenizer = summary_model.model, summary_model.tokenizer
+    generation_params = generation_params or summary_model.generation_params()
+    special_ids = set(tokenizer.all_special_ids)
+    pad_id = tokenizer.pad_token_id
     
-    # Обрабатываем тексты батчами
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i:i + batch_size]
+    # Сортируем по длине, чтобы в подбатчах было меньше паддинга
+    order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+    summaries = [None] * len(inputs)
+    
+    for i in range(0, len(order), batch_size):
+        batch_indices = order[i:i + batch_size]
+        batch_ids = [
+            summary_model.prefix_ids + inputs[idx][:summary_model.chunk_tokens] + [tokenizer.eos_token_id]
+            for idx in batch_indices
+        ]
         
-        # Добавляем префикс "summarize: " к каждому тексту
-        batch_texts = ["summarize: " + text for text in batch_texts]
+        # Паддинг справа до самой длинной последовательности в батче
+        max_len = max(len(ids) for ids in batch_ids)
+        input_ids = torch.full((len(batch_ids), max_len), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch_ids), max_len), dtype=torch.long)
+        for row, ids in enumerate(batch_ids):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
         
-        # Токенизация батча
-        inputs = tokenizer(
-            batch_texts,
-            return_tensors="pt",
-            max_length=MAX_INPUT_LENGTH,
-            truncation=True,
-            padding=True
-        ).to(device)
+        input_tokens = sum(len(ids) for ids in batch_ids)
+        GENERATION_BATCH_SIZE.observe(len(batch_ids), model=summary_model.role)
+        GENERATION_PADDING_RATIO.observe(1 - input_tokens / (len(batch_ids) * max_len), model=summary_model.role)
+        GENERATION_TOKENS.inc(input_tokens, model=summary_model.role, direction="input")
         
         # Генерация суммаризаций
-        with torch.no_grad():
+        with torch.no_grad(), stage_timer("generate"):
             outputs = model.generate(
-                inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                max_length=MAX_OUTPUT_LENGTH,
-                min_length=MIN_OUTPUT_LENGTH,
-                num_beams=5,
-                length_penalty=2.0,
-                no_repeat_ngram_size=2,
-                early_stopping=True
+                input_ids.to(summary_model.device),
+                attention_mask=attention_mask.to(summary_model.device),
+                **generation_params
             )
         
-        # Декодирование результатов
-        batch_summaries = tokenizer.batch_decode(outputs, skip_special_tokens=True)
-        summaries.extend(batch_summaries)
+        for idx, output in zip(batch_indices, outputs.tolist()):
+            summaries[idx] = [token for token in output if token not in special_ids]
+            GENERATION_TOKENS.inc(len(summaries[idx]), model=summary_model.role, direction="output")
     
     return summaries
 
-def summarize_long_text(text: str, model, tokenizer) -> str:
+def decode_summary(units: List[List[int]], tokenizer) -> str:
+    """Декодирует суммаризации чанков и объединяет их в один текст"""
+    with stage_timer("decode"):
+        texts = tokenizer.batch_decode(units, skip_special_tokens=True)
+    return " ".join(text for text in texts if text.strip()).strip()
+
+def batch_summarize(texts: List[str], summary_model: SummaryModel, generation_params: Dict[str, Any] = None,
+                    batch_size: int = BATCH_SIZE) -> List[str]:
+    """Батчевая суммаризация текстов"""
+    tokenizer = summary_model.tokenizer
+    with stage_timer("tokenize"):
+        inputs = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    outputs = batch_summarize_ids(inputs, summary_model, generation_params, batch_size)
+    with stage_timer("decode"):
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+def _should_reduce(units: List[List[int]], chunks: List[List[int]], depth: int, max_tokens: int) -> bool:
+    """Нужен ли еще один уровень суммаризации над суммаризациями чанков"""
+    if sum(len(unit) for unit in units) <= max_tokens:
+        return False
+    # Если суммаризации не склеиваются в меньшее число чанков, следующий уровень не сократит текст
+    return depth < MAX_REDUCE_DEPTH and len(chunks) < len(units)
+
+def summarize_units(units: List[List[int]], summary_model: SummaryModel,
+                    generation_params: Dict[str, Any] = None) -> List[List[int]]:
+    """Иерархическая суммаризация токенизированного текста, возвращает id суммаризаций чанков"""
+    chunks = pack_token_units(units, summary_model.chunk_tokens)
+    depth = 0
+    
+    while True:
+        # Батчевая суммаризация чанков
+        units = batch_summarize_ids(chunks, summary_model, generation_params)
+        depth += 1
+        
+        # Если объединенная суммаризация все еще слишком длинная, суммаризируем еще раз
+        chunks = pack_token_units(units, summary_model.chunk_tokens)
+        if not _should_reduce(units, chunks, depth, summary_model.chunk_tokens):
+            return units
+
+def summarize_long_text(text: str, summary_model: SummaryModel, generation_params: Dict[str, Any] = None) -> str:
     """Суммаризация длинного текста с использованием чанков и батчинга"""
-    # Если текст короткий, обрабатываем как обычно
-    if len(text.split()) <= CHUNK_SIZE:
-        return batch_summarize([text], model, tokenizer)[0]
+    tokenizer = summary_model.tokenizer
+    units = summarize_units(encode_sentences(text, tokenizer), summary_model, generation_params)
+    return decode_summary(units, tokenizer)
+
+# Общие батчеры для секций всех одновременных запросов, по одному на модель:
+# батчи запасной модели не ждут в очереди за зависшим батчем основной
+summary_batchers = {
+    role: SummaryBatcher(
+        batch_summarize_ids,
+        inference_executor,
+        max_batch_size=BATCHING_CONFIG["max_batch_size"],
+        max_wait_ms=BATCHING_CONFIG["max_wait_ms"],
+        max_queue=INFERENCE_CONFIG["max_queue"],
+    )
+    for role in model_registry.models
+}
+
+async def summarize_units_batched(units: List[List[int]], summary_model: SummaryModel,
+                                  generation_params: Dict[str, Any]) -> List[List[int]]:
+    """Иерархическая суммаризация, чанки которой идут через общий батчер"""
+    chunks = pack_token_units(units, summary_model.chunk_tokens)
+    depth = 0
     
-    # Разбиваем на чанки
-    chunks = split_text_into_chunks(text, CHUNK_SIZE)
+    while True:
+        units = await summary_batchers[summary_model.role].summarize_many(chunks, summary_model, generation_params)
+        depth += 1
+        
+        chunks = pack_token_units(units, summary_model.chunk_tokens)
+        if not _should_reduce(units, chunks, depth, summary_model.chunk_tokens):
+            return units
+
+async def summarize_long_text_batched(text: str, summary_model: SummaryModel,
+                                      generation_params: Dict[str, Any]) -> str:
+    """Суммаризация длинного текста, чанки которого идут через общий батчер"""
+    tokenizer = summary_model.tokenizer
+    units = await summarize_units_batched(encode_sentences(text, tokenizer), summary_model, generation_params)
+    return decode_summary(units, tokenizer)
+
+class CallbackTextStreamer(TextStreamer):
+    """Передает декодированные фрагменты текста в on_text по мере генерации"""
+    
+    def __init__(self, tokenizer, on_text: Callable[[str], None]):
+        super().__init__(tokenizer, skip_prompt=False, skip_special_tokens=True)
+        self.on_text = on_text
     
-    # Батчевая суммаризация чанков
-    chunk_summaries = batch_summarize(chunks, model, tokenizer)
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.on_text(text)
+
+def generate_with_streamer(input_ids: List[int], summary_model: SummaryModel,
+                           generation_params: Dict[str, Any] = None, *,
+                           on_text: Callable[[str], None]) -> List[int]:
+    """
+    Генерация одной суммаризации с выдачей фрагментов текста в on_text
+    (из потока генерации). generation_params по умолчанию - жадное
+    декодирование модели.
+    """
+    tokenizer = summary_model.tokenizer
+    streamer = CallbackTextStreamer(tokenizer, on_text)
+    ids = summary_model.prefix_ids + input_ids[:summary_model.chunk_tokens] + [tokenizer.eos_token_id]
+    input_tensor = torch.tensor([ids], dtype=torch.long, device=summary_model.device)
+    GENERATION_BATCH_SIZE.observe(1, model=summary_model.role)
+    GENERATION_PADDING_RATIO.observe(0, model=summary_model.role)
+    GENERATION_TOKENS.inc(len(ids), model=summary_model.role, direction="input")
     
-    # Объединяем суммаризации чанков
-    combined_summary = " ".join(chunk_summaries)
+    with torch.no_grad(), stage_timer("generate"):
+        output = summary_model.model.generate(
+            input_tensor,
+            attention_mask=torch.ones_like(input_tensor),
+            streamer=streamer,
+            **(generation_params or summary_model.streaming_params())
+        )
     
-    # Если объединенная суммаризация все еще слишком длинная, суммаризируем еще раз
-    if len(combined_summary.split()) > CHUNK_SIZE:
-        return summarize_long_text(combined_summary, model, tokenizer)
+    special_ids = set(tokenizer.all_special_ids)
+    summary_ids = [token for token in output[0].tolist() if token not in special_ids]
+    GENERATION_TOKENS.inc(len(summary_ids), model=summary_model.role, direction="output")
+    return summary_ids
+
+async def summarize_text_token_stream(text: str, summary_model: SummaryModel, generation_params: Dict[str, Any],
+                                      on_delta: Callable[[str], None],
+                                      streaming_params: Dict[str, Any] = None) -> str:
+    """
+    Суммаризация с потоковой выдачей токенов.
+
+    Текст, который помещается в один чанк, генерируется отдельным вызовом
+    generate, и каждый декодированный фрагмент передается в on_delta.
+    Длинные тексты идут через обычный батчевый конвейер чанков без дельт.
+    """
+    tokenizer = summary_model.tokenizer
+    units = encode_sentences(text, tokenizer)
+    if sum(len(unit) for unit in units) > summary_model.chunk_tokens:
+        return decode_summary(await summarize_units_batched(units, summary_model, generation_params), tokenizer)
     
-    return combined_summary
+    loop = asyncio.get_running_loop()
+    input_ids = [token for unit in units for token in unit]
+    summary_ids = await inference_executor.run(
+        generate_with_streamer, input_ids, summary_model, streaming_params,
+        on_text=lambda text: loop.call_soon_threadsafe(on_delta, text)
+    )
+    return decode_summary([summary_ids], tokenizer)
 
 def parse_html_content(html_content: str):
     soup = BeautifulSoup(html_content, 'html.parser')
@@ -191,8 +347,10 @@ def parse_html_content(html_content: str):
     
     return result
 
-def summarize_structure_optimized(structure: List[Dict[str, Any]], model, tokenizer) -> List[Dict[str, Any]]:
+def summarize_structure_optimized(structure: List[Dict[str, Any]], summary_model: SummaryModel,
+                                  generation_params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
     """Оптимизированная суммаризация структуры с батчингом"""
+    tokenizer = summary_model.tokenizer
     
     def process_item(item):
         if isinstance(item, str):
@@ -220,19 +378,22 @@ def summarize_structure_optimized(structure: List[Dict[str, Any]], model, tokeni
             texts_to_summarize.append(full_text)
             section_indices.append(idx)
     
-    # Обрабатываем длинные тексты
-    processed_texts = []
+    # Обрабатываем длинные тексты (токенизация выполняется один раз)
+    processed_inputs = []
     for text in texts_to_summarize:
-        if len(text.split()) > CHUNK_SIZE:
+        units = encode_sentences(text, tokenizer)
+        if sum(len(unit) for unit in units) > summary_model.chunk_tokens:
             # Для очень длинных текстов используем чанкинг
-            summary = summarize_long_text(text, model, tokenizer)
-            processed_texts.append(summary)
+            summary_units = summarize_units(units, summary_model, generation_params)
+            processed_inputs.append([token for unit in summary_units for token in unit])
         else:
-            processed_texts.append(text)
+            processed_inputs.append([token for unit in units for token in unit])
     
     # Батчевая суммаризация всех текстов
-    if processed_texts:
-        summaries = batch_summarize(processed_texts, model, tokenizer)
+    if processed_inputs:
+        summaries = tokenizer.batch_decode(
+            batch_summarize_ids(processed_inputs, summary_model, generation_params), skip_special_tokens=True
+        )
         
         # Обновляем структуру
         for idx, section_idx in enumerate(section_indices):
@@ -245,8 +406,113 @@ def summarize_structure_optimized(structure: List[Dict[str, Any]], model, tokeni
     
     return structure
 
-async def summarize_structure_streaming(structure: List[Dict[str, Any]], model, tokenizer) -> AsyncGenerator[str, None]:
-    """Потоковая суммаризация структуры с отправкой результатов по мере готовности"""
+def _is_out_of_memory(error: Exception) -> bool:
+    return isinstance(error, torch.cuda.OutOfMemoryError) or 'out of memory' in str(error).lower()
+
+def inference_queue_depth() -> int:
+    """Тексты, ожидающие батча, и задачи, ожидающие слота в пуле инференса"""
+    return (sum(batcher.stats()['queue_depth'] for batcher in summary_batchers.values())
+            + inference_executor.stats()['waiting'])
+
+async def summarize_section(text: str, preset: str,
+                            on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, SummaryModel, str]:
+    """
+    Суммаризация текста секции с переключением на запасную модель.
+
+    Модели перебираются в порядке обслуживания реестра: следующая модель
+    используется, если текущая упала с ошибкой (в том числе нехватка памяти)
+    или не уложилась в section_latency_budget. Последняя модель работает без
+    ограничения времени. Переполнение очереди ошибкой модели не считается.
+    Потоковая выдача токенов (on_delta) используется только для первой модели.
+
+    Параметры генерации упрощаются контроллером деградации по текущей нагрузке.
+
+    Возвращает суммаризацию, модель, которая ее сделала, и уровень генерации.
+    """
+    candidates = model_registry.available()
+    if not candidates:
+        raise RuntimeError("Модели суммаризации не загружены")
+    
+    level = degradation_controller.decide(inference_queue_depth())
+    start = time.perf_counter()
+    
+    # Номер текущей попытки: генерация брошенной попытки продолжается в потоке
+    # инференса, и ее поздние фрагменты отбрасываются
+    active_attempt = 0
+    
+    def attempt_delta(attempt_no: int) -> Callable[[str], None]:
+        def forward(delta: str) -> None:
+            if active_attempt == attempt_no:
+                on_delta(delta)
+        return forward
+    
+    for attempt, summary_model in enumerate(candidates):
+        active_attempt = attempt
+        is_last = attempt == len(candidates) - 1
+        generation_params = degradation_controller.apply(summary_model.generation_params(preset), level)
+        if on_delta is not None and attempt == 0:
+            streaming_params = degradation_controller.apply(summary_model.streaming_params(), level)
+            work = summarize_text_token_stream(text, summary_model, generation_params,
+                                               attempt_delta(attempt), streaming_params)
+        else:
+            work = summarize_long_text_batched(text, summary_model, generation_params)
+        
+        try:
+            summary = await asyncio.wait_for(
+                work, None if is_last else SUMMARIZATION_CONFIG["section_latency_budget"]
+            )
+        except InferenceOverloaded:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Модель {summary_model.model_id} не уложилась в бюджет времени секции, "
+                           f"переключаемся на запасную")
+            continue
+        except Exception as e:
+            if _is_out_of_memory(e) and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            if is_last:
+                raise
+            logger.warning(f"Ошибка модели {summary_model.model_id}: {e}, переключаемся на запасную")
+            continue
+        
+        active_attempt = None
+        model_registry.record_section(summary_model, fallback=attempt > 0)
+        degradation_controller.observe(time.perf_counter() - start)
+        return summary, summary_model, level["name"]
+
+def _section_event(idx: int, section: Dict[str, Any], summary_model: Optional[SummaryModel] = None,
+                   level: Optional[str] = None) -> str:
+    """
+    Событие `section_complete`; для непустых секций - с моделью, которая их
+    обработала, и с уровнем генерации, если он был упрощен под нагрузкой
+    """
+    event = {'type': 'section_complete', 'section_index': idx, 'section': section}
+    if summary_model is not None:
+        event['model'] = summary_model.model_id
+        event['fallback'] = summary_model is not model_registry.primary
+    if level is not None and level != degradation_controller.levels[0]["name"]:
+        event['degraded'] = level
+    return format_event(event)
+
+async def summarize_structure_streaming(structure: List[Dict[str, Any]], preset: str = None,
+                                        parallel: bool = BATCHING_CONFIG["parallel_sections"],
+                                        stream_tokens: bool = False) -> AsyncGenerator[str, None]:
+    """
+    Потоковая суммаризация структуры с отправкой результатов по мере готовности.
+
+    В режиме parallel все секции статьи отправляются в общий батчер сразу
+    (короткие - в порядке длины, чтобы в батч попадали тексты близкого размера,
+    длинные - чанками), а `section_complete` отправляется по мере готовности
+    каждой секции. Порядок на клиенте восстанавливается по `section_index`.
+
+    В режиме stream_tokens (всегда параллельном) секции, помещающиеся в один
+    чанк, генерируются жадным декодированием, и каждый новый фрагмент текста
+    отправляется событием `section_delta` до финального `section_complete`.
+
+    Каждое событие `section_complete` непустой секции содержит `model` - id
+    модели, которая ее суммаризировала, и `fallback` - была ли это запасная модель.
+    """
+    preset = model_registry.resolve_preset(preset)
     
     def process_item(item):
         if isinstance(item, str):
@@ -265,7 +531,13 @@ async def summarize_structure_streaming(structure: List[Dict[str, Any]], model,
         return " ".join(text_parts) if text_parts else ""
     
     # Отправляем начальное сообщение
-    yield f"data: {json.dumps({'type': 'start', 'total_sections': len(structure)})}\n\n"
+    yield format_event({'type': 'start', 'total_sections': len(structure)})
+    
+    if parallel or stream_tokens:
+        texts = [combine_content(section) for section in structure]
+        async for chunk in _summarize_sections_parallel(structure, texts, preset, stream_tokens):
+            yield chunk
+        return
     
     # Обрабатываем каждую секцию отдельно
     processed_sections = []
@@ -276,13 +548,10 @@ async def summarize_structure_streaming(structure: List[Dict[str, Any]], model,
         if full_text:
             # Отправляем уведомление о начале обработки секции
             section_name = section.get('header', f'Раздел {idx + 1}')
-            yield f"data: {json.dumps({'type': 'processing', 'section_index': idx, 'header': section_name})}\n\n"
+            yield format_event({'type': 'processing', 'section_index': idx, 'header': section_name})
             
-            # Суммаризируем секцию
-            if len(full_text.split()) > CHUNK_SIZE:
-                summary = summarize_long_text(full_text, model, tokenizer)
-            else:
-                summary = batch_summarize([full_text], model, tokenizer)[0]
+            # Суммаризируем секцию через общий батчер
+            summary, summary_model, level = await summarize_section(full_text, preset)
             
             # Создаем обработанную секцию
             processed_section = {
@@ -292,7 +561,7 @@ async def summarize_structure_streaming(structure: List[Dict[str, Any]], model,
             processed_sections.append(processed_section)
             
             # Отправляем результат секции
-            yield f"data: {json.dumps({'type': 'section_complete', 'section_index': idx, 'section': processed_section})}\n\n"
+            yield _section_event(idx, processed_section, summary_model, level)
             
         else:
             # Пустая секция
@@ -302,15 +571,73 @@ async def summarize_structure_streaming(structure: List[Dict[str, Any]], model,
             }
             processed_sections.append(processed_section)
             
-            yield f"data: {json.dumps({'type': 'section_complete', 'section_index': idx, 'section': processed_section})}\n\n"
-        
-        # Небольшая пауза для избежания блокировки
-        await asyncio.sleep(0.1)
+            yield _section_event(idx, processed_section)
     
     # Отправляем финальное сообщение
-    yield f"data: {json.dumps({'type': 'complete', 'result': processed_sections})}\n\n"
+    yield format_event({'type': 'complete', 'result': processed_sections})
 
-async def process_article_streaming(html_content: str, model=model, tokenizer=tokenizer) -> AsyncGenerator[str, None]:
+async def _summarize_sections_parallel(structure: List[Dict[str, Any]], texts: List[str], preset: str,
+                                      stream_tokens: bool = False) -> AsyncGenerator[str, None]:
+    """Суммаризирует все секции одновременно и отдает их по мере готовности"""
+    processed_sections = [None] * len(structure)
+    
+    # События от задач секций: ('delta', idx, текст), ('done', idx, (суммаризация, модель, уровень)),
+    # ('error', idx, исключение)
+    events = asyncio.Queue()
+    
+    async def run_section(idx):
+        try:
+            on_delta = (lambda delta: events.put_nowait(('delta', idx, delta))) if stream_tokens else None
+            events.put_nowait(('done', idx, await summarize_section(texts[idx], preset, on_delta)))
+        except Exception as e:
+            events.put_nowait(('error', idx, e))
+    
+    # Пустые секции готовы сразу
+    for idx, section in enumerate(structure):
+        if not texts[idx]:
+            processed_sections[idx] = {'header': section['header'], 'content': []}
+            yield _section_event(idx, processed_sections[idx])
+    
+    pending = [idx for idx in range(len(structure)) if texts[idx]]
+    for idx in pending:
+        section_name = structure[idx].get('header', f'Раздел {idx + 1}')
+        yield format_event({'type': 'processing', 'section_index': idx, 'header': section_name})
+    
+    # Задачи создаются по возрастанию длины, в том же порядке тексты попадают в очередь батчера
+    pending.sort(key=lambda idx: len(texts[idx].split()))
+    tasks = [asyncio.ensure_future(run_section(idx)) for idx in pending]
+    
+    try:
+        remaining = len(tasks)
+        while remaining:
+            kind, idx, payload = await events.get()
+            
+            if kind == 'delta':
+                # Фрагмент суммаризации секции, пока идет генерация. Фрагменты попытки,
+                # брошенной при переключении на запасную модель, отбрасывает summarize_section
+                if processed_sections[idx] is not None:
+                    continue
+                yield format_event({'type': 'section_delta', 'section_index': idx, 'delta': payload})
+                continue
+            if kind == 'error':
+                raise payload
+            
+            remaining -= 1
+            summary, summary_model, level = payload
+            processed_sections[idx] = {
+                'header': structure[idx]['header'],
+                'content': [summary]
+            }
+            yield _section_event(idx, processed_sections[idx], summary_model, level)
+    finally:
+        # Клиент отключился или секция упала с ошибкой - остальные секции не нужны
+        for task in tasks:
+            task.cancel()
+    
+    yield format_event({'type': 'complete', 'result': processed_sections})
+
+async def process_article_streaming(html_content: str, preset: str = None,
+                                    stream_tokens: bool = False) -> AsyncGenerator[str, None]:
     """Главная функция для потоковой обработки статей"""
     try:
         # Базовая очистка с сохранением HTML
@@ -318,10 +645,20 @@ async def process_article_streaming(html_content: str, model=model, tokenizer=to
         
         # Парсинг HTML
         parsed_content = parse_html_content(cleaned_basic)
-        
+    except Exception as e:
+        yield format_event({'type': 'error', 'message': f'Ошибка обработки: {str(e)}'})
+        return
+    
+    async for chunk in process_structure_streaming(parsed_content, preset, stream_tokens):
+        yield chunk
+
+async def process_structure_streaming(structure: List[Dict[str, Any]], preset: str = None,
+                                      stream_tokens: bool = False) -> AsyncGenerator[str, None]:
+    """Потоковая обработка статьи, уже разобранной в секции (см. src/extractor.py)"""
+    try:
         # Потоковая суммаризация
-        async for chunk in summarize_structure_streaming(parsed_content, model, tokenizer):
+        async for chunk in summarize_structure_streaming(structure, preset, stream_tokens=stream_tokens):
             yield chunk
             
     except Exception as e:
-        yield f"data: {json.dumps({'type': 'error', 'message': f'Ошибка обработки: {str(e)}'})}\n\n"
+        yield format_event({'type': 'error', 'message': f'Ошибка обработки: {str(e)}'})
@@ -16,11 +16,12 @@ interface CommentsAnalysisData {
 }
 
 interface StreamData {
-    type: 'start' | 'processing' | 'section_complete' | 'complete' | 'error' | 'metadata' | 'analyzing_comments' | 'comments_analysis' | 'comments_error';
+    type: 'start' | 'processing' | 'section_delta' | 'section_complete' | 'complete' | 'error' | 'metadata' | 'analyzing_comments' | 'comments_analysis' | 'comments_error';
     total_sections?: number;
     header?: string;
     section_index?: number;
     section?: Section;
+    delta?: string;
     result?: Section[];
     message?: string;
     title?: string;
@@ -34,6 +35,7 @@ function LinkForm() {
     const [error, setError] = useState('');
     const [streamingStatus, setStreamingStatus] = useState<string | null>(null);
     const [processedSections, setProcessedSections] = useState<(Section | null)[]>([]);
+    const [draftSections, setDraftSections] = useState<Record<number, string>>({});
     const [totalSections, setTotalSections] = useState(0);
     const [articleTitle, setArticleTitle] = useState<string | null>(null);
     const [showRating, setShowRating] = useState(false);
@@ -49,6 +51,7 @@ function LinkForm() {
         setError('');
         setSummary(null);
         setProcessedSections([]);
+        setDraftSections({});
         setStreamingStatus(null);
         setTotalSections(0);
         setArticleTitle(null);
@@ -64,7 +67,10 @@ function LinkForm() {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ link: link })
+                body: JSON.stringify({
+                    link: link,
+                    stream_tokens: import.meta.env.VITE_STREAM_TOKENS === 'true'
+                })
             });
 
             console.log('Response status:', response.status);
@@ -129,6 +135,15 @@ function LinkForm() {
                                     setStreamingStatus(`Обрабатываем: ${data.header || ''}`);
                                     break;
 
+                                case 'section_delta':
+                                    if (data.section_index !== undefined && data.delta) {
+                                        setDraftSections(prev => ({
+                                            ...prev,
+                                            [data.section_index!]: (prev[data.section_index!] || '') + data.delta
+                                        }));
+                                    }
+                                    break;
+
                                 case 'section_complete':
                                     if (data.section_index !== undefined && data.section) {
                                         setProcessedSections(prev => {
@@ -399,7 +414,7 @@ function LinkForm() {
                 )}
 
                 {/* Real-time Results */}
-                {processedSections.length > 0 && !summary && (
+                {(processedSections.length > 0 || Object.keys(draftSections).length > 0) && !summary && (
                     <div className="bg-white rounded-xl shadow-lg overflow-hidden mb-8">
                         <div className="bg-gradient-to-r from-blue-500 to-indigo-600 px-6 py-4">
                             <h2 className="text-2xl font-bold text-white">
@@ -408,8 +423,17 @@ function LinkForm() {
                         </div>
 
                         <div className="p-6">
-                            {processedSections.map((section, index) => (
-                                section && (
+                            {Array.from({ length: Math.max(processedSections.length, totalSections) }, (_, index) => processedSections[index] ?? null).map((section, index) => (
+                                !section && draftSections[index] ? (
+                                    <div key={index} className="mb-6 last:mb-0">
+                                        <div className="border-l-4 border-blue-300 pl-4 mb-4">
+                                            <p className="text-gray-500 leading-relaxed">
+                                                {draftSections[index]}
+                                                <span className="ml-1 animate-pulse">▍</span>
+                                            </p>
+                                        </div>
+                                    </div>
+                                ) : section && (
                                     <div key={index} className="mb-6 last:mb-0 animate-fadeIn">
                                         {section.header ? (
                                             <div className="border-l-4 border-green-500 pl-4 mb-4">